@@ -1,8 +1,10 @@
 # =====================
-# 响应模型 & 错误码加载
+# 响应模型 & 错误码/配置加载
 # =====================
 import yaml
 from pathlib import Path
+from fastapi import Request
+from fastapi.routing import APIRoute
 from fastapi.responses import JSONResponse
 from fastapi.exceptions import RequestValidationError
 from starlette.exceptions import HTTPException as StarletteHTTPException
@@ -17,6 +19,12 @@ def _load_errors() -> dict:
 
 ERRORS = _load_errors()
 
+# 只加载一次服务运行配置
+def _load_settings() -> dict:
+    return yaml.safe_load(Path("config/server_config.yaml").read_text(encoding="utf-8")) or {}
+
+SETTINGS = _load_settings()
+
 class APIResponse(BaseModel):
     code: int
     msg: str
@@ -106,6 +114,52 @@ def auto_handle_exceptions(func) -> callable:
         return sync_wrapper
 
 
+def limit_request_body(max_bytes: int, error_key: str):
+    """
+    路由装饰器: 限制请求体大小, 超出时返回 error_key 对应的错误, 不再继续读取请求体。
+    需放在 @router.post 之下、@auto_handle_exceptions 之上, 且路由器使用 LimitedBodyRoute。
+    """
+    def decorator(endpoint):
+        endpoint.max_body_bytes = max_bytes
+        endpoint.body_error_key = error_key
+        return endpoint
+    return decorator
+
+class LimitedBodyRoute(APIRoute):
+    """
+    路由类: 对标记了 limit_request_body 的接口, 在 FastAPI 解析表单/JSON 之前按 Content-Length 拒绝,
+    并在读取请求体时累计字节数, 超出上限立即中止（分块传输没有 Content-Length 时同样生效）。
+    """
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+        max_bytes = getattr(self.endpoint, "max_body_bytes", None)
+        if max_bytes is None:
+            return handler
+        code, msg = AppException.get_error(self.endpoint.body_error_key)
+
+        def too_large():
+            # 请求体解析阶段只会原样抛出 HTTPException, 由 http_exception_handler 转为统一响应
+            return StarletteHTTPException(status_code=code, detail={"code": code, "msg": f"{msg}（上限 {max_bytes} 字节）"})
+
+        async def limited_handler(request: Request):
+            content_length = request.headers.get("content-length", "")
+            if content_length.isdigit() and int(content_length) > max_bytes:
+                raise too_large()
+            received = 0
+
+            async def receive():
+                nonlocal received
+                message = await request.receive()
+                if message["type"] == "http.request":
+                    received += len(message.get("body", b""))
+                    if received > max_bytes:
+                        raise too_large()
+                return message
+
+            return await handler(Request(request.scope, receive))
+        return limited_handler
+
+
 # =====================
 # 全局异常处理注册
 # =====================
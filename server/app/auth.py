@@ -0,0 +1,153 @@
+import json
+import time
+import hmac
+import base64
+import hashlib
+import secrets
+from collections import OrderedDict
+from fastapi import Request, Depends
+from loguru import logger
+from .api_common import AppException, SETTINGS
+
+_auth_settings = SETTINGS.get("AUTH", {})
+ROLE_PERMISSIONS = {role: frozenset(perms or []) for role, perms in SETTINGS.get("ROLE_PERMISSIONS", {}).items()}
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+class CurrentUser:
+    """当前请求的登录用户, 权限集合由角色在内存中换算得到"""
+    def __init__(self, username: str, role: str, expires_at: float):
+        self.username = username
+        self.role = role
+        self.expires_at = expires_at
+        self.permissions = ROLE_PERMISSIONS.get(role, frozenset())
+
+    def has(self, permission: str) -> bool:
+        return permission in self.permissions
+
+
+class SessionManager:
+    """
+    无状态签名令牌: 令牌 = base64(载荷).base64(HMAC-SHA256 签名), 载荷包含用户名、角色和过期时间,
+    校验无需访问存储。校验结果按令牌缓存, 同一令牌的后续请求只需一次字典查找。
+    """
+    def __init__(self, secret_key=None, ttl_seconds=8 * 3600, cache_size=10000):
+        if not secret_key:
+            # 未配置密钥时随机生成, 服务重启后已签发的令牌失效
+            secret_key = secrets.token_hex(32)
+            logger.warning("未配置 AUTH.secret_key, 已随机生成签名密钥")
+        self._key = secret_key.encode("utf-8")
+        self.ttl_seconds = ttl_seconds
+        self.cache_size = cache_size
+        self._cache = OrderedDict()  # token -> CurrentUser
+        self._revoked = {}  # token -> 过期时间
+
+    def _sign(self, payload: str) -> str:
+        return _b64encode(hmac.new(self._key, payload.encode("ascii"), hashlib.sha256).digest())
+
+    def issue(self, username: str, role: str) -> str:
+        claims = {"sub": username, "role": role, "exp": int(time.time()) + self.ttl_seconds,
+                  "jti": secrets.token_hex(8)}
+        payload = _b64encode(json.dumps(claims, separators=(",", ":")).encode("utf-8"))
+        return f"{payload}.{self._sign(payload)}"
+
+    def verify(self, token: str):
+        """返回令牌对应的 CurrentUser, 签名错误、过期或已登出时返回 None"""
+        user = self._cache.get(token)
+        if user is None:
+            user = self._decode(token)
+            if user is None:
+                return None
+            self._cache[token] = user
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        if user.expires_at < time.time():
+            self._cache.pop(token, None)
+            return None
+        if self._revoked and token in self._revoked:
+            return None
+        return user
+
+    def _decode(self, token: str):
+        try:
+            payload, signature = token.split(".")
+            if not hmac.compare_digest(signature, self._sign(payload)):
+                return None
+            claims = json.loads(_b64decode(payload))
+            return CurrentUser(claims["sub"], claims["role"], claims["exp"])
+        except (ValueError, KeyError, TypeError):
+            return None
+
+    def revoke(self, token: str):
+        user = self.verify(token)
+        if user is None:
+            return
+        now = time.time()
+        for revoked, expires_at in list(self._revoked.items()):
+            if expires_at < now:
+                del self._revoked[revoked]
+        self._revoked[token] = user.expires_at
+
+
+session_manager = SessionManager(
+    _auth_settings.get("secret_key"),
+    _auth_settings.get("session_ttl_seconds", 8 * 3600),
+    _auth_settings.get("session_cache_size", 10000),
+)
+
+
+def allow_query_token(endpoint):
+    """
+    路由装饰器: 允许该接口通过 ?token= 携带会话令牌, 仅用于 iframe/img/下载链接等无法设置请求头的只读接口。
+    需放在 @router.get 之下、@auto_handle_exceptions 之上。
+    """
+    endpoint.allow_query_token = True
+    return endpoint
+
+
+def get_token(request: Request):
+    """
+    从 Authorization: Bearer {token} 读取令牌。
+    查询参数 ?token= 只在标记了 allow_query_token 的预览/下载接口上接受, 避免写接口的令牌出现在访问日志、浏览器历史和 Referer 中。
+    """
+    authorization = request.headers.get("authorization", "")
+    if authorization.lower().startswith("bearer "):
+        return authorization[len("bearer "):].strip()
+    if getattr(request.scope.get("endpoint"), "allow_query_token", False):
+        return request.query_params.get("token")
+    return None
+
+
+async def get_current_user(request: Request) -> CurrentUser:
+    """FastAPI 依赖: 校验会话令牌并返回当前用户, 未登录或令牌失效时抛出 INVALID_TOKEN"""
+    token = get_token(request)
+    user = session_manager.verify(token) if token else None
+    if user is None:
+        raise AppException(*AppException.get_error("INVALID_TOKEN"))
+    return user
+
+
+def require_permission(permission: str):
+    """FastAPI 依赖工厂: 要求当前用户具备指定权限"""
+    async def dependency(user: CurrentUser = Depends(get_current_user)) -> CurrentUser:
+        if not user.has(permission):
+            raise AppException(*AppException.get_error("PERMISSION_DENIED"), permission)
+        return user
+    return dependency
+
+
+def can_access_person(user: CurrentUser, person_id: str) -> bool:
+    """普通用户只能访问本人信息（用户名即人员ID）, 具备 info:all 权限可访问所有人"""
+    return user.username == person_id or user.has("info:all")
+
+
+def check_person_access(user: CurrentUser, person_id: str):
+    if not can_access_person(user, person_id):
+        raise AppException(*AppException.get_error("PERMISSION_DENIED"), person_id)
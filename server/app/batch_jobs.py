@@ -0,0 +1,103 @@
+import uuid
+import asyncio
+from datetime import datetime
+from collections import OrderedDict
+from loguru import logger
+from .api_common import AppException
+
+
+class BatchJob:
+    """批量填表任务, 记录任务状态及每个人员的处理进度"""
+    def __init__(self, table_name: str, persons: list, owner: str = None, mode: str = "per_person"):
+        self.job_id = uuid.uuid4().hex
+        self.table_name = table_name
+        self.persons = persons
+        self.owner = owner
+        self.mode = mode  # per_person: 每人一份文档打包为zip; roster: 所有人员写入同一张表
+        self.status = "queued"  # queued / running / done / failed
+        self.progress = {person_id: "pending" for person_id in persons}  # pending / done / failed
+        self.errors = {}
+        self.result_path = None
+        self.error = None
+        self.created_at = datetime.now()
+        self.finished_at = None
+
+    def to_dict(self) -> dict:
+        finished = sum(1 for state in self.progress.values() if state != "pending")
+        return {
+            "job_id": self.job_id,
+            "table_name": self.table_name,
+            "mode": self.mode,
+            "status": self.status,
+            "total": len(self.persons),
+            "finished": finished,
+            "progress": self.progress,
+            "errors": self.errors,
+            "error": self.error,
+            "created_at": self.created_at.isoformat(timespec="seconds"),
+            "finished_at": self.finished_at.isoformat(timespec="seconds") if self.finished_at else None,
+        }
+
+
+class BatchJobManager:
+    """
+    批量任务管理器: 有界队列 + 固定数量的 worker 协程, 限制同时执行的任务数。
+    handler 为实际执行任务的协程函数 handler(job), 执行成功后需设置 job.result_path。
+    """
+    def __init__(self, handler, max_concurrent_jobs=2, max_queued_jobs=20, max_finished_jobs=100):
+        self.handler = handler
+        self.max_concurrent_jobs = max_concurrent_jobs
+        self.max_queued_jobs = max_queued_jobs
+        self.max_finished_jobs = max_finished_jobs
+        self.jobs = OrderedDict()
+        self._queue = None
+        self._workers = []
+
+    def _ensure_workers(self):
+        # worker 需在事件循环中创建, 首次提交任务时启动
+        if not self._workers:
+            self._queue = asyncio.Queue(maxsize=self.max_queued_jobs)
+            self._workers = [asyncio.create_task(self._worker()) for _ in range(self.max_concurrent_jobs)]
+
+    def submit(self, table_name: str, persons: list, owner: str = None, mode: str = "per_person") -> BatchJob:
+        self._ensure_workers()
+        job = BatchJob(table_name, persons, owner, mode)
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            raise AppException(*AppException.get_error("JOB_QUEUE_FULL"))
+        self.jobs[job.job_id] = job
+        self._evict_finished()
+        logger.info(f"批量任务已提交: job_id={job.job_id}, table={table_name}, persons={len(persons)}")
+        return job
+
+    def get(self, job_id: str) -> BatchJob:
+        job = self.jobs.get(job_id)
+        if job is None:
+            raise AppException(*AppException.get_error("JOB_NOT_FOUND"))
+        return job
+
+    def _evict_finished(self):
+        finished = [job_id for job_id, job in self.jobs.items() if job.status in ("done", "failed")]
+        for job_id in finished[:max(0, len(finished) - self.max_finished_jobs)]:
+            del self.jobs[job_id]
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            job.status = "running"
+            try:
+                await self.handler(job)
+                job.status = "done"
+            except Exception as e:
+                job.status = "failed"
+                job.error = e.msg if isinstance(e, AppException) else str(e)
+                logger.warning(f"批量任务失败: job_id={job.job_id}, error={job.error}")
+            finally:
+                job.finished_at = datetime.now()
+                self._queue.task_done()
+
+    def shutdown(self):
+        for worker in self._workers:
+            worker.cancel()
+        self._workers = []
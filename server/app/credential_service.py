@@ -0,0 +1,109 @@
+import os
+import json
+import hmac
+import base64
+import asyncio
+import hashlib
+import secrets
+import threading
+from loguru import logger
+from .api_common import AppException, SETTINGS
+from .person_store import write_file_atomic
+
+HASH_ALGORITHM = "pbkdf2_sha256"
+
+
+def hash_password(password: str, iterations: int = 200_000) -> str:
+    """生成加盐哈希, 格式: pbkdf2_sha256$迭代次数$盐$哈希（均为 base64）"""
+    salt = secrets.token_bytes(16)
+    digest = hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt, iterations)
+    return "$".join([HASH_ALGORITHM, str(iterations),
+                     base64.b64encode(salt).decode(), base64.b64encode(digest).decode()])
+
+
+def is_password_hash(value) -> bool:
+    return isinstance(value, str) and value.startswith(HASH_ALGORITHM + "$")
+
+
+def verify_password(password: str, password_hash: str) -> bool:
+    try:
+        _, iterations, salt, expected = password_hash.split("$")
+        digest = hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), base64.b64decode(salt), int(iterations))
+    except ValueError:
+        return False
+    return hmac.compare_digest(digest, base64.b64decode(expected))
+
+
+class CredentialService:
+    """
+    账密校验服务: 账密文件只在首次使用或文件修改后重新加载, 密码以加盐哈希保存,
+    发现明文密码时自动转换为哈希并写回文件。哈希校验在线程池中执行, 不阻塞事件循环。
+    """
+    def __init__(self, password_file="data/login/user_password.json", hash_iterations=200_000,
+                 roles_file="data/login/user_roles.json", default_role="user"):
+        self.password_file = password_file
+        self.hash_iterations = hash_iterations
+        self.roles_file = roles_file
+        self.default_role = default_role
+        self._users = {}
+        self._mtime = None
+        self._roles = {}
+        self._roles_mtime = None
+        self._lock = threading.Lock()
+        # 用户不存在时也执行一次哈希, 避免通过响应时间探测用户名
+        self._dummy_hash = hash_password(secrets.token_hex(8), hash_iterations)
+
+    def _load(self) -> dict:
+        try:
+            mtime = os.stat(self.password_file).st_mtime_ns
+        except FileNotFoundError:
+            raise AppException(*AppException.get_error("DATABASE_ERROR"), "账密文件不存在")
+        if mtime == self._mtime:
+            return self._users
+        with self._lock:
+            if mtime == self._mtime:
+                return self._users
+            try:
+                with open(self.password_file, "r", encoding="utf-8") as f:
+                    users = json.load(f)
+            except ValueError:
+                raise AppException(*AppException.get_error("USER_CONFIG_FILE_FORMAT_ERROR"))
+            plain = [username for username, value in users.items() if not is_password_hash(value)]
+            if plain:
+                for username in plain:
+                    users[username] = hash_password(users[username], self.hash_iterations)
+                write_file_atomic(self.password_file, json.dumps(users, ensure_ascii=False, indent=4))
+                mtime = os.stat(self.password_file).st_mtime_ns
+                logger.info(f"账密文件中 {len(plain)} 个明文密码已转换为加盐哈希")
+            self._users, self._mtime = users, mtime
+            logger.info(f"账密文件已加载: {len(users)} 个用户")
+            return users
+
+    def get_role(self, username: str) -> str:
+        """查询用户角色, 角色文件修改后自动重新加载, 未配置的用户为默认角色"""
+        try:
+            mtime = os.stat(self.roles_file).st_mtime_ns
+        except FileNotFoundError:
+            return self.default_role
+        if mtime != self._roles_mtime:
+            with open(self.roles_file, "r", encoding="utf-8") as f:
+                self._roles = json.load(f)
+            self._roles_mtime = mtime
+        return self._roles.get(username, self.default_role)
+
+    async def verify(self, username: str, password: str) -> bool:
+        users = await asyncio.to_thread(self._load)
+        password_hash = users.get(username)
+        if password_hash is None:
+            await asyncio.to_thread(verify_password, password, self._dummy_hash)
+            return False
+        return await asyncio.to_thread(verify_password, password, password_hash)
+
+
+_auth_settings = SETTINGS.get("AUTH", {})
+credential_service = CredentialService(
+    _auth_settings.get("password_file", "data/login/user_password.json"),
+    _auth_settings.get("hash_iterations", 200_000),
+    _auth_settings.get("roles_file", "data/login/user_roles.json"),
+    _auth_settings.get("default_role", "user"),
+)
@@ -1,14 +1,31 @@
 import os
+import copy
 import json
+import asyncio
 import shutil
-from fastapi import APIRouter, UploadFile, File, Form
+import hashlib
+import mimetypes
+from fastapi import APIRouter, UploadFile, File, Form, Request, Response, Header, Depends
+from typing import List, Dict
 from pydantic import BaseModel
-from .api_common import AppException, APIResponse, make_responses, auto_handle_exceptions
+from .api_common import AppException, APIResponse, make_responses, auto_handle_exceptions, limit_request_body, LimitedBodyRoute, SETTINGS
+from .person_store import person_store, person_locks
+from .auth import CurrentUser, get_current_user, require_permission, can_access_person, check_person_access, allow_query_token
+from utils.http_cache import cached_file_response
+from utils.json_patch import apply_merge_patch, apply_json_patch
+from lib.avatar_images import AvatarProcessor, InvalidImageError, sniff_image_format, variant_path, VARIANT_PRINT, VARIANT_THUMB
 from loguru import logger
 import aiofiles
 
 
-router = APIRouter(tags=["info"])
+router = APIRouter(tags=["info"], dependencies=[Depends(get_current_user)], route_class=LimitedBodyRoute)
+
+# 头像上传处理: 校验格式、去除元数据、生成证件照打印图和缩略图
+avatar_processor = AvatarProcessor(**SETTINGS.get("AVATAR", {}))
+_avatar_upload_settings = SETTINGS.get("AVATAR_UPLOAD", {})
+AVATAR_UPLOAD_MAX_BYTES = _avatar_upload_settings.get("max_bytes", 10 * 1024 * 1024)
+# 整个请求体的上限: 头像文件上限加上表单字段和 multipart 分隔符的余量
+AVATAR_UPLOAD_MAX_BODY_BYTES = AVATAR_UPLOAD_MAX_BYTES + _avatar_upload_settings.get("form_overhead_bytes", 64 * 1024)
 
 class PersonInfo(BaseModel):
     # 可根据实际字段补充
@@ -21,23 +38,186 @@ class CreatePersonRequest(BaseModel):
 class UpdatePersonRequest(BaseModel):
     person_info: dict
 
+class BatchGetRequest(BaseModel):
+    person_ids: List[str]
+
+class BatchUpdateRequest(BaseModel):
+    persons: Dict[str, dict]
+
+def _etag(person_info: dict) -> str:
+    """根据个人信息内容计算强 ETag"""
+    content = json.dumps(person_info, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return '"' + hashlib.sha256(content.encode("utf-8")).hexdigest()[:32] + '"'
+
+def _check_if_match(if_match, person_info):
+    """If-Match 前置条件校验, 未携带时跳过; 不匹配时抛出 PRECONDITION_FAILED"""
+    if if_match is None or if_match.strip() == "*":
+        return
+    current = _etag(person_info) if person_info is not None else None
+    if current not in [tag.strip() for tag in if_match.split(",")]:
+        raise AppException(*AppException.get_error("PRECONDITION_FAILED"), {"etag": current})
+
 # 示例接口：创建基本信息
-@router.post("/create_person", response_model=APIResponse, responses=make_responses('UNKNOWN_ERROR'))
+@router.post("/create_person", response_model=APIResponse, responses=make_responses('PERMISSION_DENIED', 'UNKNOWN_ERROR'))
 @auto_handle_exceptions
-async def create_info(request: CreatePersonRequest):
-    person_data_path = f"data/persons/{request.id}.json"
-    async with aiofiles.open(person_data_path, "w", encoding="utf-8") as file:
-        await file.write(json.dumps(request.person, ensure_ascii=False))
+async def create_info(request: CreatePersonRequest, user: CurrentUser = Depends(get_current_user)):
+    check_person_access(user, request.id)
+    async with person_locks.lock(request.id):
+        await person_store.save(request.id, request.person)
     item = {"id": request.id, "info": request.person}
     return APIResponse(code=200, msg="创建成功", data=item)
 
+# 示例接口：按姓名/身份证号查询人员列表
+@router.get("/search", response_model=APIResponse, responses=make_responses('PERMISSION_DENIED', 'UNKNOWN_ERROR'),
+            dependencies=[Depends(require_permission("info:all"))])
+@auto_handle_exceptions
+async def search_info(name: str = None, id_card: str = None, limit: int = 100):
+    """
+    按姓名/身份证号查询人员, 不传条件时列出全部人员
+
+    请求格式:
+        GET /info/search?name=李四&id_card=330104199508154428&limit=100
+
+    返回:
+        status: 状态码
+        message: 提示信息
+        data: [{"person_id": 人员ID, "姓名": 姓名, "身份证号": 身份证号}]
+    """
+    persons = await person_store.search(name=name, id_card=id_card, limit=limit)
+    return APIResponse(code=200, msg="查询成功", data=persons)
+
+@router.get("/cache_stats", response_model=APIResponse, responses=make_responses('PERMISSION_DENIED', 'UNKNOWN_ERROR'),
+            dependencies=[Depends(require_permission("info:all"))])
+@auto_handle_exceptions
+async def get_cache_stats():
+    """
+    获取人员信息缓存的命中统计, 未启用缓存时返回 None
+
+    返回:
+        status: 状态码
+        message: 提示信息
+        data: {"hits": 命中数, "misses": 未命中数, "entries": 缓存条数, "bytes": 估算占用, ...}
+    """
+    stats = person_store.stats() if hasattr(person_store, "stats") else None
+    return APIResponse(code=200, msg="查询成功", data=stats)
+
+# 批量接口：一次查询多人信息
+@router.post("/batch_get", response_model=APIResponse, responses=make_responses('UNKNOWN_ERROR'))
+@auto_handle_exceptions
+async def batch_get_info(request: BatchGetRequest, user: CurrentUser = Depends(get_current_user)):
+    """
+    批量获取个人基本信息, 并发读取, 单人失败不影响其他人
+
+    请求格式:
+    ```json
+    {
+        "person_ids": ["lisi", "zhangsan"]
+    }
+    ```
+    返回:
+        status: 状态码
+        message: 提示信息
+        data: {"results": {person_id: 个人信息字典}, "errors": {person_id: 错误信息}}
+    """
+    async def get_one(person_id):
+        if not can_access_person(user, person_id):
+            return person_id, None, AppException.get_error("PERMISSION_DENIED")[1]
+        try:
+            person_info = await person_store.get(person_id)
+        except Exception as e:
+            return person_id, None, str(e)
+        if person_info is None:
+            return person_id, None, AppException.get_error("PERSON_NOT_FOUND")[1]
+        return person_id, person_info, None
+
+    results, errors = {}, {}
+    for person_id, person_info, error in await asyncio.gather(*(get_one(p) for p in dict.fromkeys(request.person_ids))):
+        if error:
+            errors[person_id] = error
+        else:
+            results[person_id] = person_info
+    return APIResponse(code=200, msg="查询成功", data={"results": results, "errors": errors})
+
+# 批量接口：一次局部更新多人信息
+@router.post("/batch_update", response_model=APIResponse, responses=make_responses('UNKNOWN_ERROR'))
+@auto_handle_exceptions
+async def batch_update_info(request: BatchUpdateRequest, user: CurrentUser = Depends(get_current_user)):
+    """
+    批量局部更新个人信息, 每人的补丁按 RFC 7396 Merge Patch 合并（同 PATCH /info/{person_id}）,
+    未出现的字段保持不变, 值为 null 表示删除该字段; 单人失败不影响其他人
+
+    请求格式:
+    ```json
+    {
+        "persons": {"lisi": {"基本信息": {"个人信息": {"联系电话": "13800000000"}}}, "zhangsan": { ... }}
+    }
+    ```
+    返回:
+        status: 状态码
+        message: 提示信息
+        data: {"results": {person_id: 更新后的个人信息}, "errors": {person_id: 错误信息}}
+    """
+    async def update_one(person_id, patch):
+        if not can_access_person(user, person_id):
+            return person_id, None, AppException.get_error("PERMISSION_DENIED")[1]
+        try:
+            # 读取、合并、写回在同一把人员锁内完成
+            async with person_locks.lock(person_id):
+                person_info = await person_store.get(person_id)
+                if person_info is None:
+                    return person_id, None, AppException.get_error("PERSON_NOT_FOUND")[1]
+                new_person_info = apply_merge_patch(person_info, patch)
+                await person_store.save(person_id, new_person_info)
+        except Exception as e:
+            return person_id, None, str(e)
+        return person_id, new_person_info, None
+
+    results, errors = {}, {}
+    for person_id, person_info, error in await asyncio.gather(*(update_one(p, patch) for p, patch in request.persons.items())):
+        if error:
+            errors[person_id] = error
+        else:
+            results[person_id] = person_info
+    return APIResponse(code=200, msg="修改成功", data={"results": results, "errors": errors})
+
+@router.get("/avatar/{person_id}", responses=make_responses('AVATAR_NOT_FOUND', 'PERMISSION_DENIED', 'UNKNOWN_ERROR'))
+@allow_query_token
+@auto_handle_exceptions
+async def get_avatar(person_id: str, http_request: Request, size: str = "original",
+                     user: CurrentUser = Depends(get_current_user)):
+    """
+    获取人员头像图片。头像不再经 /static 公开访问, 与人员信息同样校验访问权限。
+    <img> 无法设置请求头, 可通过 ?token={token} 携带会话令牌。
+
+    参数:
+        size: original 为原图; thumb 为上传时生成的网页缩略图, print 为证件照打印图, 派生图不存在（早期上传的头像）时返回原图
+
+    返回:
+        图片文件流（FileResponse）, 附带 ETag, 浏览器再次加载时条件请求命中返回 304
+    """
+    check_person_access(user, person_id)
+    person_info = await person_store.get(person_id)
+    photo = (person_info or {}).get("基本信息", {}).get("个人信息", {}).get("照片")
+    avatar_dir = os.path.abspath(os.path.join("static", "img", person_id))
+    # 只允许读取该人员头像目录下的文件
+    if not isinstance(photo, str) or os.path.dirname(os.path.abspath(photo)) != avatar_dir:
+        raise AppException(*AppException.get_error("AVATAR_NOT_FOUND"), person_id)
+    if size in (VARIANT_THUMB, VARIANT_PRINT) and os.path.isfile(variant_path(photo, size)):
+        photo = variant_path(photo, size)
+    media_type = mimetypes.guess_type(photo)[0] or "application/octet-stream"
+    response = await cached_file_response(http_request, photo, media_type,
+                                          headers={"X-Content-Type-Options": "nosniff"})
+    if response is None:
+        raise AppException(*AppException.get_error("AVATAR_NOT_FOUND"), person_id)
+    return response
+
 # 示例接口：获取个人基本信息
-@router.get("/{person_id}", response_model=APIResponse, responses=make_responses('PERSON_NOT_FOUND', 'UNKNOWN_ERROR'))
+@router.get("/{person_id}", response_model=APIResponse, responses=make_responses('PERSON_NOT_FOUND', 'PERMISSION_DENIED', 'UNKNOWN_ERROR'))
 @auto_handle_exceptions
-async def get_info(person_id: str):
+async def get_info(person_id: str, response: Response, user: CurrentUser = Depends(get_current_user)):
     """
     获取个人基本信息
-    TODO 人信息存储在 data/persons 目录下的 JSON 文件中， 后期完善要换成数据库
+    人员信息通过 person_store 读取, 存储后端（JSON 文件 / SQLite）见 config/server_config.yaml
 
     参数:
         person_id: 个人唯一标识
@@ -49,21 +229,21 @@ async def get_info(person_id: str):
         status: 状态码
         message: 提示信息
         data: {"person_id": person_id, "info": {个人信息字典}}
+        响应头 ETag 可用于 PUT/PATCH 的 If-Match 前置条件
     """
-    person_data_path = f"data/persons/{person_id}.json"
-    try:
-        async with aiofiles.open(person_data_path, "r", encoding="utf-8") as file:
-            content = await file.read()
-            person_info = json.loads(content)
-        data = {"person_id": person_id, "info": person_info}
-    except FileNotFoundError:
+    check_person_access(user, person_id)
+    person_info = await person_store.get(person_id)
+    if person_info is None:
         raise AppException(*AppException.get_error("PERSON_NOT_FOUND"))
+    data = {"person_id": person_id, "info": person_info}
+    response.headers["ETag"] = _etag(person_info)
     return APIResponse(code=200, msg="查询成功", data=data)
 
 # 示例接口：更新基本信息
-@router.put("/{person_id}", response_model=APIResponse, responses=make_responses('UNKNOWN_ERROR'))
+@router.put("/{person_id}", response_model=APIResponse, responses=make_responses('PRECONDITION_FAILED', 'PERMISSION_DENIED', 'UNKNOWN_ERROR'))
 @auto_handle_exceptions
-async def update_info(person_id: str, request: UpdatePersonRequest):
+async def update_info(person_id: str, request: UpdatePersonRequest, response: Response, if_match: str = Header(None),
+                      user: CurrentUser = Depends(get_current_user)):
     """
     更新用户信息
 
@@ -77,15 +257,68 @@ async def update_info(person_id: str, request: UpdatePersonRequest):
         "person_info": { ... }
     }
     ```
+    携带 If-Match 请求头时, 仅当与当前 ETag 一致才会更新
     返回:
         status: 状态码
         message: 提示信息
         data: {"person_id": person_id, "updated_info": person_info}
     """
+    check_person_access(user, person_id)
     new_person_info = request.person_info
-    person_data_path = f"data/persons/{person_id}.json"
-    async with aiofiles.open(person_data_path, "w", encoding="utf-8") as file:
-        await file.write(json.dumps(new_person_info, ensure_ascii=False))
+    async with person_locks.lock(person_id):
+        if if_match is not None:
+            _check_if_match(if_match, await person_store.get(person_id))
+        await person_store.save(person_id, new_person_info)
+    response.headers["ETag"] = _etag(new_person_info)
+    return APIResponse(code=200, msg="修改成功", data={"person_id": person_id, "updated_info": new_person_info})
+
+# 示例接口：局部更新基本信息
+@router.patch("/{person_id}", response_model=APIResponse, responses=make_responses(
+    'PERSON_NOT_FOUND', 'INVALID_PATCH', 'PRECONDITION_FAILED', 'PERMISSION_DENIED', 'UNKNOWN_ERROR'))
+@auto_handle_exceptions
+async def patch_info(person_id: str, request: Request, response: Response, if_match: str = Header(None),
+                     user: CurrentUser = Depends(get_current_user)):
+    """
+    局部更新用户信息, 根据 Content-Type 选择补丁格式:
+    - application/merge-patch+json（默认）: RFC 7396, 值为 null 表示删除该字段
+    - application/json-patch+json: RFC 6902, 操作数组
+
+    携带 If-Match 请求头时, 仅当与当前 ETag 一致才会更新, 避免并发编辑互相覆盖
+
+    请求格式:
+    ```json
+    {"基本信息": {"个人信息": {"联系电话": "13800000000"}}}
+    ```
+    ```json
+    [{"op": "replace", "path": "/基本信息/个人信息/联系电话", "value": "13800000000"}]
+    ```
+    返回:
+        status: 状态码
+        message: 提示信息
+        data: {"person_id": person_id, "updated_info": 更新后的个人信息}
+    """
+    check_person_access(user, person_id)
+    try:
+        patch = await request.json()
+    except ValueError:
+        raise AppException(*AppException.get_error("INVALID_PATCH"), "请求体不是合法的 JSON")
+    # 读取、校验、应用补丁、写回在同一把人员锁内完成
+    async with person_locks.lock(person_id):
+        person_info = await person_store.get(person_id)
+        if person_info is None:
+            raise AppException(*AppException.get_error("PERSON_NOT_FOUND"))
+        _check_if_match(if_match, person_info)
+        try:
+            if "json-patch" in request.headers.get("content-type", ""):
+                new_person_info = apply_json_patch(person_info, patch)
+            else:
+                new_person_info = apply_merge_patch(person_info, patch)
+        except ValueError as e:
+            raise AppException(*AppException.get_error("INVALID_PATCH"), str(e))
+        if not isinstance(new_person_info, dict):
+            raise AppException(*AppException.get_error("INVALID_PATCH"), "更新后的个人信息必须是对象")
+        await person_store.save(person_id, new_person_info)
+    response.headers["ETag"] = _etag(new_person_info)
     return APIResponse(code=200, msg="修改成功", data={"person_id": person_id, "updated_info": new_person_info})
     
 # 示例接口：删除基本信息
@@ -93,10 +326,25 @@ async def update_info(person_id: str, request: UpdatePersonRequest):
 # def delete_info(item_id: str):
 #     return {"message": "Item deleted successfully", "item_id": item_id}
 
+def _check_avatar_upload(file: UploadFile):
+    """
+    校验已接收的头像文件: 文件头必须是支持的图片格式, 大小不超过上限。
+    请求体在解析表单前已由 LimitedBodyRoute 限制大小, 这里只需检查文件本身。
+    """
+    header = file.file.read(16)
+    file.file.seek(0)
+    if not header:
+        raise AppException(*AppException.get_error("INVALID_IMG_TYPE"), "文件为空")
+    if sniff_image_format(header) is None:
+        raise AppException(*AppException.get_error("INVALID_IMG_TYPE"), "文件内容不是 jpg/png/gif 图片")
+    if file.size is not None and file.size > AVATAR_UPLOAD_MAX_BYTES:
+        raise AppException(*AppException.get_error("AVATAR_TOO_LARGE"), f"上限 {AVATAR_UPLOAD_MAX_BYTES} 字节")
+
 # 上传头像接口
-@router.post("/upload_avatar", response_model=APIResponse, responses=make_responses('PERSON_NOT_FOUND', 'PERSON_INFO_STRUCTURE_ERROR', 'INVALID_IMG_TYPE', 'UNKNOWN_ERROR'))
+@router.post("/upload_avatar", response_model=APIResponse, responses=make_responses('PERSON_NOT_FOUND', 'PERSON_INFO_STRUCTURE_ERROR', 'INVALID_IMG_TYPE', 'AVATAR_TOO_LARGE', 'PERMISSION_DENIED', 'UNKNOWN_ERROR'))
+@limit_request_body(AVATAR_UPLOAD_MAX_BODY_BYTES, "AVATAR_TOO_LARGE")
 @auto_handle_exceptions
-async def upload_avatar(person_id: str = Form(...), file: UploadFile = File(...)):
+async def upload_avatar(person_id: str = Form(...), file: UploadFile = File(...), user: CurrentUser = Depends(get_current_user)):
     """
     上传用户头像并自动更新用户信息中的照片字段。
 
@@ -112,32 +360,33 @@ async def upload_avatar(person_id: str = Form(...), file: UploadFile = File(...)
     返回:
         status: 状态码
         message: 提示信息
-        data: 头像图片的静态资源路径
+        data: 头像图片路径; 页面显示使用 GET /avatar/{person_id}?size=thumb 获取缩略图
     """
     logger.info(f"上传头像请求: person_id={person_id}, file={file.filename}")
-    json_path = os.path.join("data", "persons", f"{person_id}.json")
-    if not os.path.exists(json_path):
-        code, msg = AppException.get_error("PERSON_NOT_FOUND")
-        raise AppException(code, msg)
-    async with aiofiles.open(json_path, "r", encoding="utf-8") as f:
-        content = await f.read()
-        data = json.loads(content)
-    if not ("基本信息" in data and "个人信息" in data["基本信息"]):
-        code, msg = AppException.get_error("PERSON_INFO_STRUCTURE_ERROR")
-        raise AppException(code, msg)
-    user_img_dir = os.path.join("static", "img", person_id)
-    os.makedirs(user_img_dir, exist_ok=True)
+    check_person_access(user, person_id)
     ext = os.path.splitext(file.filename)[1].lower()
     if ext not in ['.jpg', '.jpeg', '.png', '.gif']:
         code, msg = AppException.get_error("INVALID_IMG_TYPE")
         raise AppException(code, msg)
-    avatar_filename = f"{person_id}-avatar{ext}"
-    avatar_path = os.path.join(user_img_dir, avatar_filename)
-    async with aiofiles.open(avatar_path, "wb") as buffer:
-        content = await file.read()
-        await buffer.write(content)
-    avatar_url = f"static/img/{person_id}/{avatar_filename}"
-    data["基本信息"]["个人信息"]["照片"] = avatar_url
-    async with aiofiles.open(json_path, "w", encoding="utf-8") as f:
-        await f.write(json.dumps(data, ensure_ascii=False, indent=4))
+    _check_avatar_upload(file)
+    # 图片处理较慢, 放在人员锁外进行; 直接读取表单解析时已落盘的上传文件, 不再另存副本
+    # 按文件头校验格式、去除元数据并生成证件照打印图和缩略图, 保存的扩展名以实际格式为准
+    try:
+        avatar = await asyncio.to_thread(avatar_processor.process, file.file)
+    except InvalidImageError as e:
+        raise AppException(*AppException.get_error("INVALID_IMG_TYPE"), str(e))
+    # 头像文件与人员信息的读-改-写在同一把人员锁内完成
+    async with person_locks.lock(person_id):
+        data = copy.deepcopy(await person_store.get(person_id))
+        if data is None:
+            code, msg = AppException.get_error("PERSON_NOT_FOUND")
+            raise AppException(code, msg)
+        if not ("基本信息" in data and "个人信息" in data["基本信息"]):
+            code, msg = AppException.get_error("PERSON_INFO_STRUCTURE_ERROR")
+            raise AppException(code, msg)
+        user_img_dir = os.path.join("static", "img", person_id)
+        avatar_path = await asyncio.to_thread(avatar.save, user_img_dir, f"{person_id}-avatar")
+        avatar_url = f"static/img/{person_id}/{os.path.basename(avatar_path)}"
+        data["基本信息"]["个人信息"]["照片"] = avatar_url
+        await person_store.save(person_id, data)
     return APIResponse(code=200, msg="头像上传并信息更新成功", data=avatar_url)
\ No newline at end of file
@@ -0,0 +1,188 @@
+import os
+import time
+import uuid
+import shutil
+import asyncio
+from collections import OrderedDict
+from loguru import logger
+from .api_common import SETTINGS
+
+
+class OutputCache:
+    """
+    按内容寻址的渲染结果缓存: 缓存键由模板版本和人员信息内容的哈希决定（见 table_handler._render_cache_key）,
+    内容不变时直接复用已生成的文件, 不再重新渲染。磁盘占用超过 max_bytes 时按最近使用顺序淘汰。
+    同一缓存键同时只渲染一次, 并发的相同请求等待同一次渲染。
+    """
+    def __init__(self, cache_dir="data/output_cache", max_bytes=512 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # 文件名 -> 字节数, 按最近使用排序
+        self._total_bytes = 0
+        self._pending = {}  # 文件名 -> asyncio.Future
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(cache_dir, exist_ok=True)
+        self._load()
+
+    def _load(self):
+        files = []
+        for entry in os.scandir(self.cache_dir):
+            if not entry.is_file():
+                continue
+            if entry.name.endswith(".tmp"):
+                # 上次退出时未完成的渲染
+                os.remove(entry.path)
+                continue
+            stat = entry.stat()
+            files.append((stat.st_mtime, entry.name, stat.st_size))
+        for _, name, size in sorted(files):
+            self._entries[name] = size
+            self._total_bytes += size
+        logger.info(f"渲染结果缓存已加载: {len(self._entries)} 个文件, {self._total_bytes} 字节")
+
+    def _path(self, name):
+        return os.path.join(self.cache_dir, name)
+
+    def _add(self, name):
+        size = os.path.getsize(self._path(name))
+        self._total_bytes += size - self._entries.pop(name, 0)
+        self._entries[name] = size
+        while self._total_bytes > self.max_bytes and len(self._entries) > 1:
+            evicted, evicted_size = self._entries.popitem(last=False)
+            self._total_bytes -= evicted_size
+            try:
+                os.remove(self._path(evicted))
+            except FileNotFoundError:
+                pass
+
+    def _lookup(self, name):
+        if name not in self._entries:
+            return None
+        if not os.path.exists(self._path(name)):
+            self._total_bytes -= self._entries.pop(name)
+            return None
+        self._entries.move_to_end(name)
+        return self._path(name)
+
+    @staticmethod
+    def _publish(cached_path, output_path):
+        """把缓存文件以硬链接（不支持时复制）发布到 output_path, 并刷新修改时间供清理和淘汰参考"""
+        os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+        tmp_path = f"{output_path}.{uuid.uuid4().hex}.tmp"
+        try:
+            try:
+                os.link(cached_path, tmp_path)
+            except OSError:
+                shutil.copyfile(cached_path, tmp_path)
+            os.replace(tmp_path, output_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        os.utime(output_path)
+
+    async def fetch(self, key: str, ext: str, output_path: str, render) -> str:
+        """
+        返回发布到 output_path 的文件路径。未命中时调用 render(path) 协程把文件渲染到 path 后写入缓存。
+        """
+        name = f"{key}.{ext}"
+        cached = self._lookup(name)
+        if cached is not None:
+            self.hits += 1
+        elif name in self._pending:
+            self.hits += 1
+            cached = await asyncio.shield(self._pending[name])
+        else:
+            self.misses += 1
+            future = asyncio.get_running_loop().create_future()
+            self._pending[name] = future
+            tmp_path = self._path(f"{name}.{uuid.uuid4().hex}.tmp")
+            try:
+                await render(tmp_path)
+                os.replace(tmp_path, self._path(name))
+                self._add(name)
+                cached = self._path(name)
+                future.set_result(cached)
+            except BaseException as e:
+                future.set_exception(e)
+                # 没有等待者时避免 "exception was never retrieved" 警告
+                future.exception()
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+            finally:
+                del self._pending[name]
+        await asyncio.to_thread(self._publish, cached, output_path)
+        return output_path
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "total_bytes": self._total_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+class OutputDirectoryCleaner:
+    """
+    输出目录清理: 定期删除超过 max_age_seconds 的文件, 剩余文件总大小超过 max_bytes 时从最旧的开始删除。
+    """
+    def __init__(self, directory="static/output", max_age_seconds=7 * 24 * 3600, max_bytes=1024 * 1024 * 1024,
+                 interval_seconds=600):
+        self.directory = directory
+        self.max_age_seconds = max_age_seconds
+        self.max_bytes = max_bytes
+        self.interval_seconds = interval_seconds
+        self._task = None
+
+    def clean(self) -> int:
+        """执行一次清理, 返回删除的文件数"""
+        now = time.time()
+        files, removed = [], 0
+        try:
+            entries = list(os.scandir(self.directory))
+        except FileNotFoundError:
+            return 0
+        for entry in entries:
+            if not entry.is_file():
+                continue
+            stat = entry.stat()
+            files.append((stat.st_mtime, entry.path, stat.st_size))
+        files.sort()
+        total_bytes = sum(size for _, _, size in files)
+        for mtime, path, size in files:
+            if now - mtime <= self.max_age_seconds and total_bytes <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                removed += 1
+            except FileNotFoundError:
+                pass
+            total_bytes -= size
+        if removed:
+            logger.info(f"输出目录清理完成: 删除 {removed} 个文件, 剩余 {total_bytes} 字节")
+        return removed
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.to_thread(self.clean)
+            except Exception as e:
+                logger.warning(f"输出目录清理失败: {e}")
+            await asyncio.sleep(self.interval_seconds)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+
+output_cache = OutputCache(**SETTINGS.get("OUTPUT_CACHE", {}))
+output_cleaner = OutputDirectoryCleaner(**SETTINGS.get("OUTPUT_CLEANUP", {}))
@@ -0,0 +1,367 @@
+import os
+import json
+import uuid
+import queue
+import asyncio
+import sqlite3
+from collections import OrderedDict
+from datetime import datetime
+from contextlib import contextmanager, asynccontextmanager
+from loguru import logger
+import aiofiles
+from .api_common import SETTINGS
+
+
+def _person_fields(data: dict) -> tuple:
+    """提取需要建立索引的常用字段: (姓名, 身份证号)"""
+    info = data.get("基本信息", {}).get("个人信息", {}) if isinstance(data, dict) else {}
+    return info.get("姓名") or None, info.get("身份证号") or None
+
+
+class PersonLockManager:
+    """
+    按人员ID划分的异步锁: 同一人员的读-改-写串行执行, 不同人员之间互不阻塞。
+    锁在无人持有/等待时自动释放, 避免锁字典无限增长。
+    """
+    def __init__(self):
+        self._locks = {}  # person_id -> [asyncio.Lock, 引用计数]
+
+    @asynccontextmanager
+    async def lock(self, person_id: str):
+        entry = self._locks.setdefault(person_id, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._locks[person_id]
+
+
+class _DirectorySyncer:
+    """
+    目录 fsync 合并器: rename 之后需要 fsync 所在目录才能保证落盘,
+    短时间内的多次写入共享同一次目录 fsync(group commit), 每个写入方都等待该次 fsync 完成。
+    """
+    def __init__(self, directory, delay=0.005):
+        self.directory = directory
+        self.delay = delay
+        self._pending = None
+
+    async def sync(self):
+        if os.name == "nt":
+            # Windows 不支持对目录 fsync, os.replace 本身已是原子操作
+            return
+        if self._pending is None:
+            self._pending = asyncio.ensure_future(self._run())
+        await asyncio.shield(self._pending)
+
+    async def _run(self):
+        await asyncio.sleep(self.delay)
+        # 从此刻起的新写入加入下一批
+        self._pending = None
+        await asyncio.to_thread(self._fsync_dir)
+
+    def _fsync_dir(self):
+        fd = os.open(self.directory, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+
+def write_file_atomic(path: str, content: str):
+    """先写入同目录临时文件并 fsync, 再 os.replace 覆盖目标文件, 中途崩溃不会留下半截文件"""
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class PersonStore:
+    """
+    人员信息存储接口, 所有方法均为协程, 数据为人员信息字典。
+    get 在人员不存在时返回 None, 由调用方决定如何报错。
+    """
+    async def get(self, person_id: str):
+        raise NotImplementedError
+
+    async def save(self, person_id: str, data: dict):
+        raise NotImplementedError
+
+    async def exists(self, person_id: str) -> bool:
+        return await self.get(person_id) is not None
+
+    async def search(self, name: str = None, id_card: str = None, limit: int = 100) -> list:
+        """按姓名/身份证号精确查询, 参数都为空时列出全部人员, 返回 [{"person_id", "姓名", "身份证号"}]"""
+        raise NotImplementedError
+
+    def version(self, person_id: str):
+        """记录在存储中的版本标识, 用于发现绕过接口的外部修改; None 表示不支持"""
+        return None
+
+    def close(self):
+        pass
+
+
+class JsonFilePersonStore(PersonStore):
+    """兼容原有存储方式: 每人一个 data/persons/{id}.json 文件, 写入采用临时文件 + rename 保证原子性"""
+    def __init__(self, data_dir="data/persons"):
+        self.data_dir = data_dir
+        self._dir_syncer = _DirectorySyncer(data_dir)
+
+    def path(self, person_id: str) -> str:
+        return os.path.join(self.data_dir, f"{person_id}.json")
+
+    async def get(self, person_id: str):
+        try:
+            async with aiofiles.open(self.path(person_id), "r", encoding="utf-8") as f:
+                return json.loads(await f.read())
+        except FileNotFoundError:
+            return None
+
+    async def save(self, person_id: str, data: dict):
+        content = json.dumps(data, ensure_ascii=False, indent=4)
+        await asyncio.to_thread(write_file_atomic, self.path(person_id), content)
+        await self._dir_syncer.sync()
+
+    async def exists(self, person_id: str) -> bool:
+        return os.path.exists(self.path(person_id))
+
+    def version(self, person_id: str):
+        try:
+            return os.stat(self.path(person_id)).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    async def search(self, name: str = None, id_card: str = None, limit: int = 100) -> list:
+        results = []
+        for filename in sorted(os.listdir(self.data_dir)):
+            if not filename.endswith(".json"):
+                continue
+            person_id = filename[:-len(".json")]
+            person_name, person_id_card = _person_fields(await self.get(person_id) or {})
+            if (name and person_name != name) or (id_card and person_id_card != id_card):
+                continue
+            results.append({"person_id": person_id, "姓名": person_name, "身份证号": person_id_card})
+            if len(results) >= limit:
+                break
+        return results
+
+
+class SqlitePersonStore(PersonStore):
+    """
+    SQLite 存储: WAL 模式 + 固定大小连接池, 姓名/身份证号单独成列并建索引, 完整信息以 JSON 文本保存。
+    sqlite3 为同步接口, 所有操作通过 asyncio.to_thread 在线程池中执行。
+    """
+    def __init__(self, db_path="data/persons.db", pool_size=4, import_dir=None):
+        self.db_path = db_path
+        self._pool = queue.Queue()
+        for _ in range(pool_size):
+            self._pool.put(self._connect())
+        with self._connection() as conn:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS persons (
+                    person_id  TEXT PRIMARY KEY,
+                    name       TEXT,
+                    id_card    TEXT,
+                    data       TEXT NOT NULL,
+                    updated_at TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_persons_name ON persons(name);
+                CREATE INDEX IF NOT EXISTS idx_persons_id_card ON persons(id_card);
+            """)
+            empty = conn.execute("SELECT 1 FROM persons LIMIT 1").fetchone() is None
+        if empty and import_dir and os.path.isdir(import_dir):
+            self._import_json_dir(import_dir)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    @contextmanager
+    def _connection(self):
+        conn = self._pool.get()
+        try:
+            yield conn
+        finally:
+            self._pool.put(conn)
+
+    def _import_json_dir(self, import_dir):
+        """首次启用数据库时导入原有的 JSON 人员文件"""
+        count = 0
+        for filename in os.listdir(import_dir):
+            if not filename.endswith(".json"):
+                continue
+            with open(os.path.join(import_dir, filename), "r", encoding="utf-8") as f:
+                self._save(filename[:-len(".json")], json.load(f))
+            count += 1
+        logger.info(f"已从 {import_dir} 导入 {count} 条人员信息到 {self.db_path}")
+
+    def _get(self, person_id):
+        with self._connection() as conn:
+            row = conn.execute("SELECT data FROM persons WHERE person_id = ?", (person_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _save(self, person_id, data):
+        name, id_card = _person_fields(data)
+        with self._connection() as conn:
+            conn.execute(
+                "INSERT INTO persons (person_id, name, id_card, data, updated_at) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(person_id) DO UPDATE SET name=excluded.name, id_card=excluded.id_card, "
+                "data=excluded.data, updated_at=excluded.updated_at",
+                (person_id, name, id_card, json.dumps(data, ensure_ascii=False), datetime.now().isoformat()),
+            )
+
+    def _exists(self, person_id):
+        with self._connection() as conn:
+            return conn.execute("SELECT 1 FROM persons WHERE person_id = ?", (person_id,)).fetchone() is not None
+
+    def _search(self, name, id_card, limit):
+        sql = "SELECT person_id, name, id_card FROM persons"
+        conditions, params = [], []
+        if name:
+            conditions.append("name = ?")
+            params.append(name)
+        if id_card:
+            conditions.append("id_card = ?")
+            params.append(id_card)
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY person_id LIMIT ?"
+        params.append(limit)
+        with self._connection() as conn:
+            rows = conn.execute(sql, params).fetchall()
+        return [{"person_id": row[0], "姓名": row[1], "身份证号": row[2]} for row in rows]
+
+    async def get(self, person_id: str):
+        return await asyncio.to_thread(self._get, person_id)
+
+    async def save(self, person_id: str, data: dict):
+        await asyncio.to_thread(self._save, person_id, data)
+
+    async def exists(self, person_id: str) -> bool:
+        return await asyncio.to_thread(self._exists, person_id)
+
+    async def search(self, name: str = None, id_card: str = None, limit: int = 100) -> list:
+        return await asyncio.to_thread(self._search, name, id_card, limit)
+
+    def close(self):
+        while not self._pool.empty():
+            self._pool.get_nowait().close()
+
+
+class CachedPersonStore(PersonStore):
+    """
+    带 LRU 缓存的人员存储: 按估算内存(JSON 文本长度)限制缓存总量, 写入时同步更新缓存(write-through)。
+    读取时比对后端版本(JSON 文件为 mtime), 文件被手工修改后自动失效重新加载。
+    未命中时在读取前记下版本和写入计数, 读取期间有写入完成则不缓存读到的旧数据。
+    get 返回的是缓存中的共享对象, 调用方修改前需先复制。
+    """
+    def __init__(self, backend: PersonStore, max_bytes=64 * 1024 * 1024):
+        self.backend = backend
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # person_id -> (data, size, version)
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.evictions = 0
+        # 经本实例完成的写入次数, SQLite 等不提供版本的后端靠它发现读取期间的写入
+        self._writes = 0
+
+    def _put(self, person_id, data, version):
+        self._discard(person_id)
+        size = len(json.dumps(data, ensure_ascii=False))
+        if size > self.max_bytes:
+            return
+        self._entries[person_id] = (data, size, version)
+        self._bytes += size
+        while self._bytes > self.max_bytes:
+            _, (_, evicted_size, _) = self._entries.popitem(last=False)
+            self._bytes -= evicted_size
+            self.evictions += 1
+
+    def _discard(self, person_id):
+        entry = self._entries.pop(person_id, None)
+        if entry:
+            self._bytes -= entry[1]
+
+    async def get(self, person_id: str):
+        entry = self._entries.get(person_id)
+        if entry is not None:
+            if entry[2] == self.backend.version(person_id):
+                self._entries.move_to_end(person_id)
+                self.hits += 1
+                return entry[0]
+            self._discard(person_id)
+            self.invalidations += 1
+        self.misses += 1
+        version, writes = self.backend.version(person_id), self._writes
+        data = await self.backend.get(person_id)
+        if data is not None and writes == self._writes and version == self.backend.version(person_id):
+            self._put(person_id, data, version)
+        return data
+
+    async def save(self, person_id: str, data: dict):
+        try:
+            await self.backend.save(person_id, data)
+        except Exception:
+            self._discard(person_id)
+            raise
+        finally:
+            self._writes += 1
+        self._put(person_id, data, self.backend.version(person_id))
+
+    async def exists(self, person_id: str) -> bool:
+        if person_id in self._entries:
+            return True
+        return await self.backend.exists(person_id)
+
+    async def search(self, name: str = None, id_card: str = None, limit: int = 100) -> list:
+        return await self.backend.search(name=name, id_card=id_card, limit=limit)
+
+    def version(self, person_id: str):
+        return self.backend.version(person_id)
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "evictions": self.evictions,
+        }
+
+    def close(self):
+        self.backend.close()
+
+
+def create_person_store(backend="json", data_dir="data/persons", db_path="data/persons.db", pool_size=4,
+                        cache_max_bytes=0) -> PersonStore:
+    if backend == "sqlite":
+        store = SqlitePersonStore(db_path, pool_size, import_dir=data_dir)
+    else:
+        store = JsonFilePersonStore(data_dir)
+    if cache_max_bytes:
+        store = CachedPersonStore(store, cache_max_bytes)
+    return store
+
+
+# 全局人员存储实例, 后端由 server_config.yaml 的 PERSON_STORE 配置决定
+person_store = create_person_store(**SETTINGS.get("PERSON_STORE", {}))
+
+# 全局人员锁, 所有对人员信息的写入(含读-改-写)都需在对应人员的锁内进行
+person_locks = PersonLockManager()
@@ -0,0 +1,136 @@
+import os
+import time
+import asyncio
+import tempfile
+from collections import OrderedDict
+from loguru import logger
+from lib.preview_renderer import convert_document
+
+PREVIEW_MEDIA_TYPES = {"pdf": "application/pdf", "png": "image/png"}
+
+
+class PreviewService:
+    """
+    已填写文档的预览生成服务: 后台取得填写后的文档（由调用方提供的 render 协程, 复用渲染结果缓存）并转换为 pdf/png,
+    结果按缓存键保存在 cache_dir, 相同人员与模板再次预览时直接命中缓存。同时进行的转换数受 max_concurrent 限制。
+    缓存总大小超过 max_bytes 时按最近使用顺序淘汰; 生成失败的记录保留 error_ttl_seconds 后过期, 最多 max_errors 条。
+    """
+    def __init__(self, cache_dir="data/preview_cache", max_concurrent=2,
+                 soffice_path=None, timeout_seconds=60, max_bytes=256 * 1024 * 1024,
+                 error_ttl_seconds=600, max_errors=1000):
+        self.cache_dir = cache_dir
+        self.soffice_path = soffice_path
+        self.timeout_seconds = timeout_seconds
+        self.max_concurrent = max_concurrent
+        self.max_bytes = max_bytes
+        self.error_ttl_seconds = error_ttl_seconds
+        self.max_errors = max_errors
+        self._semaphore = None
+        self._tasks = {}  # preview_id -> asyncio.Task
+        self._errors = OrderedDict()  # preview_id -> (失败时间, 错误信息), 按失败时间排序
+        self._entries = OrderedDict()  # preview_id -> 字节数, 按最近使用排序
+        self._total_bytes = 0
+        os.makedirs(cache_dir, exist_ok=True)
+        self._load()
+
+    def _load(self):
+        files = []
+        for entry in os.scandir(self.cache_dir):
+            if not entry.is_file():
+                continue
+            if entry.name.endswith(".tmp"):
+                # 上次退出时未完成的转换
+                os.remove(entry.path)
+                continue
+            stat = entry.stat()
+            files.append((stat.st_mtime, entry.name, stat.st_size))
+        for _, name, size in sorted(files):
+            self._entries[name] = size
+            self._total_bytes += size
+        self._evict()
+
+    def _add(self, preview_id):
+        size = os.path.getsize(self.path(preview_id))
+        self._total_bytes += size - self._entries.pop(preview_id, 0)
+        self._entries[preview_id] = size
+        self._evict()
+
+    def _evict(self):
+        while self._total_bytes > self.max_bytes and len(self._entries) > 1:
+            evicted, evicted_size = self._entries.popitem(last=False)
+            self._total_bytes -= evicted_size
+            try:
+                os.remove(self.path(evicted))
+            except FileNotFoundError:
+                pass
+
+    def _prune_errors(self):
+        deadline = time.monotonic() - self.error_ttl_seconds
+        while self._errors:
+            preview_id, (failed_at, _) = next(iter(self._errors.items()))
+            if failed_at >= deadline and len(self._errors) <= self.max_errors:
+                break
+            del self._errors[preview_id]
+
+    def path(self, preview_id: str) -> str:
+        return os.path.join(self.cache_dir, preview_id)
+
+    def status(self, preview_id: str) -> str:
+        """ready / pending / failed / missing"""
+        if os.path.exists(self.path(preview_id)):
+            if preview_id in self._entries:
+                self._entries.move_to_end(preview_id)
+            return "ready"
+        if preview_id in self._entries:
+            # 文件已被外部删除
+            self._total_bytes -= self._entries.pop(preview_id)
+        if preview_id in self._tasks:
+            return "pending"
+        self._prune_errors()
+        if preview_id in self._errors:
+            return "failed"
+        return "missing"
+
+    def error(self, preview_id: str):
+        error = self._errors.get(preview_id)
+        return error[1] if error else None
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "total_bytes": self._total_bytes,
+            "max_bytes": self.max_bytes,
+            "pending": len(self._tasks),
+            "errors": len(self._errors),
+        }
+
+    def request(self, preview_id: str, source_ext: str, render) -> str:
+        """
+        未命中缓存时提交后台生成任务, 返回当前状态。
+        render(path) 为协程, 把填写后的文档（后缀为 source_ext）写到 path。
+        """
+        status = self.status(preview_id)
+        if status in ("ready", "pending"):
+            return status
+        self._errors.pop(preview_id, None)
+        task = asyncio.ensure_future(self._generate(preview_id, source_ext, render))
+        self._tasks[preview_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(preview_id, None))
+        return "pending"
+
+    async def _generate(self, preview_id, source_ext, render):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrent)
+        fmt = os.path.splitext(preview_id)[1].lstrip(".")
+        async with self._semaphore:
+            try:
+                with tempfile.TemporaryDirectory(prefix="preview_src_") as work_dir:
+                    src_path = os.path.join(work_dir, f"document.{source_ext}")
+                    await render(src_path)
+                    await convert_document(src_path, self.path(preview_id), fmt,
+                                           self.soffice_path, self.timeout_seconds)
+                self._add(preview_id)
+            except Exception as e:
+                self._errors[preview_id] = (time.monotonic(), str(e))
+                self._prune_errors()
+                logger.warning(f"预览生成失败: {preview_id}, error={e}")
@@ -1,11 +1,27 @@
+import time
+from fastapi import Request
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 from .metadata_handler import router as metadata_router
 from .user_handler import router as user_router
-from .table_handler import router as table_router
+from .table_handler import router as table_router, render_executor, batch_job_manager, request_profiler
+from .person_store import person_store
+from .template_catalog import template_catalog
+from .output_cache import output_cleaner
 from .api_common import register_exception_handlers
 from fastapi.openapi.docs import get_swagger_ui_html
-from starlette.responses import HTMLResponse
+from starlette.responses import HTMLResponse, PlainTextResponse
+from utils.metrics import registry, REQUEST_SECONDS
+from .api_common import SETTINGS
+
+def _route_template(request: Request) -> str:
+    """请求匹配到的完整路由模板（含路由前缀）, 未匹配任何路由时为 unmatched"""
+    # 新版 FastAPI 中 scope["route"].path 不含 include_router 的前缀, 完整路径记录在 effective_route_context
+    context = (request.scope.get("fastapi") or {}).get("effective_route_context")
+    if getattr(context, "path", None):
+        return context.path
+    return getattr(request.scope.get("route"), "path", "unmatched")
+
 
 def setup_app(app):
     # 注册路由
@@ -13,13 +29,45 @@ def setup_app(app):
     app.include_router(metadata_router, prefix="/api/info")
     app.include_router(table_router, prefix="/api/table")
 
-    # 挂载静态文件
-    app.mount("/static", StaticFiles(directory="static"), name="static")
+    # 挂载静态文件: 只公开 Swagger UI 资源; 生成文件、头像、日志均不公开, 生成文件和头像通过鉴权接口访问
+    app.mount("/static/swagger-ui", StaticFiles(directory="static/swagger-ui"), name="swagger-ui")
     app.mount("/data/imgs", StaticFiles(directory="data/imgs"), name="imgs")
 
+    # 启动时扫描模板目录并开启变化监视, 开启输出目录定期清理
+    @app.on_event("startup")
+    async def start_template_catalog():
+        await template_catalog.start()
+        output_cleaner.start()
+
+    # 关闭时停止批量任务, 释放渲染进程池和存储连接
+    @app.on_event("shutdown")
+    def shutdown_render_executor():
+        template_catalog.stop()
+        output_cleaner.stop()
+        batch_job_manager.shutdown()
+        render_executor.shutdown()
+        person_store.close()
+
     # 注册全局异常处理
     register_exception_handlers(app)
 
+    # 请求耗时统计: 按路由模板（而非实际路径）分组, 避免路径参数导致指标数量膨胀
+    @app.middleware("http")
+    async def record_request_latency(request: Request, call_next):
+        start = time.perf_counter()
+        status = 500
+        try:
+            response = await call_next(request)
+            status = response.status_code
+            return response
+        finally:
+            REQUEST_SECONDS.observe(time.perf_counter() - start, method=request.method,
+                                    route=_route_template(request), status=status)
+
+    # 慢请求剖析: 配置开启或允许请求头触发时才注册, 否则不增加任何开销
+    if request_profiler.active:
+        app.middleware("http")(request_profiler.dispatch)
+
     # 配置跨域CORS
     app.add_middleware(
         CORSMiddleware,
@@ -27,6 +75,7 @@ def setup_app(app):
         allow_credentials=True,
         allow_methods=["*"],
         allow_headers=["*"],
+        expose_headers=["ETag", "Last-Modified", "Content-Range", "Accept-Ranges"],
     )
 
     # 其它自定义基础路由
@@ -37,6 +86,12 @@ def setup_app(app):
         """
         return {"message": "Welcome to the FastAPI server!"}
 
+    if SETTINGS.get("METRICS", {}).get("enabled", True):
+        @app.get("/metrics", include_in_schema=False)
+        def metrics():
+            """Prometheus 指标: 各路由请求耗时及模板加载、填充、保存等阶段耗时直方图"""
+            return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
     @app.get("/docs", include_in_schema=False)
     async def custom_swagger_ui_html():
         return get_swagger_ui_html(
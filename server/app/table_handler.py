@@ -1,37 +1,92 @@
 import os
+import re
 import json
+import uuid
+import asyncio
+import hashlib
 import zipfile
 from typing import List
+from collections import OrderedDict
+from urllib.parse import quote
 from datetime import datetime
 from pydantic import BaseModel
-from fastapi import APIRouter
-from fastapi.responses import FileResponse
-from lib.xlsx_auto import ExcelTemplateFiller
-from lib.docx_auto import DocxTemplateFiller
-from .api_common import AppException, APIResponse, make_responses, auto_handle_exceptions
+from fastapi import APIRouter, Depends, Request
+from fastapi.responses import StreamingResponse, Response, PlainTextResponse
+from lib.render_executor import RenderExecutor
+from utils.http_cache import cached_file_response, content_disposition
+from utils.metrics import span
+from utils.profiling import RequestProfiler
+from .batch_jobs import BatchJobManager
+from .preview_service import PreviewService, PREVIEW_MEDIA_TYPES
+from .template_catalog import template_catalog
+from .output_cache import output_cache
+from .person_store import person_store
+from .auth import CurrentUser, get_current_user, require_permission, allow_query_token, get_token, session_manager
+from .api_common import AppException, APIResponse, make_responses, auto_handle_exceptions, SETTINGS
 from loguru import logger
-import aiofiles
 
 
-router = APIRouter(tags=["table"])
+router = APIRouter(tags=["table"], dependencies=[Depends(get_current_user)])
+
+# 渲染执行器: openpyxl/docxtpl 渲染放到进程池中执行, 不阻塞事件循环
+render_executor = RenderExecutor(**SETTINGS.get("RENDER_EXECUTOR", {}))
+# 慢请求剖析, 中间件在 startup 中按配置注册
+def _can_force_profile(http_request: Request) -> bool:
+    """X-Profile 请求头只对已登录且具备 debug:profile 权限的会话生效"""
+    token = get_token(http_request)
+    user = session_manager.verify(token) if token else None
+    return user is not None and user.has("debug:profile")
+
+request_profiler = RequestProfiler(**SETTINGS.get("PROFILING", {}), authorize=_can_force_profile)
+
+EXPORT_MODES = ("per_person", "roster")
+# 名册行数达到该值时改用 write-only 流式导出, 内存占用不随行数增长
+ROSTER_STREAMING_THRESHOLD = SETTINGS.get("ROSTER", {}).get("streaming_threshold", 1000)
+
+_MEDIA_TYPES = {
+    ".zip": "application/zip",
+    ".xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    ".docx": "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+}
+
+# 生成文件不再经 /static 公开访问, 通过 /output/{file_name} 鉴权下载。
+# 记录每个文件由哪些用户生成: 文件名 -> 用户名集合, 按最近生成排序, 超出上限淘汰最早的记录
+OUTPUT_DIR = "static/output"
+_output_owners = OrderedDict()
+_MAX_OUTPUT_OWNERS = 10000
+# 已填写文档预览的归属: 预览ID -> 用户名集合, 规则同生成文件
+_preview_owners = OrderedDict()
 
 class AutoFillingRequest(BaseModel):
     table_name: str
     persons: List[str]
+    # per_person: 每人一份文档（多人打包为zip）; roster: 所有人员逐行写入同一张表（仅 xlsx）
+    mode: str = "per_person"
+
+class TemplateValidateRequest(BaseModel):
+    table_name: str
+    person_id: str
+
+class FilledPreviewRequest(BaseModel):
+    table_name: str
+    person_id: str
+    format: str = "pdf"
 
 @router.post("/autofill", response_model=APIResponse, responses=make_responses(
-    'INVALID_FILE_TYPE', 'FILE_NOT_FOUND', 'AUTO_FILLING_ERROR', 'ZIP_CREATION_ERROR', 'UNKNOWN_ERROR'))
+    'INVALID_FILE_TYPE', 'INVALID_EXPORT_MODE', 'FILE_NOT_FOUND', 'PERSON_NOT_FOUND', 'AUTO_FILLING_ERROR', 'ZIP_CREATION_ERROR',
+    'PERMISSION_DENIED', 'UNKNOWN_ERROR'))
 @auto_handle_exceptions
-async def auto_filling(request: AutoFillingRequest):
+async def auto_filling(request: AutoFillingRequest, user: CurrentUser = Depends(get_current_user)):
     """
     提供对xlsx/docx表格的自动填表及下载功能。
 
-    TODO 一次性填充多人信息待添加权限，设置管理员账号后再测试及使用
+    普通用户只能为本人填表, 为他人或多人填表需要 table:batch 权限（管理员）
 
     参数:
         request: AutoFillingRequest
             - table_name: 模板文件名（如 excel-table.xlsx 或 word-table.docx）
             - persons: 需要填充的人员ID列表
+            - mode: 导出模式, per_person（默认）或 roster（名册, 所有人员写入同一个 xlsx 工作表）
 
     请求格式:
     ```json
@@ -46,50 +101,480 @@ async def auto_filling(request: AutoFillingRequest):
     {
         "table_name": "excel-table.xlsx",
         "persons": ["lisi", "zhangsan"]
+    },
+    {
+        "table_name": "excel-table.xlsx",
+        "persons": ["lisi", "zhangsan"],
+        "mode": "roster"
     }
     ```
 
     返回:
         status: 状态码
         message: 提示信息
-        data: 生成的文件路径（单人）或zip包路径（多人）
-    """
-    if not (request.table_name.startswith("excel") or request.table_name.startswith("word")):
-        raise AppException(*AppException.get_error("INVALID_FILE_TYPE"))
-    template_end = "xlsx" if request.table_name.startswith("excel") else "docx"
-    template_name = request.table_name.split(".")[0]
-    template_name = f"{template_name}-template.{template_end}"
-    template_dir = "templates/xlsx" if template_end=="xlsx" else "templates/docx"
-    template_path = os.path.join(template_dir, template_name)
-    if not os.path.exists(template_path):
-        raise AppException(*AppException.get_error("FILE_NOT_FOUND"), f"模板文件 {template_name} 不存在")
-    results = []
-    for person_id in request.persons:
-        person_data_path = f"data/persons/{person_id}.json"
-        async with aiofiles.open(person_data_path, "r", encoding="utf-8") as f:
-            content = await f.read()
-            person_data = json.loads(content)
-        output_filename = f"{request.table_name.split('.')[0]}-{person_id}.{template_end}"
-        output_path = os.path.join("static/output", output_filename)
-        if request.table_name.startswith("excel"):
-            filler = ExcelTemplateFiller(template_path, output_path)
-        else:
-            filler = DocxTemplateFiller(template_path, output_path)
-        filler.fill(person_data)
-        filler.save()
-        results.append(output_path)
-    if len(results) == 1:
-        return APIResponse(code=200, msg="自动填充处理成功", data=results[0])
+        data: 生成文件（单人文档、名册或多人zip包）的下载接口路径, 如 api/table/output/excel-table-lisi.xlsx, 下载需携带令牌
+    """
+    _check_fill_access(user, request.persons)
+    template_path, template_end = _resolve_template(request.table_name)
+    _check_export_mode(request.mode, template_end)
+    template_name = os.path.basename(template_path)
+    if request.mode == "roster":
+        with span("load_person", template_name):
+            persons_data = await asyncio.gather(*(_load_person_data(person_id) for person_id in request.persons))
+        output_path = _roster_output_path(request.table_name)
+        result = await _render_roster(template_path, output_path, persons_data)
+        return APIResponse(code=200, msg="名册导出成功", data=_publish_output(result, user))
+    with span("load_person", template_name):
+        persons_data = [await _load_person_data(person_id) for person_id in request.persons]
+    outputs = [(_output_path(request.table_name, person_id, template_end), person_data)
+               for person_id, person_data in zip(request.persons, persons_data)]
+    if len(outputs) == 1:
+        result = await _render_cached(template_path, *outputs[0])
+        return APIResponse(code=200, msg="自动填充处理成功", data=_publish_output(result, user))
     else:
+        # 文件名带随机后缀, 同一秒内的并发批量请求不会互相覆盖
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        zip_filename = f"batch_output_{timestamp}.zip"
-        zip_path = os.path.join("output", zip_filename)
-        with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-            for result in results:
-                file_path = os.path.join("output", result)
-                if os.path.exists(file_path):
-                    zipf.write(file_path, result)
-        return APIResponse(code=200, msg="批量处理成功，已打包为zip文件", data=zip_path)
+        zip_filename = f"batch_output_{timestamp}_{uuid.uuid4().hex[:12]}.zip"
+        zip_path = os.path.join(OUTPUT_DIR, zip_filename)
+
+        async def build_zip(path):
+            # 多人并行渲染, 结果顺序与 persons 一致
+            results = await asyncio.gather(*(_render_cached(template_path, output_path, person_data)
+                                             for output_path, person_data in outputs))
+            await asyncio.to_thread(_zip_output_files, path, results)
+
+        # zip 包同样按内容缓存: 所有人员信息和模板均未变化时直接返回
+        zip_key = hashlib.sha256("|".join(
+            f"{os.path.basename(output_path)}:{_render_cache_key(template_path, person_data)}"
+            for output_path, person_data in outputs).encode("utf-8")).hexdigest()[:32]
+        await output_cache.fetch(zip_key, "zip", zip_path, build_zip)
+        return APIResponse(code=200, msg="批量处理成功，已打包为zip文件", data=_publish_output(zip_path, user))
+
+def _add_owner(registry, name, user):
+    """记录 name 由 user 生成, 按最近生成排序, 超出上限淘汰最早的记录"""
+    owners = registry.pop(name, set())
+    owners.add(user.username)
+    registry[name] = owners
+    while len(registry) > _MAX_OUTPUT_OWNERS:
+        registry.popitem(last=False)
+
+def _check_owner(registry, name, user):
+    """只能访问本人生成的文件, 具备 table:batch 权限可访问任意文件"""
+    if not user.has("table:batch") and user.username not in registry.get(name, ()):
+        raise AppException(*AppException.get_error("PERMISSION_DENIED"), name)
+
+def _publish_output(output_path, user):
+    """记录生成文件的归属, 返回前端下载用的接口路径（需携带令牌）"""
+    file_name = os.path.basename(output_path)
+    _add_owner(_output_owners, file_name, user)
+    return f"api/table/output/{quote(file_name)}"
+
+def _check_fill_access(user, persons):
+    if not user.has("table:batch") and any(person_id != user.username for person_id in persons):
+        raise AppException(*AppException.get_error("PERMISSION_DENIED"), "table:batch")
+
+def _check_export_mode(mode, template_end, allowed=EXPORT_MODES):
+    if mode not in allowed:
+        raise AppException(*AppException.get_error("INVALID_EXPORT_MODE"), f"当前接口支持的导出模式: {', '.join(allowed)}")
+    if mode == "roster" and template_end != "xlsx":
+        raise AppException(*AppException.get_error("INVALID_EXPORT_MODE"), "名册模式仅支持 xlsx 模板")
+
+def _roster_rows(persons_data):
+    """名册行数据, 人员信息中没有序号时按顺序编号"""
+    return [{"序号": idx, **person_data} for idx, person_data in enumerate(persons_data, 1)]
+
+async def _render_roster(template_path, output_path, persons_data):
+    rows = _roster_rows(persons_data)
+    return await _render_cached(template_path, output_path, rows, streaming=len(rows) >= ROSTER_STREAMING_THRESHOLD)
+
+def _roster_output_path(table_name):
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    return os.path.join(OUTPUT_DIR, f"{table_name.split('.')[0]}-roster-{timestamp}_{uuid.uuid4().hex[:12]}.xlsx")
+
+def _check_job_access(user, job):
+    if job.owner != user.username and not user.has("table:batch"):
+        raise AppException(*AppException.get_error("PERMISSION_DENIED"), job.job_id)
+
+def _resolve_template(table_name):
+    """根据表名（如 excel-table.xlsx）从模板目录索引定位模板文件, 返回 (模板路径, 文件后缀)"""
+    info = template_catalog.resolve(table_name)
+    return info.template_path, info.type
+
+async def _load_person_data(person_id):
+    person_data = await person_store.get(person_id)
+    if person_data is None:
+        raise AppException(*AppException.get_error("PERSON_NOT_FOUND"), person_id)
+    return person_data
+
+def _output_path(table_name, person_id, template_end):
+    output_filename = f"{table_name.split('.')[0]}-{person_id}.{template_end}"
+    return os.path.join(OUTPUT_DIR, output_filename)
+
+def _photo_version(person_data):
+    """人员照片文件的版本（大小、修改时间）, 重新上传同名头像后渲染结果的缓存键随之变化"""
+    photo = person_data.get("基本信息", {}).get("个人信息", {}).get("照片") if isinstance(person_data, dict) else None
+    if not isinstance(photo, str) or not photo:
+        return ""
+    try:
+        stat = os.stat(photo)
+    except OSError:
+        return ""
+    return f"{stat.st_size}|{stat.st_mtime_ns}"
+
+def _render_cache_key(template_path, person_data):
+    """渲染结果的内容键: 模板版本（路径、大小、修改时间）+ 人员信息内容及照片版本的哈希, 任一变化键即变化"""
+    stat = os.stat(template_path)
+    digest = hashlib.sha256()
+    digest.update(f"{os.path.abspath(template_path)}|{stat.st_size}|{stat.st_mtime_ns}|".encode("utf-8"))
+    digest.update(f"{_photo_version(person_data)}|".encode("utf-8"))
+    digest.update(json.dumps(person_data, ensure_ascii=False, sort_keys=True).encode("utf-8"))
+    return digest.hexdigest()[:32]
+
+async def _render_cached(template_path, output_path, data, streaming=False):
+    """渲染并发布到 output_path, 模板和数据均未变化时直接复用缓存的渲染结果"""
+    key = _render_cache_key(template_path, data)
+    ext = os.path.splitext(output_path)[1].lstrip(".")
+
+    async def render(path):
+        # 只在缓存未命中、实际渲染时记录 render 耗时, 命中缓存不计入
+        with span("render", os.path.basename(template_path)):
+            return await render_executor.render(template_path, path, data, streaming)
+
+    return await output_cache.fetch(key, ext, output_path, render)
+
+def _zip_output_files(zip_path, file_paths):
+    with span("zip"), zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
+        for file_path in file_paths:
+            zipf.write(file_path, os.path.basename(file_path))
+
+async def _run_roster_job(job, template_path):
+    """名册任务: 加载全部人员后一次渲染为单个 xlsx, 加载失败的人员跳过并记录错误"""
+    async def load_one(person_id):
+        try:
+            person_data = await _load_person_data(person_id)
+            job.progress[person_id] = "done"
+            return person_data
+        except Exception as e:
+            job.progress[person_id] = "failed"
+            job.errors[person_id] = e.msg if isinstance(e, AppException) else str(e)
+            return None
+
+    persons_data = [p for p in await asyncio.gather(*(load_one(p) for p in job.persons)) if p is not None]
+    if not persons_data:
+        raise AppException(*AppException.get_error("AUTO_FILLING_ERROR"))
+    output_path = os.path.join(OUTPUT_DIR, f"roster_{job.job_id}.xlsx")
+    job.result_path = await _render_roster(template_path, output_path, persons_data)
+
+async def _run_batch_job(job):
+    """执行批量任务: 逐人加载并渲染, 每完成一人更新进度, 最后打包为zip; 名册模式生成单个 xlsx"""
+    template_path, template_end = _resolve_template(job.table_name)
+    if job.mode == "roster":
+        return await _run_roster_job(job, template_path)
+
+    async def render_one(person_id):
+        try:
+            person_data = await _load_person_data(person_id)
+            output_path = _output_path(job.table_name, person_id, template_end)
+            result = await _render_cached(template_path, output_path, person_data)
+            job.progress[person_id] = "done"
+            return result
+        except Exception as e:
+            job.progress[person_id] = "failed"
+            job.errors[person_id] = e.msg if isinstance(e, AppException) else str(e)
+            return None
+
+    results = [r for r in await asyncio.gather(*(render_one(p) for p in job.persons)) if r]
+    if not results:
+        raise AppException(*AppException.get_error("AUTO_FILLING_ERROR"))
+    zip_path = os.path.join(OUTPUT_DIR, f"batch_{job.job_id}.zip")
+    await asyncio.to_thread(_zip_output_files, zip_path, results)
+    job.result_path = zip_path
+
+batch_job_manager = BatchJobManager(_run_batch_job, **SETTINGS.get("BATCH_JOBS", {}))
+
+@router.post("/autofill/jobs", response_model=APIResponse, responses=make_responses(
+    'INVALID_FILE_TYPE', 'INVALID_EXPORT_MODE', 'FILE_NOT_FOUND', 'JOB_QUEUE_FULL', 'PERMISSION_DENIED', 'UNKNOWN_ERROR'))
+@auto_handle_exceptions
+async def submit_autofill_job(request: AutoFillingRequest, user: CurrentUser = Depends(get_current_user)):
+    """
+    提交批量自动填表任务, 立即返回任务ID, 适用于大批量人员导出。
+
+    参数:
+        request: AutoFillingRequest（同 /autofill）
+
+    返回:
+        status: 状态码
+        message: 提示信息
+        data: 任务状态（含 job_id）, 之后通过 /autofill/jobs/{job_id} 查询进度
+    """
+    _check_fill_access(user, request.persons)
+    _, template_end = _resolve_template(request.table_name)
+    _check_export_mode(request.mode, template_end)
+    job = batch_job_manager.submit(request.table_name, request.persons, owner=user.username, mode=request.mode)
+    return APIResponse(code=200, msg="任务提交成功", data=job.to_dict())
+
+@router.get("/autofill/jobs/{job_id}", response_model=APIResponse, responses=make_responses('JOB_NOT_FOUND', 'PERMISSION_DENIED', 'UNKNOWN_ERROR'))
+@auto_handle_exceptions
+async def get_autofill_job(job_id: str, user: CurrentUser = Depends(get_current_user)):
+    """
+    查询批量任务状态及每个人员的处理进度。
+
+    返回:
+        status: 状态码
+        message: 提示信息
+        data: {"status": queued/running/done/failed, "total": 总人数, "finished": 已处理人数, "progress": {人员ID: pending/done/failed}, ...}
+    """
+    job = batch_job_manager.get(job_id)
+    _check_job_access(user, job)
+    return APIResponse(code=200, msg="查询成功", data=job.to_dict())
+
+@router.get("/autofill/jobs/{job_id}/result", responses=make_responses('JOB_NOT_FOUND', 'JOB_NOT_READY', 'PERMISSION_DENIED', 'UNKNOWN_ERROR'))
+@allow_query_token
+@auto_handle_exceptions
+async def get_autofill_job_result(job_id: str, http_request: Request, user: CurrentUser = Depends(get_current_user)):
+    """
+    下载批量任务生成的zip包（名册模式为 xlsx）, 任务未完成时返回 JOB_NOT_READY。支持 Range 断点续传。
+
+    返回:
+        zip 文件流（FileResponse）
+    """
+    job = batch_job_manager.get(job_id)
+    _check_job_access(user, job)
+    if job.status != "done":
+        raise AppException(*AppException.get_error("JOB_NOT_READY"), job.to_dict())
+    response = await cached_file_response(
+        http_request, job.result_path, _MEDIA_TYPES.get(os.path.splitext(job.result_path)[1], "application/zip"),
+        headers={"Content-Disposition": content_disposition(os.path.basename(job.result_path), "attachment")},
+    )
+    if response is None:
+        raise AppException(*AppException.get_error("JOB_NOT_FOUND"), job_id)
+    return response
+
+@router.get("/output/{file_name}", responses=make_responses('OUTPUT_NOT_FOUND', 'PERMISSION_DENIED', 'UNKNOWN_ERROR'))
+@allow_query_token
+@auto_handle_exceptions
+async def download_output(file_name: str, http_request: Request, user: CurrentUser = Depends(get_current_user)):
+    """
+    下载 /autofill 生成的文件（单人文档、名册或zip包）。只能下载本人生成的文件, 具备 table:batch 权限可下载任意文件。
+    浏览器下载链接无法设置请求头, 可通过 ?token={token} 携带会话令牌。
+
+    返回:
+        文件流（FileResponse）, 支持 ETag 和 Range
+    """
+    if file_name != os.path.basename(file_name) or file_name.startswith("."):
+        raise AppException(*AppException.get_error("OUTPUT_NOT_FOUND"), file_name)
+    _check_owner(_output_owners, file_name, user)
+    response = await cached_file_response(
+        http_request, os.path.join(OUTPUT_DIR, file_name),
+        _MEDIA_TYPES.get(os.path.splitext(file_name)[1], "application/octet-stream"),
+        headers={"Content-Disposition": content_disposition(file_name, "attachment")},
+    )
+    if response is None:
+        raise AppException(*AppException.get_error("OUTPUT_NOT_FOUND"), file_name)
+    return response
+
+class _ZipChunkBuffer:
+    """仅支持追加写入的缓冲区, ZipFile 按不可 seek 的流方式写入, 每次取出新写入的字节"""
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def pop(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+async def _stream_zip(template_path, table_name, template_end, persons):
+    """按渲染完成顺序把文档写入zip并逐块输出, 文档只在内存中出现一次"""
+    async def render_one(person_id, person_data):
+        content = await render_executor.render(template_path, None, person_data)
+        return os.path.basename(_output_path(table_name, person_id, template_end)), content
+
+    tasks = [asyncio.ensure_future(render_one(person_id, person_data)) for person_id, person_data in persons]
+    buffer = _ZipChunkBuffer()
+    try:
+        with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as zipf:
+            for next_done in asyncio.as_completed(tasks):
+                arcname, content = await next_done
+                await asyncio.to_thread(zipf.writestr, arcname, content)
+                yield buffer.pop()
+        yield buffer.pop()
+    finally:
+        # 客户端中途断开时取消未完成的渲染
+        for task in tasks:
+            task.cancel()
+
+@router.post("/autofill/stream", responses=make_responses(
+    'INVALID_FILE_TYPE', 'INVALID_EXPORT_MODE', 'FILE_NOT_FOUND', 'PERSON_NOT_FOUND', 'PERMISSION_DENIED', 'UNKNOWN_ERROR'))
+@auto_handle_exceptions
+async def auto_filling_stream(request: AutoFillingRequest, user: CurrentUser = Depends(get_current_user)):
+    """
+    批量自动填表的流式下载: 每份文档在内存中渲染完成后立即写入zip响应流, 不落盘。
+
+    参数:
+        request: AutoFillingRequest（同 /autofill）
+
+    返回:
+        zip 文件流（StreamingResponse）, 首份文档渲染完成即开始输出
+    """
+    _check_fill_access(user, request.persons)
+    template_path, template_end = _resolve_template(request.table_name)
+    _check_export_mode(request.mode, template_end, allowed=("per_person",))
+    # 人员数据在响应开始前加载, 出错时仍可返回结构化错误
+    persons = [(person_id, await _load_person_data(person_id)) for person_id in request.persons]
+    zip_filename = f"batch_output_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:12]}.zip"
+    return StreamingResponse(
+        _stream_zip(template_path, request.table_name, template_end, persons),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="{zip_filename}"'},
+    )
+
+preview_service = PreviewService(**SETTINGS.get("PREVIEW", {}))
+
+_PREVIEW_ID_PATTERN = re.compile(r"^[0-9a-f]{32}\.(pdf|png)$")
+
+@router.post("/preview_filled", response_model=APIResponse, responses=make_responses(
+    'INVALID_FILE_TYPE', 'FILE_NOT_FOUND', 'PERSON_NOT_FOUND', 'PERMISSION_DENIED', 'UNKNOWN_ERROR'))
+@auto_handle_exceptions
+async def request_filled_preview(request: FilledPreviewRequest, user: CurrentUser = Depends(get_current_user)):
+    """
+    请求已填写文档的预览（pdf 或 png 首页缩略图）, 在后台渲染并转换, 相同人员信息与模板的预览直接命中缓存。
+    填写后的文档取自渲染结果缓存, 与 /autofill 共用同一份渲染结果。预览只能由请求者本人查看（table:batch 权限除外）。
+    预览转换依赖 LibreOffice（soffice）, 未安装时预览生成失败并返回 PREVIEW_FAILED。
+
+    请求格式:
+    ```json
+    {
+        "table_name": "word-table.docx",
+        "person_id": "lisi",
+        "format": "pdf"
+    }
+    ```
+    返回:
+        status: 状态码
+        message: 提示信息
+        data: {"status": ready/pending, "preview_id": 预览ID, "url": 预览地址}, pending 时稍后轮询 url
+    """
+    if request.format not in PREVIEW_MEDIA_TYPES:
+        raise AppException(*AppException.get_error("INVALID_FILE_TYPE"), "预览格式仅支持 pdf 和 png")
+    _check_fill_access(user, [request.person_id])
+    template_path, template_end = _resolve_template(request.table_name)
+    person_data = await _load_person_data(request.person_id)
+    preview_id = f"{_render_cache_key(template_path, person_data)}.{request.format}"
+    _add_owner(_preview_owners, preview_id, user)
+    status = preview_service.request(preview_id, template_end,
+                                     lambda path: _render_cached(template_path, path, person_data))
+    data = {"status": status, "preview_id": preview_id, "url": f"/api/table/preview_filled/{preview_id}"}
+    return APIResponse(code=200, msg="预览请求成功", data=data)
+
+@router.get("/preview_filled/{preview_id}", responses=make_responses(
+    'PREVIEW_NOT_FOUND', 'PREVIEW_NOT_READY', 'PREVIEW_FAILED', 'PERMISSION_DENIED', 'UNKNOWN_ERROR'))
+@allow_query_token
+@auto_handle_exceptions
+async def get_filled_preview(preview_id: str, http_request: Request, user: CurrentUser = Depends(get_current_user)):
+    """
+    获取已生成的预览文件, 生成中返回 PREVIEW_NOT_READY, 生成失败返回 PREVIEW_FAILED。
+    只能查看本人请求过的预览, 具备 table:batch 权限可查看任意预览。
+    预览ID由模板版本和人员信息内容决定, 内容不会变化, 浏览器可长期缓存。
+
+    返回:
+        PDF/PNG 文件流（FileResponse）
+    """
+    if not _PREVIEW_ID_PATTERN.match(preview_id):
+        raise AppException(*AppException.get_error("PREVIEW_NOT_FOUND"))
+    _check_owner(_preview_owners, preview_id, user)
+    status = preview_service.status(preview_id)
+    if status == "pending":
+        raise AppException(*AppException.get_error("PREVIEW_NOT_READY"))
+    if status == "failed":
+        raise AppException(*AppException.get_error("PREVIEW_FAILED"), preview_service.error(preview_id))
+    if status == "missing":
+        raise AppException(*AppException.get_error("PREVIEW_NOT_FOUND"))
+    response = await cached_file_response(
+        http_request, preview_service.path(preview_id), PREVIEW_MEDIA_TYPES[preview_id.rsplit(".", 1)[1]],
+        headers={"Content-Disposition": content_disposition(preview_id), "X-Content-Type-Options": "nosniff"},
+        cache_control="private, max-age=31536000, immutable",
+    )
+    if response is None:
+        raise AppException(*AppException.get_error("PREVIEW_NOT_FOUND"))
+    return response
+
+@router.post("/validate", response_model=APIResponse, responses=make_responses(
+    'INVALID_FILE_TYPE', 'FILE_NOT_FOUND', 'PERSON_NOT_FOUND', 'PERMISSION_DENIED', 'UNKNOWN_ERROR'))
+@auto_handle_exceptions
+async def validate_person_for_template(request: TemplateValidateRequest, user: CurrentUser = Depends(get_current_user)):
+    """
+    填表前预检: 报告人员信息中无法满足的模板占位符（填表时这些位置会填为空）。
+
+    请求格式:
+    ```json
+    {
+        "table_name": "excel-table.xlsx",
+        "person_id": "lisi"
+    }
+    ```
+    返回:
+        status: 状态码
+        message: 提示信息
+        data: {"placeholders": 占位符数, "missing": 数据中不存在的占位符, "empty": 值为空的占位符, "valid": 是否无缺失}
+    """
+    _check_fill_access(user, [request.person_id])
+    info = template_catalog.resolve(request.table_name)
+    person_data = await _load_person_data(request.person_id)
+    return APIResponse(code=200, msg="校验完成", data=info.check(person_data))
+
+@router.get("/render_stats", response_model=APIResponse, responses=make_responses('PERMISSION_DENIED', 'UNKNOWN_ERROR'),
+            dependencies=[Depends(require_permission("table:batch"))])
+@auto_handle_exceptions
+async def get_render_stats():
+    """
+    获取渲染执行器运行指标。
+
+    返回:
+        status: 状态码
+        message: 提示信息
+        data: {"queue_depth": 排队数, "in_flight": 执行中数, "completed": 完成数, ..., "output_cache": 渲染结果缓存命中情况, "preview_cache": 预览缓存占用}
+    """
+    return APIResponse(code=200, msg="查询成功", data={**render_executor.stats(), "output_cache": output_cache.stats(), "preview_cache": preview_service.stats()})
+
+@router.get("/profiles", response_model=APIResponse, responses=make_responses('PERMISSION_DENIED', 'UNKNOWN_ERROR'),
+            dependencies=[Depends(require_permission("debug:profile"))])
+@auto_handle_exceptions
+async def list_profiles():
+    """
+    获取已保存的慢请求剖析列表（最新的在前, 需要 debug:profile 权限）。
+
+    返回:
+        data: [{"id", "method", "path", "status", "duration", "forced", "render_workers", "size", "created_at"}]
+    """
+    return APIResponse(code=200, msg="查询成功", data=request_profiler.list())
+
+@router.get("/profiles/{profile_id}", responses=make_responses('PROFILE_NOT_FOUND', 'PERMISSION_DENIED', 'UNKNOWN_ERROR'),
+            dependencies=[Depends(require_permission("debug:profile"))])
+@auto_handle_exceptions
+async def download_profile(profile_id: str, format: str = "prof", sort: str = "cumulative", limit: int = 50):
+    """
+    下载单个请求剖析。
+
+    参数:
+        format: prof 返回 pstats 二进制文件（可用 python -m pstats / snakeviz 打开）; text 返回按 sort 排序的前 limit 行摘要
+    """
+    record = request_profiler.get(profile_id)
+    if record is None:
+        raise AppException(*AppException.get_error("PROFILE_NOT_FOUND"), profile_id)
+    if format == "text":
+        try:
+            return PlainTextResponse(record.summary(sort, limit))
+        except KeyError:
+            raise AppException(422, "不支持的排序字段", sort)
+    return Response(record.data, media_type="application/octet-stream",
+                    headers={"Content-Disposition": content_disposition(f"profile-{profile_id}.prof", "attachment")})
 
 @router.get("/list_preview", response_model=APIResponse, responses=make_responses('UNKNOWN_ERROR'))
 @auto_handle_exceptions
@@ -105,12 +590,13 @@ async def get_preview():
         message: 提示信息
         data: 文件模板名列表（List[str)）
     """
-    preview_list = os.listdir("templates/preview")
+    preview_list = template_catalog.list_previews()
     return APIResponse(code=200, msg="查询文件模板成功", data=preview_list)
 
 @router.get("/preview/{file_name}", responses=make_responses('UNKNOWN_ERROR'))
+@allow_query_token
 @auto_handle_exceptions
-async def preview_file(file_name: str):
+async def preview_file(file_name: str, request: Request):
     """
     获取指定文件的预览内容（PDF），用于浏览器内嵌预览。
 
@@ -119,36 +605,33 @@ async def preview_file(file_name: str):
 
     请求格式:
         GET /preview/{file_name}
+        iframe 内嵌预览无法设置请求头, 可通过 ?token={token} 携带会话令牌
 
     返回:
-        PDF 文件流（FileResponse），用于浏览器内嵌预览
+        PDF 文件流（FileResponse），用于浏览器内嵌预览。
+        附带 ETag/Last-Modified, 浏览器再次打开时条件请求命中返回 304; 支持 Range 分段加载。
     """
-    file_path = os.path.join("templates", "preview", file_name)
-    if not os.path.exists(file_path):
-        raise AppException(404, "文件不存在")
-    return FileResponse(
-        path=file_path,
-        filename=file_name,
-        media_type="application/pdf",
+    file_path = template_catalog.preview_path(file_name)
+    response = file_path and await cached_file_response(
+        request, file_path, "application/pdf",
         headers={
-            "Content-Disposition": f'inline; filename="{file_name}"',
+            "Content-Disposition": content_disposition(file_name),
             "X-Content-Type-Options": "nosniff",
             "X-Download-Options": "noopen",
         }
     )
+    if response is None:
+        raise AppException(404, "文件不存在")
+    return response
 
-@router.get("/list_templates", response_model=APIResponse, responses=make_responses('UNKNOWN_ERROR'))
+@router.get("/list_templates", response_model=APIResponse, responses=make_responses('PERMISSION_DENIED', 'UNKNOWN_ERROR'),
+            dependencies=[Depends(require_permission("template:manage"))])
 @auto_handle_exceptions
 async def get_templates():
     """
-    超级管理员维护的模板文件，仅暴露给超级管理员查看使用
-
-    TODO 暂未使用，后期需要添加权限控制，限制只有超级管理员可以访问此接口
+    超级管理员维护的模板文件，仅暴露给超级管理员查看使用（需要 template:manage 权限）。
+    templates 字段为每个模板的元数据（类型、占位符、样板行、预览文件、大小）。
     """
-    word_templates = os.listdir("templates/docx")
-    excel_templates = os.listdir("templates/xlsx")
-    result = {
-        "docx_templates": word_templates,
-        "xlsx_templates": excel_templates
-    }
+    result = template_catalog.list_templates()
+    result["templates"] = template_catalog.describe()
     return APIResponse(code=200, msg="查询文件模板成功", data=result)
\ No newline at end of file
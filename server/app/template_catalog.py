@@ -0,0 +1,180 @@
+import os
+import asyncio
+import threading
+from loguru import logger
+from lib import docx_auto, xlsx_auto
+from lib.xlsx_auto import MISSING, resolve_key_path
+from .api_common import AppException, SETTINGS
+
+TEMPLATE_TYPES = ("docx", "xlsx")
+TEMPLATE_SUFFIX = "-template"
+
+
+class TemplateInfo:
+    """单个模板的元数据: 表名（去掉后缀的预览文件名, 如 excel-table）、类型、占位符、样板行、预览文件和大小"""
+    def __init__(self, name, template_type, template_path, size, mtime_ns,
+                 key_paths=None, sample_row=None, preview_file=None, error=None):
+        self.name = name
+        self.type = template_type
+        self.template_path = template_path
+        self.size = size
+        self.mtime_ns = mtime_ns
+        # 占位符 -> 预解析的取值路径
+        self.key_paths = key_paths or {}
+        self.placeholders = list(self.key_paths)
+        self.sample_row = sample_row
+        self.preview_file = preview_file
+        self.error = error
+
+    def check(self, data: dict) -> dict:
+        """检查人员信息能否满足模板占位符: missing 为数据中不存在的占位符, empty 为值为空的占位符"""
+        missing, empty = [], []
+        for placeholder, path in self.key_paths.items():
+            value = resolve_key_path(path, data)
+            if value is MISSING:
+                missing.append(placeholder)
+            elif value is None or value == "":
+                empty.append(placeholder)
+        return {"placeholders": len(self.key_paths), "missing": missing, "empty": empty, "valid": not missing}
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "type": self.type,
+            "template_file": os.path.basename(self.template_path),
+            "size": self.size,
+            "placeholders": self.placeholders,
+            "sample_row": self.sample_row,
+            "preview_file": self.preview_file,
+            "error": self.error,
+        }
+
+
+class TemplateCatalog:
+    """
+    模板目录索引: 启动时扫描 templates/docx、templates/xlsx、templates/preview 一次,
+    之后由后台任务定期比对文件大小和修改时间, 有变化时只重新解析变化的模板。
+    接口查询均读取内存中的索引, 不再访问文件系统。
+    """
+    def __init__(self, template_dir="templates", poll_interval_seconds=5):
+        self.template_dir = template_dir
+        self.poll_interval_seconds = poll_interval_seconds
+        self._templates = {}  # 表名 -> TemplateInfo
+        self._previews = {}  # 预览文件名 -> 路径
+        self._signature = None
+        self._lock = threading.Lock()
+        self._watch_task = None
+
+    def _list_files(self, sub_dir):
+        directory = os.path.join(self.template_dir, sub_dir)
+        files = {}
+        try:
+            entries = list(os.scandir(directory))
+        except FileNotFoundError:
+            return files
+        for entry in entries:
+            if entry.is_file() and not entry.name.startswith((".", "~$")):
+                stat = entry.stat()
+                files[entry.name] = (entry.path, stat.st_size, stat.st_mtime_ns)
+        return files
+
+    @staticmethod
+    def _inspect(name, template_type, path, size, mtime_ns):
+        try:
+            if template_type == "xlsx":
+                compiled = xlsx_auto.get_compiled_template(path)
+                return TemplateInfo(name, template_type, path, size, mtime_ns,
+                                    compiled.key_paths(), compiled.sample_row_idx)
+            compiled = docx_auto.get_compiled_template(path)
+            return TemplateInfo(name, template_type, path, size, mtime_ns, compiled.key_paths())
+        except Exception as e:
+            logger.warning(f"模板解析失败: {path}, error={e}")
+            return TemplateInfo(name, template_type, path, size, mtime_ns, error=str(e))
+
+    def scan(self) -> bool:
+        """扫描模板目录, 返回索引是否发生变化"""
+        listing = {template_type: self._list_files(template_type) for template_type in TEMPLATE_TYPES}
+        previews = self._list_files("preview")
+        signature = (tuple(sorted((t, n, f[1:]) for t, files in listing.items() for n, f in files.items())),
+                     tuple(sorted((n, f[1:]) for n, f in previews.items())))
+        if signature == self._signature:
+            return False
+        preview_by_name = {os.path.splitext(file_name)[0]: file_name for file_name in previews}
+        templates = {}
+        for template_type, files in listing.items():
+            for file_name, (path, size, mtime_ns) in files.items():
+                stem, ext = os.path.splitext(file_name)
+                if ext.lower() != "." + template_type:
+                    continue
+                name = stem[:-len(TEMPLATE_SUFFIX)] if stem.endswith(TEMPLATE_SUFFIX) else stem
+                previous = self._templates.get(name)
+                if previous is not None and (previous.template_path, previous.size, previous.mtime_ns) == (path, size, mtime_ns):
+                    info = previous
+                else:
+                    info = self._inspect(name, template_type, path, size, mtime_ns)
+                info.preview_file = preview_by_name.get(name)
+                templates[name] = info
+        with self._lock:
+            self._templates = templates
+            self._previews = {file_name: path for file_name, (path, _, _) in previews.items()}
+            self._signature = signature
+        logger.info(f"模板目录已加载: {len(templates)} 个模板, {len(previews)} 个预览文件")
+        return True
+
+    def _ensure_loaded(self):
+        if self._signature is None:
+            self.scan()
+
+    async def _watch(self):
+        while True:
+            await asyncio.sleep(self.poll_interval_seconds)
+            try:
+                await asyncio.to_thread(self.scan)
+            except Exception as e:
+                logger.warning(f"模板目录扫描失败: {e}")
+
+    async def start(self):
+        """启动时扫描一次并开启后台监视"""
+        await asyncio.to_thread(self.scan)
+        if self._watch_task is None and self.poll_interval_seconds:
+            self._watch_task = asyncio.create_task(self._watch())
+
+    def stop(self):
+        if self._watch_task is not None:
+            self._watch_task.cancel()
+            self._watch_task = None
+
+    def resolve(self, table_name: str) -> TemplateInfo:
+        """根据表名（如 excel-table.xlsx、word-table.pdf）查找模板, 不存在或解析失败时抛出 AppException"""
+        self._ensure_loaded()
+        name = os.path.splitext(os.path.basename(table_name))[0]
+        info = self._templates.get(name)
+        if info is None:
+            if not (table_name.startswith("excel") or table_name.startswith("word")):
+                raise AppException(*AppException.get_error("INVALID_FILE_TYPE"))
+            raise AppException(*AppException.get_error("FILE_NOT_FOUND"), f"模板文件 {name}{TEMPLATE_SUFFIX} 不存在")
+        if info.error:
+            raise AppException(*AppException.get_error("FILE_NOT_FOUND"), f"模板文件 {name} 解析失败: {info.error}")
+        return info
+
+    def list_previews(self) -> list:
+        self._ensure_loaded()
+        return sorted(self._previews)
+
+    def preview_path(self, file_name: str):
+        self._ensure_loaded()
+        return self._previews.get(file_name)
+
+    def list_templates(self) -> dict:
+        self._ensure_loaded()
+        result = {f"{template_type}_templates": [] for template_type in TEMPLATE_TYPES}
+        for info in sorted(self._templates.values(), key=lambda i: i.name):
+            result[f"{info.type}_templates"].append(os.path.basename(info.template_path))
+        return result
+
+    def describe(self) -> list:
+        self._ensure_loaded()
+        return [info.to_dict() for info in sorted(self._templates.values(), key=lambda i: i.name)]
+
+
+template_catalog = TemplateCatalog(**SETTINGS.get("TEMPLATE_CATALOG", {}))
@@ -1,9 +1,9 @@
-import json
 from pydantic import BaseModel
-from fastapi import APIRouter
+from fastapi import APIRouter, Request, Depends
 from .api_common import AppException, APIResponse, make_responses, auto_handle_exceptions
+from .credential_service import credential_service
+from .auth import session_manager, get_token, get_current_user, CurrentUser
 from loguru import logger
-import aiofiles
 
 router = APIRouter(tags=["user"])
 
@@ -34,14 +34,44 @@ async def login(request: LoginRequest):
     返回:
         status: 状态码
         message: 提示信息
-        data: {"username": 用户名}
+        data: {"username": 用户名, "role": 角色, "token": 会话令牌, "expires_in": 有效期（秒）}
+        后续请求通过 Authorization: Bearer {token} 携带令牌
     """
-    async with aiofiles.open("data/login/user_password.json", "r") as file:
-        content = await file.read()
-        valid_users = json.loads(content)
-    if request.username in valid_users and valid_users[request.username] == request.password:
-        return APIResponse(code=200, msg="登录成功", data={"username": request.username})
+    if await credential_service.verify(request.username, request.password):
+        role = credential_service.get_role(request.username)
+        token = session_manager.issue(request.username, role)
+        data = {"username": request.username, "role": role, "token": token, "expires_in": session_manager.ttl_seconds}
+        return APIResponse(code=200, msg="登录成功", data=data)
     else:
         logger.warning(f"登录失败: 用户名={request.username}")
         code, msg = AppException.get_error("INVALID_AUTHORIZATION")
         raise AppException(code, msg)
+
+
+@router.post("/logout", response_model=APIResponse, responses=make_responses('INVALID_TOKEN', 'UNKNOWN_ERROR'))
+@auto_handle_exceptions
+async def logout(request: Request, user: CurrentUser = Depends(get_current_user)):
+    """
+    用户登出接口, 使 Authorization: Bearer {token} 中的会话令牌失效
+
+    返回:
+        status: 状态码
+        message: 提示信息
+        data: None
+    """
+    session_manager.revoke(get_token(request))
+    return APIResponse(code=200, msg="登出成功")
+
+@router.get("/me", response_model=APIResponse, responses=make_responses('INVALID_TOKEN', 'UNKNOWN_ERROR'))
+@auto_handle_exceptions
+async def get_me(user: CurrentUser = Depends(get_current_user)):
+    """
+    获取当前登录用户及其权限
+
+    返回:
+        status: 状态码
+        message: 提示信息
+        data: {"username": 用户名, "role": 角色, "permissions": 权限列表}
+    """
+    data = {"username": user.username, "role": user.role, "permissions": sorted(user.permissions)}
+    return APIResponse(code=200, msg="查询成功", data=data)
@@ -0,0 +1,296 @@
+"""
+自动填表性能基准测试
+
+用法（在 server 目录下执行）:
+    python -m benchmarks.autofill_bench
+    python -m benchmarks.autofill_bench --sizes 3,20,100 --iterations 20 --output benchmarks/results/base.json
+    python -m benchmarks.autofill_bench --compare benchmarks/results/base.json
+
+使用按 data/persons/lisi.json 结构生成的合成人员数据（家庭情况、个人简历条数可调）,
+覆盖 templates 下的模板, 输出各阶段耗时（template_load/fill/save/zip）、峰值内存,
+以及通过进程内 ASGI 客户端请求 /api/table/autofill 的吞吐量。结果为 JSON, 可与基线比较发现性能回退。
+"""
+import io
+import os
+import sys
+import copy
+import json
+import time
+import asyncio
+import zipfile
+import argparse
+import contextlib
+import platform
+import tempfile
+import statistics
+import tracemalloc
+from datetime import datetime
+from importlib import metadata
+from urllib.parse import unquote
+from loguru import logger
+
+from lib import docx_auto, xlsx_auto
+from utils.metrics import collect_spans, span
+
+SAMPLE_PERSON = "data/persons/lisi.json"
+TEMPLATES = {
+    "xlsx": "templates/xlsx/excel-table-template.xlsx",
+    "docx": "templates/docx/word-table-template.docx",
+}
+STAGES = ("template_load", "fill", "save", "zip")
+
+
+def make_person(index: int, family_size: int, resume_size: int, base: dict) -> dict:
+    """按样例人员结构生成合成人员数据, 家庭情况和个人简历分别生成指定条数"""
+    person = copy.deepcopy(base)
+    info = person["基本信息"]["个人信息"]
+    info["姓名"] = f"测试{index}"
+    info["身份证号"] = f"33010419950815{index:04d}"[-18:]
+    person["姓名"] = info["姓名"]
+    person["证件号"] = info["身份证号"]
+    person["家庭情况"] = [
+        {"称谓": "亲属", "姓名": f"亲属{index}-{i}", "年龄": str(30 + i % 40), "身份证号": f"3301041970{i:08d}",
+         "政治面貌": "群众", "工作单位及职务": f"某单位{i} 职员"}
+        for i in range(family_size)
+    ]
+    person["个人简历"] = [
+        {"时间": f"{2000 + i % 25}.09.01 - {2001 + i % 25}.06.30", "类型": "任职", "内容": f"XX单位 XX部门 XX职务{i}"}
+        for i in range(resume_size)
+    ]
+    return person
+
+
+def _filler_class(template_type, streaming=False):
+    if template_type == "docx":
+        return docx_auto.DocxTemplateFiller
+    return xlsx_auto.StreamingExcelFiller if streaming else xlsx_auto.ExcelTemplateFiller
+
+
+def run_stages(template_type, template_path, records, streaming=False) -> dict:
+    """
+    单次完整流程, 返回各阶段耗时（秒）。records 为 list 时 xlsx 按名册写入同一张表, docx 每人一份。
+    阶段耗时取自填充器内 timed_stage 记录的 span, 与线上 office_stage_duration_seconds 的口径一致。
+    """
+    outputs = []
+    items = records if template_type == "docx" and isinstance(records, list) else [records]
+    with collect_spans() as spans:
+        for item in items:
+            filler = _filler_class(template_type, streaming)(template_path, io.BytesIO())
+            filler.fill(copy.deepcopy(item))
+            filler.save()
+            outputs.append(filler.output_path.getvalue())
+
+        with span("zip"):
+            with zipfile.ZipFile(io.BytesIO(), "w", zipfile.ZIP_DEFLATED) as zipf:
+                for idx, content in enumerate(outputs):
+                    zipf.writestr(f"{idx}.{template_type}", content)
+    timings = {}
+    for stage, _, seconds in spans:
+        timings[stage] = timings.get(stage, 0) + seconds
+    return timings
+
+
+def _summarize(samples: list) -> dict:
+    samples = sorted(samples)
+    return {
+        "mean_ms": round(statistics.mean(samples) * 1000, 3),
+        "median_ms": round(statistics.median(samples) * 1000, 3),
+        "min_ms": round(samples[0] * 1000, 3),
+        "max_ms": round(samples[-1] * 1000, 3),
+    }
+
+
+def bench_scenario(template_type, template_path, records, iterations, streaming=False) -> dict:
+    """首轮作为预热（编译模板）不计入统计, 峰值内存单独跑一轮测量, 避免 tracemalloc 影响耗时"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        return _bench_scenario(template_type, template_path, records, iterations, streaming)
+
+
+def _bench_scenario(template_type, template_path, records, iterations, streaming):
+    run_stages(template_type, template_path, records, streaming)
+    per_stage = {stage: [] for stage in STAGES}
+    totals = []
+    for _ in range(iterations):
+        timings = run_stages(template_type, template_path, records, streaming)
+        for stage in STAGES:
+            per_stage[stage].append(timings.get(stage, 0.0))
+        totals.append(sum(timings.values()))
+    tracemalloc.start()
+    run_stages(template_type, template_path, records, streaming)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "stages": {stage: _summarize(samples) for stage, samples in per_stage.items()},
+        "total": _summarize(totals),
+        "peak_memory_mb": round(peak / 1024 / 1024, 3),
+    }
+
+
+async def _bench_http(persons: dict, requests_per_case: int, concurrency: int) -> dict:
+    import httpx
+    from app import app
+    from app import table_handler
+    from app.auth import session_manager
+    from app.person_store import JsonFilePersonStore
+    from app.output_cache import OutputCache
+
+    class UncachedOutputCache(OutputCache):
+        """每次请求都重新渲染, 测量的是渲染而非缓存命中, 结果可与引入渲染缓存前的基线比较"""
+        async def fetch(self, key, ext, output_path, render):
+            self.misses += 1
+            await render(output_path)
+            return output_path
+
+    results = {}
+    outputs = set()
+    original_store = table_handler.person_store
+    original_cache = table_handler.output_cache
+    with tempfile.TemporaryDirectory(prefix="bench_persons_") as data_dir:
+        # 合成人员写入临时目录, 不影响正式数据; 渲染缓存也指向临时目录, 不写入 data/output_cache
+        store = JsonFilePersonStore(data_dir)
+        for person_id, data in persons.items():
+            await store.save(person_id, data)
+        table_handler.person_store = store
+        table_handler.output_cache = UncachedOutputCache(os.path.join(data_dir, "output_cache"))
+        headers = {"Authorization": f"Bearer {session_manager.issue('benchmark', 'superadmin')}"}
+        person_ids = list(persons)
+        cases = {
+            "autofill_xlsx_single": lambda i: {"table_name": "excel-table.xlsx", "persons": [person_ids[i % len(person_ids)]]},
+            "autofill_docx_single": lambda i: {"table_name": "word-table.docx", "persons": [person_ids[i % len(person_ids)]]},
+            "autofill_xlsx_roster": lambda i: {"table_name": "excel-table.xlsx", "persons": person_ids, "mode": "roster"},
+        }
+        try:
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+                for name, make_body in cases.items():
+                    semaphore = asyncio.Semaphore(concurrency)
+                    latencies = []
+
+                    async def one(i):
+                        async with semaphore:
+                            start = time.perf_counter()
+                            response = await client.post("/api/table/autofill", json=make_body(i), headers=headers)
+                            latencies.append(time.perf_counter() - start)
+                            body = response.json()
+                            if body.get("code") != 200:
+                                raise RuntimeError(f"{name} 请求失败: {body}")
+                            outputs.add(body["data"])
+
+                    await one(-1)  # 预热
+                    latencies.clear()
+                    start = time.perf_counter()
+                    await asyncio.gather(*(one(i) for i in range(requests_per_case)))
+                    elapsed = time.perf_counter() - start
+                    results[name] = {
+                        "requests": requests_per_case,
+                        "concurrency": concurrency,
+                        "requests_per_second": round(requests_per_case / elapsed, 3),
+                        "latency": _summarize(latencies),
+                        "p95_ms": round(sorted(latencies)[int(len(latencies) * 0.95) - 1] * 1000, 3),
+                    }
+        finally:
+            table_handler.person_store = original_store
+            table_handler.output_cache = original_cache
+            table_handler.render_executor.shutdown()
+            for url in outputs:
+                # 接口返回下载路径 api/table/output/{文件名}, 对应 static/output 下的文件
+                path = os.path.join(table_handler.OUTPUT_DIR, unquote(url.rsplit("/", 1)[-1]))
+                if os.path.isfile(path):
+                    os.remove(path)
+    return results
+
+
+def _environment() -> dict:
+    versions = {}
+    for package in ("openpyxl", "docxtpl", "python-docx", "fastapi"):
+        try:
+            versions[package] = metadata.version(package)
+        except metadata.PackageNotFoundError:
+            versions[package] = None
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "packages": versions,
+    }
+
+
+def compare(current: dict, baseline: dict, tolerance: float) -> list:
+    """比较两次结果, 返回超出容忍度的回退项: (指标, 基线值, 当前值)"""
+    regressions = []
+    for name, result in current["scenarios"].items():
+        base = baseline.get("scenarios", {}).get(name)
+        if base and result["total"]["median_ms"] > base["total"]["median_ms"] * (1 + tolerance):
+            regressions.append((f"{name}.total.median_ms", base["total"]["median_ms"], result["total"]["median_ms"]))
+    for name, result in current.get("http", {}).items():
+        base = baseline.get("http", {}).get(name)
+        if base and result["requests_per_second"] < base["requests_per_second"] * (1 - tolerance):
+            regressions.append((f"{name}.requests_per_second", base["requests_per_second"], result["requests_per_second"]))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="自动填表性能基准测试")
+    parser.add_argument("--sizes", default="3,20,100", help="家庭情况/个人简历条数, 逗号分隔")
+    parser.add_argument("--iterations", type=int, default=10, help="每个场景的计时轮数")
+    parser.add_argument("--roster-rows", default="100,1000", help="名册场景的行数, 逗号分隔")
+    parser.add_argument("--http-requests", type=int, default=20, help="每个 HTTP 场景的请求数, 0 表示跳过")
+    parser.add_argument("--concurrency", type=int, default=4, help="HTTP 场景的并发数")
+    parser.add_argument("--output", default=None, help="结果 JSON 路径, 默认 benchmarks/results/时间戳.json")
+    parser.add_argument("--compare", default=None, help="基线结果 JSON, 存在回退时以非零状态退出")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="回退判定的容忍比例")
+    args = parser.parse_args(argv)
+    # 填充器逐份输出的日志会干扰计时
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+
+    with open(SAMPLE_PERSON, "r", encoding="utf-8") as f:
+        base = json.load(f)
+    sizes = [int(s) for s in args.sizes.split(",") if s]
+    roster_rows = [int(s) for s in args.roster_rows.split(",") if s]
+
+    scenarios = {}
+    for size in sizes:
+        person = make_person(0, size, size, base)
+        for template_type, template_path in TEMPLATES.items():
+            name = f"{template_type}_single_size{size}"
+            scenarios[name] = bench_scenario(template_type, template_path, person, args.iterations)
+            print(f"{name}: {scenarios[name]['total']['median_ms']} ms")
+    for rows in roster_rows:
+        records = [dict(make_person(i, sizes[0], sizes[0], base), 序号=i + 1) for i in range(rows)]
+        for streaming in (False, True):
+            name = f"xlsx_roster{'_streaming' if streaming else ''}_rows{rows}"
+            iterations = max(1, args.iterations // 5)
+            scenarios[name] = bench_scenario("xlsx", TEMPLATES["xlsx"], records, iterations, streaming)
+            print(f"{name}: {scenarios[name]['total']['median_ms']} ms")
+
+    result = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "environment": _environment(),
+        "params": vars(args),
+        "scenarios": scenarios,
+    }
+    if args.http_requests:
+        persons = {f"bench_{i}": make_person(i, sizes[0], sizes[0], base) for i in range(10)}
+        result["http"] = asyncio.run(_bench_http(persons, args.http_requests, args.concurrency))
+        for name, item in result["http"].items():
+            print(f"{name}: {item['requests_per_second']} req/s")
+
+    output = args.output or os.path.join("benchmarks", "results", f"{datetime.now():%Y%m%d_%H%M%S}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+    print(f"结果已保存到 {output}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(result, baseline, args.tolerance)
+        for metric, before, after in regressions:
+            print(f"性能回退: {metric} {before} -> {after}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
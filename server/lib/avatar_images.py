@@ -0,0 +1,178 @@
+import io
+import os
+import uuid
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+# 按实际图片格式（文件头）而非扩展名判断, GIF 只取首帧并转存为 PNG
+AVATAR_FORMATS = {"JPEG": ".jpg", "PNG": ".png", "GIF": ".png"}
+
+# 证件照打印尺寸: 28mm x 35mm, 300dpi
+PRINT_WIDTH_MM = 28
+PRINT_HEIGHT_MM = 35
+PRINT_DPI = 300
+PRINT_SIZE = (round(PRINT_WIDTH_MM / 25.4 * PRINT_DPI), round(PRINT_HEIGHT_MM / 25.4 * PRINT_DPI))
+
+VARIANT_PRINT = "print"
+VARIANT_THUMB = "thumb"
+
+
+# 文件头魔数 -> 格式, 上传时据此在读取完整文件前拒绝非图片
+MAGIC_NUMBERS = {
+    b"\xff\xd8\xff": "JPEG",
+    b"\x89PNG\r\n\x1a\n": "PNG",
+    b"GIF87a": "GIF",
+    b"GIF89a": "GIF",
+}
+
+
+class InvalidImageError(ValueError):
+    pass
+
+
+def sniff_image_format(header: bytes):
+    """根据文件开头的字节判断图片格式, 不是支持的格式时返回 None"""
+    for magic, image_format in MAGIC_NUMBERS.items():
+        if header.startswith(magic):
+            return image_format
+    return None
+
+
+def variant_path(photo_path: str, variant: str) -> str:
+    """头像派生图路径: static/img/lisi/lisi-avatar.png -> static/img/lisi/lisi-avatar.print.jpg"""
+    return f"{os.path.splitext(photo_path)[0]}.{variant}.jpg"
+
+
+def _write_atomic(path: str, content: bytes):
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def _flatten(img: Image.Image) -> Image.Image:
+    """JPEG 不支持透明通道, 透明部分铺白底"""
+    if img.mode in ("RGBA", "LA") or (img.mode == "P" and "transparency" in img.info):
+        img = img.convert("RGBA")
+        background = Image.new("RGB", img.size, (255, 255, 255))
+        background.paste(img, mask=img.getchannel("A"))
+        return background
+    return img.convert("RGB")
+
+
+def _encode(img: Image.Image, image_format: str, **params) -> bytes:
+    # 只传入必要的编码参数, 不带 exif/icc/文本块等元数据
+    buffer = io.BytesIO()
+    img.save(buffer, format=image_format, **params)
+    return buffer.getvalue()
+
+
+def render_print_variant(img: Image.Image, quality=90) -> bytes:
+    """按证件照比例居中裁剪并缩放到 28x35mm@300dpi, 避免直接拉伸变形"""
+    fitted = ImageOps.fit(_flatten(img), PRINT_SIZE, Image.LANCZOS)
+    return _encode(fitted, "JPEG", quality=quality, dpi=(PRINT_DPI, PRINT_DPI), optimize=True)
+
+
+def ensure_print_variant(photo_path: str) -> str:
+    """
+    返回头像的证件照打印图路径, 不存在或早于原图时重新生成（兼容处理流程上线前上传的头像）。
+    生成失败时返回原图路径。
+    """
+    path = variant_path(photo_path, VARIANT_PRINT)
+    try:
+        if os.path.getmtime(path) >= os.path.getmtime(photo_path):
+            return path
+    except FileNotFoundError:
+        pass
+    try:
+        with Image.open(photo_path) as img:
+            content = render_print_variant(ImageOps.exif_transpose(img))
+        _write_atomic(path, content)
+        return path
+    except (OSError, ValueError, Image.DecompressionBombError):
+        return photo_path
+
+
+class ProcessedAvatar:
+    """处理后的头像: 规范化原图及各派生图的编码结果, 写入前均在内存中"""
+    def __init__(self, ext: str, original: bytes, variants: dict):
+        self.ext = ext
+        self.original = original
+        self.variants = variants  # 派生图名 -> JPEG 字节
+
+    def save(self, directory: str, stem: str) -> str:
+        """写入 directory/{stem}{ext} 及派生图, 删除旧扩展名的原图, 返回原图路径"""
+        os.makedirs(directory, exist_ok=True)
+        photo_path = os.path.join(directory, f"{stem}{self.ext}")
+        # 先写原图再写派生图, 派生图修改时间不早于原图, ensure_print_variant 直接复用
+        _write_atomic(photo_path, self.original)
+        for variant, content in self.variants.items():
+            _write_atomic(variant_path(photo_path, variant), content)
+        for ext in set(AVATAR_FORMATS.values()) | {".jpeg", ".gif"}:
+            stale = os.path.join(directory, f"{stem}{ext}")
+            if ext != self.ext and os.path.exists(stale):
+                os.remove(stale)
+        return photo_path
+
+
+class AvatarProcessor:
+    """
+    头像上传处理: 按文件头校验图片格式和像素数, 按 EXIF 方向摆正后去除全部元数据,
+    原图长边缩小到 max_edge 以内, 并预先生成证件照打印图（28x35mm@300dpi）和网页缩略图。
+    """
+    def __init__(self, max_edge=1024, max_pixels=40_000_000, thumbnail_size=(240, 300), jpeg_quality=90):
+        self.max_edge = max_edge
+        self.max_pixels = max_pixels
+        self.thumbnail_size = tuple(thumbnail_size)
+        self.jpeg_quality = jpeg_quality
+
+    def _open(self, source) -> Image.Image:
+        try:
+            img = Image.open(io.BytesIO(source) if isinstance(source, bytes) else source)
+        except (UnidentifiedImageError, OSError):
+            raise InvalidImageError("无法识别的图片文件")
+        except Image.DecompressionBombError as e:
+            # 像素数超过 Pillow 上限的两倍时 Image.open 本身就会拒绝
+            raise InvalidImageError(f"图片尺寸过大: {e}")
+        try:
+            if img.format not in AVATAR_FORMATS:
+                raise InvalidImageError(f"不支持的图片格式: {img.format}")
+            # Image.open 只读取文件头, 解码前先检查像素数, 防止解压炸弹
+            if img.width * img.height > self.max_pixels:
+                raise InvalidImageError(f"图片尺寸过大: {img.width}x{img.height}")
+            try:
+                img.load()
+            except (OSError, SyntaxError, Image.DecompressionBombError) as e:
+                raise InvalidImageError(f"图片文件已损坏: {e}")
+        except InvalidImageError:
+            img.close()
+            raise
+        return img
+
+    def process(self, source) -> ProcessedAvatar:
+        """source 为图片文件路径、已打开的二进制文件对象或字节"""
+        with self._open(source) as img:
+            return self._process(img)
+
+    def _process(self, img: Image.Image) -> ProcessedAvatar:
+        image_format = img.format
+        img = ImageOps.exif_transpose(img)
+        if max(img.size) > self.max_edge:
+            img.thumbnail((self.max_edge, self.max_edge), Image.LANCZOS)
+        ext = AVATAR_FORMATS[image_format]
+        if ext == ".jpg":
+            original = _encode(_flatten(img), "JPEG", quality=self.jpeg_quality, optimize=True)
+        else:
+            if img.mode not in ("RGB", "RGBA", "L", "LA", "P"):
+                img = img.convert("RGBA")
+            original = _encode(img, "PNG", optimize=True)
+        thumbnail = ImageOps.fit(_flatten(img), self.thumbnail_size, Image.LANCZOS)
+        variants = {
+            VARIANT_PRINT: render_print_variant(img, self.jpeg_quality),
+            VARIANT_THUMB: _encode(thumbnail, "JPEG", quality=85, optimize=True),
+        }
+        return ProcessedAvatar(ext, original, variants)
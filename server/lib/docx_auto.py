@@ -1,22 +1,153 @@
 import os
+import threading
+from collections import OrderedDict
+from copy import deepcopy
 from docx.shared import Mm
 from docxtpl import DocxTemplate, InlineImage
+from docx.oxml import parse_xml
+from jinja2 import Environment, meta, nodes
 from loguru import logger
+from utils.metrics import timed_stage
+from lib.avatar_images import ensure_print_variant
+from lib.template_cache import CompiledTemplateCache
+
+
+class _CachingEnvironment(Environment):
+    """
+    缓存 from_string 编译结果的 Jinja 环境。docxtpl 每次渲染都会对同一段 xml（正文、各页眉页脚）调用 from_string,
+    模板不变时直接复用已编译的 Template。每个 CompiledDocxTemplate 一个环境, 只需容纳该模板的各部分,
+    按最近使用保留 max_entries 条, 不会随渲染次数增长。
+    """
+    def __init__(self, *args, max_entries=16, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.max_entries = max_entries
+        self._compiled = OrderedDict()  # xml 源码 -> Template
+        self._lock = threading.Lock()
+
+    def from_string(self, source, globals=None, template_class=None):
+        if globals or template_class:
+            return super().from_string(source, globals, template_class)
+        with self._lock:
+            template = self._compiled.get(source)
+            if template is not None:
+                self._compiled.move_to_end(source)
+                return template
+        template = super().from_string(source)
+        with self._lock:
+            self._compiled[source] = template
+            while len(self._compiled) > self.max_entries:
+                self._compiled.popitem(last=False)
+        return template
+
+
+class CompiledDocxTemplate:
+    """
+    已解析的 docx 模板: 缓存解析后的 Document、docxtpl 预处理后的正文 xml 及其 Jinja 编译结果,
+    每次渲染通过 new_document() 获取独立副本。
+    """
+    def __init__(self, template_path):
+        self.template_path = template_path
+        self.mtime = os.path.getmtime(template_path)
+        tpl = DocxTemplate(template_path)
+        tpl.init_docx()
+        self.docx = tpl.docx
+        self.body_xml = tpl.patch_xml(tpl.get_xml())
+        self.jinja_env = _CachingEnvironment()
+
+    def new_document(self) -> "PrecompiledDocxTemplate":
+        return PrecompiledDocxTemplate(self)
+
+    def placeholders(self) -> list:
+        """模板（含页眉页脚）中引用的顶层变量名"""
+        return sorted(self.new_document().get_undeclared_template_variables(self.jinja_env))
+
+    def _template_source(self) -> str:
+        """正文及页眉页脚经 docxtpl 预处理后的 Jinja 源码"""
+        tpl = self.new_document()
+        source = self.body_xml
+        for uri in (tpl.HEADER_URI, tpl.FOOTER_URI):
+            for rel in self.docx._part.rels.values():
+                if rel.reltype == uri and rel.target_part.blob:
+                    source += tpl.patch_xml(tpl.xml_to_string(parse_xml(rel.target_part.blob)))
+        return source
+
+    def key_paths(self) -> dict:
+        """
+        占位符 -> 取值路径（与 xlsx_auto.compile_key_path 格式相同）, 从 Jinja 语法树中收集
+        以模板变量开头的 Getattr/Getitem 链, 如 {{基本信息.个人信息.姓名}}、{{手机信息.个人手机[0].用户号码}}。
+        循环变量（如 item.时间）不是数据路径, 只收集被循环的列表本身; 动态下标只保留下标之前的部分。
+        """
+        ast = self.jinja_env.parse(self._template_source())
+        roots = meta.find_undeclared_variables(ast)
+        paths = {}
+        for node in ast.find_all((nodes.Getattr, nodes.Getitem, nodes.Name)):
+            chain = _key_path_chain(node, roots)
+            if chain is not None:
+                paths.setdefault(chain[0], chain[1])
+        # 只保留最长的路径, 前缀路径已被其覆盖
+        return {name: path for name, path in paths.items()
+                if not any(other[:len(path)] == path and len(other) > len(path) for other in paths.values())}
+
+
+def _key_path_chain(node, roots):
+    """把 Getattr/Getitem 链转换为 (占位符文本, 取值路径), 根节点不是模板变量时返回 None"""
+    steps = []
+    while isinstance(node, (nodes.Getattr, nodes.Getitem)):
+        if isinstance(node, nodes.Getattr):
+            steps.append((f".{node.attr}", (node.attr, None)))
+        elif isinstance(node.arg, nodes.Const) and isinstance(node.arg.value, (str, int)):
+            key = str(node.arg.value)
+            text = f"[{key}]" if isinstance(node.arg.value, int) else f"['{key}']"
+            steps.append((text, (key, int(key) if key.isdigit() else None)))
+        else:
+            # 动态下标, 丢弃其后的部分
+            steps = []
+        node = node.node
+    if not isinstance(node, nodes.Name) or node.ctx != "load" or node.name not in roots:
+        return None
+    steps.reverse()
+    name = node.name + "".join(text for text, _ in steps)
+    return name, ((node.name, None),) + tuple(step for _, step in steps)
+
+
+class PrecompiledDocxTemplate(DocxTemplate):
+    """单次渲染使用的 DocxTemplate, Document 从缓存深拷贝, 正文跳过 xml 预处理, 使用缓存的 Jinja 环境"""
+    def __init__(self, compiled: CompiledDocxTemplate):
+        super().__init__(compiled.template_path)
+        self.compiled = compiled
+        self.docx = deepcopy(compiled.docx)
+
+    def build_xml(self, context, jinja_env=None):
+        return self.render_xml_part(self.compiled.body_xml, self.docx._part, context, jinja_env)
+
+    def render(self, context, jinja_env=None, autoescape=False):
+        super().render(context, jinja_env or self.compiled.jinja_env, autoescape)
+
+
+# 进程级模板缓存: 模板路径 -> CompiledDocxTemplate, 模板文件修改时间变化时重新解析
+_template_cache = CompiledTemplateCache(CompiledDocxTemplate)
+
+
+def get_compiled_template(template_path) -> CompiledDocxTemplate:
+    return _template_cache.get(template_path)
 
 
 class DocxTemplateFiller:
+    @timed_stage("template_load")
     def __init__(self, template_path, output_path):
         self.template_path = template_path
         self.output_path = output_path
-        self.doc = DocxTemplate(self.template_path)
+        self.doc = get_compiled_template(self.template_path).new_document()
 
+    @timed_stage("fill")
     def fill(self, info: dict):
         # 照片字段特殊处理
         img_url = info['基本信息']['个人信息'].get('照片', '')
         logger.info(f"img_url: {img_url}")
         if img_url and os.path.isfile(img_url):
-            # “证件照”效果，推荐只设置 width=Mm(28) 或 height=Mm(35)。 同时设置易拉伸变形
-            info['基本信息']['个人信息']['照片'] = InlineImage(self.doc, img_url, width=Mm(28), height=Mm(35))
+            # 嵌入预先生成的证件照打印图（已按 28x35mm 比例裁剪、300dpi）, 不再嵌入原图
+            img_path = ensure_print_variant(img_url)
+            info['基本信息']['个人信息']['照片'] = InlineImage(self.doc, img_path, width=Mm(28), height=Mm(35))
         else:
             info['基本信息']['个人信息']['照片'] = ''
 
@@ -24,6 +155,7 @@ class DocxTemplateFiller:
         
 
 
+    @timed_stage("save")
     def save(self):
         self.doc.save(self.output_path)
         logger.info(f"写入成功，格式已保留，文件已保存到 {self.output_path}")
@@ -0,0 +1,50 @@
+import os
+import shutil
+import asyncio
+import tempfile
+from loguru import logger
+
+
+def find_soffice(soffice_path=None):
+    """查找 LibreOffice 可执行文件, 未安装时返回 None"""
+    if soffice_path:
+        return soffice_path if os.path.exists(soffice_path) else shutil.which(soffice_path)
+    return shutil.which("soffice") or shutil.which("libreoffice")
+
+
+async def convert_document(src_path, output_path, fmt="pdf", soffice_path=None, timeout=60):
+    """
+    使用 LibreOffice headless 将 xlsx/docx 转换为 pdf 或 png（首页缩略图）, 结果写入 output_path。
+    每次转换使用独立的用户配置目录, 以支持多个 soffice 进程并发运行。
+    """
+    soffice = find_soffice(soffice_path)
+    if soffice is None:
+        raise RuntimeError("未找到 LibreOffice(soffice), 无法生成预览")
+    with tempfile.TemporaryDirectory(prefix="preview_") as work_dir:
+        profile_url = "file://" + os.path.abspath(os.path.join(work_dir, "profile")).replace("\\", "/")
+        process = await asyncio.create_subprocess_exec(
+            soffice, f"-env:UserInstallation={profile_url}", "--headless", "--norestore",
+            "--convert-to", fmt, "--outdir", work_dir, os.path.abspath(src_path),
+            stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
+        )
+        try:
+            _, stderr = await asyncio.wait_for(process.communicate(), timeout)
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+            raise RuntimeError(f"预览转换超时({timeout}s): {src_path}")
+        converted = os.path.join(work_dir, os.path.splitext(os.path.basename(src_path))[0] + "." + fmt)
+        if process.returncode != 0 or not os.path.exists(converted):
+            raise RuntimeError(f"预览转换失败: {stderr.decode(errors='ignore').strip()}")
+        os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+        # 先移动到目标目录再 rename, 读取方不会看到写了一半的文件
+        tmp_path = output_path + ".tmp"
+        try:
+            shutil.move(converted, tmp_path)
+            os.replace(tmp_path, output_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+    logger.info(f"预览生成成功: {output_path}")
+    return output_path
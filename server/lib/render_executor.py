@@ -0,0 +1,138 @@
+import io
+import os
+import time
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from loguru import logger
+from utils.metrics import replay_spans
+from utils.profiling import ProfileCollector
+
+
+def render_document(template_path, output_path, person_data, streaming=False):
+    """
+    在子进程中渲染单个文档并写入 output_path, 根据模板后缀选择 xlsx/docx 填充器。
+    output_path 为 None 时渲染到内存, 返回文件字节。
+    streaming 为 True 时 xlsx 使用 write-only 流式填充器, 适用于大批量名册导出。
+    必须是模块级函数, 才能被 ProcessPoolExecutor 序列化。
+    """
+    if template_path.endswith(".xlsx") and streaming:
+        from lib.xlsx_auto import StreamingExcelFiller as Filler
+    elif template_path.endswith(".xlsx"):
+        from lib.xlsx_auto import ExcelTemplateFiller as Filler
+    else:
+        from lib.docx_auto import DocxTemplateFiller as Filler
+    target = output_path if output_path is not None else io.BytesIO()
+    filler = Filler(template_path, target)
+    filler.fill(person_data)
+    filler.save()
+    return output_path if output_path is not None else target.getvalue()
+
+
+def _render_with_spans(template_path, output_path, person_data, streaming=False, profile=False):
+    """
+    在子进程中渲染并收集各阶段耗时, 与结果一起返回主进程计入指标。
+    profile 为 True 时同时剖析本次渲染, 第三项返回 cProfile 原始统计, 否则为 None。
+    """
+    from utils.metrics import collect_spans
+    from utils.profiling import profile_call
+    with collect_spans() as spans:
+        if profile:
+            result, stats = profile_call(render_document, template_path, output_path, person_data, streaming)
+        else:
+            result, stats = render_document(template_path, output_path, person_data, streaming), None
+    return result, spans, stats
+
+
+class RenderExecutor:
+    """
+    基于 ProcessPoolExecutor 的渲染执行器, 供 async 接口 await 使用, 避免 openpyxl/docxtpl 阻塞事件循环。
+    通过信号量限制同时提交到进程池的任务数, 以便统计排队数(queue_depth)与执行中数(in_flight)。
+    """
+    def __init__(self, max_workers=None, mp_context=None):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.mp_context = mp_context
+        self._pool = None
+        self._semaphore = None
+        self.queue_depth = 0
+        self.in_flight = 0
+        self.peak_queue_depth = 0
+        self.completed = 0
+        self.failed = 0
+        self.total_render_seconds = 0.0
+        self.pool_restarts = 0
+
+    def _get_pool(self):
+        # 延迟创建进程池, 避免导入模块时即启动子进程
+        if self._pool is None:
+            context = multiprocessing.get_context(self.mp_context) if self.mp_context else None
+            self._pool = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=context)
+            logger.info(f"渲染进程池已启动: max_workers={self.max_workers}")
+        return self._pool
+
+    async def submit(self, func, *args):
+        """在进程池中执行 func(*args) 并等待结果"""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_workers)
+        self.queue_depth += 1
+        self.peak_queue_depth = max(self.peak_queue_depth, self.queue_depth)
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.queue_depth -= 1
+        self.in_flight += 1
+        start = time.perf_counter()
+        pool = self._get_pool()
+        try:
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(pool, func, *args)
+            self.completed += 1
+            return result
+        except BrokenProcessPool:
+            # 子进程异常退出（内存不足、原生库崩溃）后进程池不再可用, 丢弃后由下一次提交重建, 只让当前请求失败
+            self.failed += 1
+            self._discard_pool(pool)
+            raise
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            self.total_render_seconds += time.perf_counter() - start
+            self.in_flight -= 1
+            self._semaphore.release()
+
+    def _discard_pool(self, pool):
+        if self._pool is pool:
+            self._pool = None
+            self.pool_restarts += 1
+            logger.warning("渲染进程池中有子进程异常退出, 已丢弃进程池, 下次渲染时重建")
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    async def render(self, template_path, output_path, person_data, streaming=False):
+        # 当前请求正在被剖析时, 子进程中的渲染也一并剖析
+        collector = ProfileCollector.current()
+        result, spans, stats = await self.submit(_render_with_spans, template_path, output_path, person_data,
+                                                 streaming, collector is not None)
+        replay_spans(spans)
+        if collector is not None:
+            collector.add_worker_stats(stats)
+        return result
+
+    def stats(self) -> dict:
+        return {
+            "max_workers": self.max_workers,
+            "queue_depth": self.queue_depth,
+            "in_flight": self.in_flight,
+            "peak_queue_depth": self.peak_queue_depth,
+            "completed": self.completed,
+            "failed": self.failed,
+            "total_render_seconds": round(self.total_render_seconds, 3),
+            "pool_restarts": self.pool_restarts,
+        }
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+            logger.info("渲染进程池已关闭")
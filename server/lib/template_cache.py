@@ -0,0 +1,23 @@
+import os
+import threading
+
+
+class CompiledTemplateCache:
+    """
+    进程级已编译模板缓存: 模板路径 -> compiled_class(template_path), 模板文件修改时间变化时重新编译。
+    compiled_class 需在 mtime 属性中记录编译时模板文件的修改时间。
+    """
+    def __init__(self, compiled_class):
+        self.compiled_class = compiled_class
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, template_path):
+        key = os.path.abspath(template_path)
+        mtime = os.path.getmtime(key)
+        with self._lock:
+            compiled = self._entries.get(key)
+            if compiled is None or compiled.mtime != mtime:
+                compiled = self.compiled_class(template_path)
+                self._entries[key] = compiled
+            return compiled
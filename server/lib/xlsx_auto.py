@@ -1,33 +1,98 @@
+import os
 import re
-from copy import copy
-from openpyxl import load_workbook
+from copy import copy, deepcopy
+from openpyxl import Workbook, load_workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import NamedStyle
+from openpyxl.utils.indexed_list import IndexedList
+from utils.metrics import timed_stage
+from lib.template_cache import CompiledTemplateCache
 
-class ExcelTemplateFiller:
-    def __init__(self, template_path, output_path):
+# 占位符正则, 如 {{姓名}}、{{考核['2023']}}
+PLACEHOLDER_PATTERN = re.compile(r"{{([^{}]+)}}")
+# 取值路径中的下标部分, 如 ['2023']、[0]
+_KEY_PART_PATTERN = re.compile(r"\[([^\[\]]*)\]")
+
+# 取值路径在数据中不存在时的返回值, 与值为 None 区分
+MISSING = object()
+
+
+def compile_key_path(expr) -> tuple:
+    """
+    把占位符表达式预解析为取值路径, 如 {{考核['2023']}} -> (("考核", None), ("2023", 2023)),
+    每段为 (键, 可作为列表下标时的整数 或 None), 填充时无需再做字符串切分。
+    """
+    expr = expr.strip("{} ")
+    bracket = expr.find("[")
+    head = expr if bracket < 0 else expr[:bracket]
+    parts = [head.strip()]
+    if bracket >= 0:
+        parts += [part.strip(" '\"") for part in _KEY_PART_PATTERN.findall(expr[bracket:])]
+    return tuple((part, int(part) if part.isdigit() else None) for part in parts if part)
+
+
+def resolve_key_path(path, data):
+    """按预解析的取值路径从数据中取值, 任一段不存在时返回 MISSING"""
+    value = data
+    for key, index in path:
+        if isinstance(value, dict):
+            value = value.get(key, MISSING)
+        elif isinstance(value, list) and index is not None and index < len(value):
+            value = value[index]
+        else:
+            return MISSING
+        if value is MISSING:
+            return MISSING
+    return value
+
+
+def render_cell_value(cell_val, plan, data):
+    """按取值计划替换单元格中的占位符, 缺失的键填为空"""
+    if len(plan) == 1 and plan[0][0] == cell_val:
+        val = resolve_key_path(plan[0][1], data)
+        return "" if val is None or val is MISSING else str(val)
+    for expr, path in plan:
+        val = resolve_key_path(path, data)
+        cell_val = cell_val.replace(expr, "" if val is None or val is MISSING else str(val))
+    return cell_val
+
+
+class CompiledExcelTemplate:
+    """
+    已解析的 xlsx 模板: 缓存原始工作簿、样板行位置、预复制的列样式和预解析的占位符表达式,
+    同一模板的多次填充只需从这里克隆工作簿, 无需重复 load_workbook 和扫描样板行。
+    """
+    def __init__(self, template_path):
         self.template_path = template_path
-        self.output_path = output_path
-        self.wb = load_workbook(self.template_path)
-        self.ws = self.wb.active
-        self.sample_row_idx, self.template_cells = self._find_sample_row_and_cells()
+        self.mtime = os.path.getmtime(template_path)
+        self.wb = load_workbook(template_path)
+        self.sample_row_idx, template_cells = self._find_sample_row_and_cells(self.wb.active)
+        # 每列: (样式索引数组 或 None, 原始单元格值, [(占位符表达式, 取值路径)])
+        # 样式索引数组指向工作簿共享的样式表, 克隆的工作簿保持相同索引, 填充时直接复用
+        self.columns = []
+        for cell in template_cells:
+            styles = copy(cell._style) if cell.has_style else None
+            plan = []
+            if cell.value and "{{" in str(cell.value):
+                plan = [("{{" + m + "}}", compile_key_path(m)) for m in PLACEHOLDER_PATTERN.findall(str(cell.value))]
+            self.columns.append((styles, cell.value, plan))
+
+    def placeholders(self) -> list:
+        """样板行中的占位符表达式（去掉花括号）, 按列顺序去重"""
+        return list(self.key_paths())
+
+    def key_paths(self) -> dict:
+        """占位符表达式（去掉花括号） -> 取值路径, 按列顺序"""
+        paths = {}
+        for _, _, plan in self.columns:
+            for expr, path in plan:
+                paths.setdefault(expr[2:-2].strip(), path)
+        return paths
 
     @staticmethod
-    def get_value_by_key(expr, data):
-        expr = expr.strip("{} ").replace("][", "].[")
-        parts = re.split(r"\[|\]", expr)
-        key = parts[0]
-        value = data.get(key)
-        for part in parts[1:]:
-            part = part.strip(" '\"")
-            if part:
-                if isinstance(value, dict):
-                    value = value.get(part)
-                elif isinstance(value, list) and part.isdigit():
-                    value = value[int(part)]
-        return value
-
-    def _find_sample_row_and_cells(self):
+    def _find_sample_row_and_cells(ws):
         sample_row_idx = None
-        for i, row in enumerate(self.ws.iter_rows(min_row=1, max_row=self.ws.max_row), 1):
+        for i, row in enumerate(ws.iter_rows(min_row=1, max_row=ws.max_row), 1):
             for cell in row:
                 if cell.value and isinstance(cell.value, str) and "{{" in cell.value:
                     sample_row_idx = i
@@ -36,43 +101,168 @@ class ExcelTemplateFiller:
                 break
         if sample_row_idx is None:
             raise RuntimeError("未找到包含占位符的样板行，请确认模板中包含如 {{姓名}} 这种变量行。")
-        template_cells = [cell for cell in self.ws[sample_row_idx]]
+        template_cells = [cell for cell in ws[sample_row_idx]]
         return sample_row_idx, template_cells
 
+    def clone_workbook(self):
+        """
+        深拷贝缓存的工作簿。openpyxl 的 IndexedList 直接 deepcopy 会丢失元素(状态先于列表项恢复),
+        这里预先放入 memo 手动重建, 保证样式表索引与单元格一致。
+        """
+        memo = {}
+        for value in vars(self.wb).values():
+            if isinstance(value, IndexedList):
+                memo[id(value)] = IndexedList(deepcopy(list(value), memo))
+        return deepcopy(self.wb, memo)
+
+
+# 进程级模板缓存: 模板路径 -> CompiledExcelTemplate, 模板文件修改时间变化时重新解析
+_template_cache = CompiledTemplateCache(CompiledExcelTemplate)
+
+
+def get_compiled_template(template_path) -> CompiledExcelTemplate:
+    return _template_cache.get(template_path)
+
+
+class ExcelTemplateFiller:
+    @timed_stage("template_load")
+    def __init__(self, template_path, output_path):
+        self.template_path = template_path
+        self.output_path = output_path
+        self.template = get_compiled_template(self.template_path)
+        self.wb = self.template.clone_workbook()
+        self.ws = self.wb.active
+        self.sample_row_idx = self.template.sample_row_idx
+
+    @staticmethod
+    def get_value_by_key(expr, data):
+        value = resolve_key_path(compile_key_path(expr), data)
+        return None if value is MISSING else value
+
     def fill_row(self, row_idx, data):
-        for col_idx, template_cell in enumerate(self.template_cells, 1):
+        for col_idx, (styles, cell_val, plan) in enumerate(self.template.columns, 1):
             new_cell = self.ws.cell(row=row_idx, column=col_idx)
-            # 样式复制
-            if template_cell.has_style:
-                new_cell.font = copy(template_cell.font)
-                new_cell.border = copy(template_cell.border)
-                new_cell.fill = copy(template_cell.fill)
-                new_cell.number_format = copy(template_cell.number_format)
-                new_cell.protection = copy(template_cell.protection)
-                new_cell.alignment = copy(template_cell.alignment)
-            # 内容替换
-            cell_val = template_cell.value
-            if cell_val and "{{" in str(cell_val):
-                matches = re.findall(r"{{([^{}]+)}}", str(cell_val))
-                for m in matches:
-                    expr = "{{" + m + "}}"
-                    val = self.get_value_by_key(expr, data)
-                    cell_val = cell_val.replace(expr, str(val) if val is not None else "")
-            new_cell.value = cell_val
+            # 直接引用共享样式表中的样式, 不再逐个复制样式对象
+            if styles:
+                new_cell._style = copy(styles)
+            # 内容替换, 取值路径已在模板加载时解析
+            new_cell.value = render_cell_value(cell_val, plan, data) if plan else cell_val
 
+    @timed_stage("fill")
     def fill(self, info):
-        # 删除样板行
+        if isinstance(info, dict):
+            rows = [info]
+        elif isinstance(info, list):
+            rows = info
+        else:
+            raise RuntimeError("info 必须是 dict 或 list of dict")
+        # 删除样板行, 所有数据行一次插入, 样板行以下的内容只移动一次
         self.ws.delete_rows(self.sample_row_idx, 1)
-        if isinstance(info, list):
-            for idx, item in enumerate(info):
-                self.ws.insert_rows(self.sample_row_idx + idx)
-                self.fill_row(self.sample_row_idx + idx, item)
-        elif isinstance(info, dict):
-            self.ws.insert_rows(self.sample_row_idx)
-            self.fill_row(self.sample_row_idx, info)
+        if rows:
+            self.ws.insert_rows(self.sample_row_idx, len(rows))
+        for idx, item in enumerate(rows):
+            self.fill_row(self.sample_row_idx + idx, item)
+
+    @timed_stage("save")
+    def save(self):
+        self.wb.save(self.output_path)
+        print(f"写入成功，格式已保留，文件已保存到 {self.output_path}")
+
+class StreamingExcelFiller:
+    """
+    大批量导出的流式填充器: 基于 openpyxl write-only 模式逐行写出, 内存占用不随行数增长。
+    模板中的样式注册为工作簿共享的命名样式, 数据行每列复用同一个已设置样式的单元格对象, 只更新值。
+    保留表头/表尾内容、合并单元格、列宽、行高、冻结窗格和打印设置; 条件格式、数据验证、图片等不复制。
+    接口与 ExcelTemplateFiller 一致。
+    """
+    @timed_stage("template_load")
+    def __init__(self, template_path, output_path):
+        self.template_path = template_path
+        self.output_path = output_path
+        self.template = get_compiled_template(self.template_path)
+        self.sample_row_idx = self.template.sample_row_idx
+        self.wb = Workbook(write_only=True)
+        # 未设置样式的单元格沿用模板工作簿的默认字体
+        self.wb._fonts = IndexedList([copy(self.template.wb._fonts[0])])
+        self._template_ws = self.template.wb.active
+        self.ws = self.wb.create_sheet(self._template_ws.title)
+        self._named_styles = {}  # 样式元组 -> 命名样式名
+
+    def _style_name(self, cell):
+        """模板单元格样式对应的共享命名样式, 相同样式只注册一次"""
+        if not cell.has_style:
+            return None
+        # 模板工作簿中的样式索引数组, 索引相同即样式相同
+        key = tuple(cell._style)
+        name = self._named_styles.get(key)
+        if name is None:
+            name = f"template_style_{len(self._named_styles)}"
+            style = NamedStyle(name=name, font=copy(cell.font), border=copy(cell.border), fill=copy(cell.fill),
+                               number_format=cell.number_format, protection=copy(cell.protection),
+                               alignment=copy(cell.alignment))
+            self.wb.add_named_style(style)
+            self._named_styles[key] = name
+        return name
+
+    def _new_cell(self, style_name, value=None):
+        cell = WriteOnlyCell(self.ws, value)
+        if style_name:
+            cell.style = style_name
+        return cell
+
+    def _write_template_rows(self, first_row, last_row):
+        for row in self._template_ws.iter_rows(min_row=first_row, max_row=last_row):
+            self.ws.append([self._new_cell(self._style_name(cell), cell.value)
+                            if cell.value is not None or cell.has_style else None for cell in row])
+
+    def _copy_sheet_layout(self, offset):
+        """复制列宽、行高、合并单元格等版式, 样板行之后的行下移 offset 行"""
+        src, sample = self._template_ws, self.sample_row_idx
+        for key, dim in src.column_dimensions.items():
+            self.ws.column_dimensions[key].width = dim.width
+            self.ws.column_dimensions[key].hidden = dim.hidden
+        sample_height = src.row_dimensions[sample].height if sample in src.row_dimensions else None
+        for idx, dim in src.row_dimensions.items():
+            if dim.height is not None and idx != sample:
+                self.ws.row_dimensions[idx if idx < sample else idx + offset].height = dim.height
+        if sample_height is not None:
+            for idx in range(sample, sample + offset + 1):
+                self.ws.row_dimensions[idx].height = sample_height
+        for merged in src.merged_cells.ranges:
+            if merged.max_row < sample:
+                self.ws.merged_cells.add(merged.coord)
+            elif merged.min_row > sample:
+                shifted = copy(merged)
+                shifted.shift(row_shift=offset)
+                self.ws.merged_cells.add(shifted.coord)
+        self.ws.freeze_panes = src.freeze_panes
+        self.ws.print_title_rows = src.print_title_rows
+        self.ws.page_margins = copy(src.page_margins)
+        self.ws.print_options = copy(src.print_options)
+        for attr in ("orientation", "paperSize", "fitToWidth", "fitToHeight", "scale"):
+            setattr(self.ws.page_setup, attr, getattr(src.page_setup, attr))
+
+    @timed_stage("fill")
+    def fill(self, info):
+        if isinstance(info, dict):
+            rows = [info]
+        elif isinstance(info, list):
+            rows = info
         else:
             raise RuntimeError("info 必须是 dict 或 list of dict")
+        # write-only 模式下版式需在写入单元格之前设置
+        self._copy_sheet_layout(max(len(rows) - 1, 0))
+        self._write_template_rows(1, self.sample_row_idx - 1)
+        # 每列一个已设置样式的单元格, 逐行只更新值（行写出后即序列化, 可复用）
+        columns = [(self._new_cell(self._style_name(cell)), cell_val, plan)
+                   for cell, (_, cell_val, plan) in zip(self._template_ws[self.sample_row_idx], self.template.columns)]
+        for data in rows:
+            for cell, cell_val, plan in columns:
+                cell.value = render_cell_value(cell_val, plan, data) if plan else cell_val
+            self.ws.append([cell for cell, _, _ in columns])
+        self._write_template_rows(self.sample_row_idx + 1, self._template_ws.max_row)
 
+    @timed_stage("save")
     def save(self):
         self.wb.save(self.output_path)
         print(f"写入成功，格式已保留，文件已保存到 {self.output_path}")
@@ -0,0 +1,49 @@
+import os
+import sys
+import pytest
+
+# 配置文件、模板等均按 server 目录的相对路径读取, 测试统一在 server 目录下运行
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+os.chdir(SERVER_DIR)
+if SERVER_DIR not in sys.path:
+    sys.path.insert(0, SERVER_DIR)
+
+
+@pytest.fixture(scope="session")
+def client():
+    """进程内 ASGI 客户端, 会话内只启动一次应用（含启动/关闭事件）"""
+    from fastapi.testclient import TestClient
+    from app import app
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+@pytest.fixture(scope="session")
+def auth_header():
+    """按用户名和角色直接签发会话令牌, 不依赖示例账号的密码和角色配置"""
+    from app.auth import session_manager
+
+    def make(username="pytest-user", role="user"):
+        return {"Authorization": f"Bearer {session_manager.issue(username, role)}"}
+    return make
+
+
+@pytest.fixture
+def temp_person():
+    """在人员存储中创建临时人员, 用例结束后删除其人员文件和头像目录"""
+    import asyncio
+    import shutil
+    from app.person_store import person_store, JsonFilePersonStore
+    created = []
+
+    def make(person_id, data=None):
+        data = data if data is not None else {"基本信息": {"个人信息": {"姓名": person_id, "联系电话": "13800000000"}}}
+        asyncio.run(person_store.save(person_id, data))
+        created.append(person_id)
+        return person_id
+    yield make
+    backend = getattr(person_store, "backend", person_store)
+    for person_id in created:
+        if isinstance(backend, JsonFilePersonStore) and os.path.exists(backend.path(person_id)):
+            os.remove(backend.path(person_id))
+        shutil.rmtree(os.path.join("static", "img", person_id), ignore_errors=True)
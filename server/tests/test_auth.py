@@ -0,0 +1,51 @@
+import os
+from app.auth import session_manager
+from app.credential_service import credential_service
+from app.table_handler import _publish_output, OUTPUT_DIR
+
+
+def test_sample_accounts_ship_with_default_role():
+    for username in ("lisi", "zhangsan"):
+        assert credential_service.get_role(username) == credential_service.default_role
+
+
+def test_tampered_token_is_rejected(client):
+    token = session_manager.issue("pytest-user", "user")
+    payload, signature = token.split(".")
+    forged = session_manager.issue("pytest-user", "superadmin").split(".")[0] + "." + signature
+    assert client.get("/api/user/me", headers={"Authorization": f"Bearer {forged}"}).status_code == 401
+    assert client.get("/api/user/me", headers={"Authorization": f"Bearer {token}"}).json()["data"]["role"] == "user"
+
+
+def test_logout_revokes_token(client, auth_header):
+    headers = auth_header("pytest-user")
+    assert client.get("/api/user/me", headers=headers).status_code == 200
+    assert client.post("/api/user/logout", headers=headers).status_code == 200
+    assert client.get("/api/user/me", headers=headers).status_code == 401
+
+
+def test_query_token_only_accepted_on_marked_endpoints(client):
+    token = session_manager.issue("pytest-user", "user")
+    assert client.get(f"/api/user/me?token={token}").status_code == 401
+    # 头像接口允许 ?token=, 通过鉴权后因没有头像返回 404
+    assert client.get(f"/api/info/avatar/pytest-user?token={token}").status_code == 404
+
+
+def test_user_cannot_read_other_person(client, auth_header):
+    response = client.get("/api/info/lisi", headers=auth_header("pytest-user"))
+    assert response.status_code == 403
+
+
+def test_output_download_is_limited_to_owner(client, auth_header):
+    path = os.path.join(OUTPUT_DIR, "pytest-owner-check.xlsx")
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(b"content")
+    try:
+        owner = session_manager.verify(session_manager.issue("pytest-owner", "user"))
+        url = "/" + _publish_output(path, owner)
+        assert client.get(url, headers=auth_header("pytest-owner")).content == b"content"
+        assert client.get(url, headers=auth_header("pytest-other")).status_code == 403
+        assert client.get(url, headers=auth_header("pytest-admin", "admin")).status_code == 200
+    finally:
+        os.remove(path)
@@ -0,0 +1,88 @@
+import io
+import struct
+import zlib
+import pytest
+from PIL import Image
+from lib.avatar_images import (AvatarProcessor, InvalidImageError, PRINT_SIZE, VARIANT_PRINT, VARIANT_THUMB,
+                               ensure_print_variant, sniff_image_format, variant_path)
+
+
+def _encode(img, image_format, **params):
+    buffer = io.BytesIO()
+    img.save(buffer, format=image_format, **params)
+    return buffer.getvalue()
+
+
+def _png_header_only(width, height):
+    """只有 IHDR 的 PNG: 声明的尺寸可以任意大, 用于构造解压炸弹"""
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+    ihdr = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", ihdr) + chunk(b"IDAT", zlib.compress(b"")) + chunk(b"IEND", b"")
+
+
+@pytest.mark.parametrize("header, expected", [
+    (b"\xff\xd8\xff\xe0rest", "JPEG"),
+    (b"\x89PNG\r\n\x1a\nrest", "PNG"),
+    (b"GIF89a", "GIF"),
+    (b"GIF87a", "GIF"),
+    (b"<svg xmlns=", None),
+    (b"", None),
+])
+def test_sniff_image_format(header, expected):
+    assert sniff_image_format(header) == expected
+
+
+def test_process_strips_metadata_and_builds_variants():
+    exif = Image.Exif()
+    exif[0x010F] = "camera"
+    source = _encode(Image.new("RGB", (2000, 1000), (10, 20, 30)), "JPEG", exif=exif.tobytes())
+    avatar = AvatarProcessor(max_edge=1024, thumbnail_size=(240, 300)).process(source)
+    assert avatar.ext == ".jpg"
+    with Image.open(io.BytesIO(avatar.original)) as original:
+        assert max(original.size) == 1024
+        assert not original.getexif()
+    with Image.open(io.BytesIO(avatar.variants[VARIANT_PRINT])) as printed:
+        assert printed.size == PRINT_SIZE
+    with Image.open(io.BytesIO(avatar.variants[VARIANT_THUMB])) as thumb:
+        assert thumb.size == (240, 300)
+
+
+def test_process_keeps_png_as_png_and_flattens_transparency_in_variants():
+    source = _encode(Image.new("RGBA", (300, 400), (255, 0, 0, 0)), "PNG")
+    avatar = AvatarProcessor().process(source)
+    assert avatar.ext == ".png"
+    with Image.open(io.BytesIO(avatar.variants[VARIANT_THUMB])) as thumb:
+        assert thumb.mode == "RGB"
+        assert thumb.getpixel((0, 0)) == (255, 255, 255)
+
+
+@pytest.mark.parametrize("source", [
+    b"not an image",
+    _png_header_only(64, 64)[:40],
+])
+def test_process_rejects_unreadable_images(source):
+    with pytest.raises(InvalidImageError):
+        AvatarProcessor().process(source)
+
+
+def test_process_rejects_images_over_max_pixels():
+    source = _encode(Image.new("RGB", (200, 200)), "PNG")
+    with pytest.raises(InvalidImageError):
+        AvatarProcessor(max_pixels=100 * 100).process(source)
+
+
+def test_process_rejects_decompression_bomb_refused_by_pillow():
+    # 超过 Image.MAX_IMAGE_PIXELS 的两倍, Image.open 直接抛出 DecompressionBombError
+    side = int((2 * Image.MAX_IMAGE_PIXELS) ** 0.5) + 10
+    with pytest.raises(InvalidImageError):
+        AvatarProcessor(max_pixels=side * side * 2).process(_png_header_only(side, side))
+
+
+def test_save_replaces_stale_extension_and_ensure_print_variant_reuses_it(tmp_path):
+    (tmp_path / "p-avatar.jpg").write_bytes(b"old")
+    avatar = AvatarProcessor().process(_encode(Image.new("RGB", (100, 120)), "PNG"))
+    photo_path = avatar.save(str(tmp_path), "p-avatar")
+    assert photo_path.endswith("p-avatar.png")
+    assert not (tmp_path / "p-avatar.jpg").exists()
+    assert ensure_print_variant(photo_path) == variant_path(photo_path, VARIANT_PRINT)
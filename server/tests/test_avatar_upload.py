@@ -0,0 +1,72 @@
+import io
+import asyncio
+from PIL import Image
+from app.metadata_handler import AVATAR_UPLOAD_MAX_BODY_BYTES
+
+UPLOAD_URL = "/api/info/upload_avatar"
+
+
+def _png_bytes(size=(64, 80)):
+    buffer = io.BytesIO()
+    Image.new("RGB", size, (200, 30, 30)).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def test_upload_avatar_saves_original_and_variants(client, auth_header, temp_person):
+    person_id = temp_person("pytest-avatar")
+    response = client.post(UPLOAD_URL, data={"person_id": person_id},
+                           files={"file": ("a.png", _png_bytes(), "image/png")}, headers=auth_header(person_id))
+    assert response.status_code == 200, response.text
+    thumb = client.get(f"/api/info/avatar/{person_id}?size=thumb", headers=auth_header(person_id))
+    assert thumb.status_code == 200
+    assert Image.open(io.BytesIO(thumb.content)).size == (240, 300)
+
+
+def test_upload_avatar_rejects_non_image_content(client, auth_header, temp_person):
+    person_id = temp_person("pytest-avatar")
+    response = client.post(UPLOAD_URL, data={"person_id": person_id},
+                           files={"file": ("a.png", b"not an image", "image/png")}, headers=auth_header(person_id))
+    assert response.json()["code"] == 503
+
+
+def test_upload_avatar_rejects_declared_oversized_body_before_reading(client, auth_header):
+    def body():
+        yield b"x" * 1024
+        raise AssertionError("超出 Content-Length 上限时不应读取请求体")
+
+    headers = {**auth_header("pytest-avatar"), "Content-Type": "multipart/form-data; boundary=x",
+               "Content-Length": str(AVATAR_UPLOAD_MAX_BODY_BYTES + 1)}
+    response = client.post(UPLOAD_URL, content=body(), headers=headers)
+    assert response.status_code == 413
+    assert response.json()["code"] == 413
+
+
+def test_upload_avatar_stops_reading_chunked_body_past_limit(client, auth_header):
+    # TestClient 会先读完整个请求体, 这里直接调用 ASGI 应用, 统计应用实际读取的分块数
+    from app import app
+    chunk = b"x" * (1024 * 1024)
+    total_chunks = AVATAR_UPLOAD_MAX_BODY_BYTES // len(chunk) + 20
+    received, sent = [], []
+
+    part_header = b'--x\r\nContent-Disposition: form-data; name="file"; filename="a.png"\r\n\r\n'
+
+    async def receive():
+        if len(received) == total_chunks:
+            return {"type": "http.disconnect"}
+        body = chunk if received else part_header + chunk
+        received.append(len(body))
+        return {"type": "http.request", "body": body, "more_body": len(received) < total_chunks}
+
+    async def send(message):
+        sent.append(message)
+
+    headers = {**auth_header("pytest-avatar"), "Content-Type": "multipart/form-data; boundary=x"}
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST", "scheme": "http",
+        "path": UPLOAD_URL, "raw_path": UPLOAD_URL.encode(), "query_string": b"", "root_path": "",
+        "headers": [(k.lower().encode(), v.encode()) for k, v in headers.items()],
+        "client": ("testclient", 50000), "server": ("testserver", 80), "state": {},
+    }
+    asyncio.run(app(scope, receive, send))
+    assert sent[0]["status"] == 413
+    assert sum(received) <= AVATAR_UPLOAD_MAX_BODY_BYTES + 2 * len(chunk)
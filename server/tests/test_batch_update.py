@@ -0,0 +1,34 @@
+import asyncio
+from app.person_store import person_store
+
+
+def _person(name, phone, email):
+    return {"基本信息": {"个人信息": {"姓名": name, "联系电话": phone, "邮箱": email}}}
+
+
+def test_batch_update_merges_each_patch_and_reports_per_id(client, auth_header, temp_person):
+    temp_person("pytest-batch-a", _person("甲", "13800000001", "a@example.com"))
+    temp_person("pytest-batch-b", _person("乙", "13800000002", "b@example.com"))
+    response = client.post("/api/info/batch_update", headers=auth_header("pytest-admin", "admin"), json={"persons": {
+        "pytest-batch-a": {"基本信息": {"个人信息": {"联系电话": "13900000001"}}},
+        "pytest-batch-b": {"基本信息": {"个人信息": {"邮箱": None}}},
+        "pytest-batch-missing": {"基本信息": {}},
+    }}).json()
+    assert response["code"] == 200
+    assert set(response["data"]["results"]) == {"pytest-batch-a", "pytest-batch-b"}
+    assert list(response["data"]["errors"]) == ["pytest-batch-missing"]
+    # 补丁中未出现的字段保持不变
+    assert asyncio.run(person_store.get("pytest-batch-a")) == _person("甲", "13900000001", "a@example.com")
+    assert asyncio.run(person_store.get("pytest-batch-b")) == {"基本信息": {"个人信息": {"姓名": "乙", "联系电话": "13800000002"}}}
+
+
+def test_batch_update_reports_forbidden_ids_without_blocking_others(client, auth_header, temp_person):
+    temp_person("pytest-batch-a", _person("甲", "13800000001", "a@example.com"))
+    temp_person("pytest-batch-b", _person("乙", "13800000002", "b@example.com"))
+    response = client.post("/api/info/batch_update", headers=auth_header("pytest-batch-a"), json={"persons": {
+        "pytest-batch-a": {"基本信息": {"个人信息": {"联系电话": "13900000001"}}},
+        "pytest-batch-b": {"基本信息": {"个人信息": {"联系电话": "13900000002"}}},
+    }}).json()
+    assert list(response["data"]["results"]) == ["pytest-batch-a"]
+    assert list(response["data"]["errors"]) == ["pytest-batch-b"]
+    assert asyncio.run(person_store.get("pytest-batch-b"))["基本信息"]["个人信息"]["联系电话"] == "13800000002"
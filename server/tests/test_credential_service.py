@@ -0,0 +1,22 @@
+import pytest
+from app.credential_service import CredentialService, hash_password, verify_password
+
+
+def test_plain_passwords_are_migrated_to_salted_hashes(tmp_path):
+    password_file = tmp_path / "user_password.json"
+    password_file.write_text('{"alice": "secret"}', encoding="utf-8")
+    service = CredentialService(str(password_file), hash_iterations=1000, roles_file=str(tmp_path / "roles.json"))
+    users = service._load()
+    assert users["alice"].startswith("pbkdf2_sha256$1000$")
+    assert "secret" not in password_file.read_text(encoding="utf-8")
+    assert verify_password("secret", users["alice"])
+    assert not verify_password("wrong", users["alice"])
+
+
+@pytest.mark.parametrize("stored", ["", "pbkdf2_sha256$x$y", "not-a-hash"])
+def test_verify_password_rejects_malformed_hashes(stored):
+    assert not verify_password("secret", stored)
+
+
+def test_password_hashes_are_salted():
+    assert hash_password("secret", 1000) != hash_password("secret", 1000)
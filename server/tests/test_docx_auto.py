@@ -0,0 +1,51 @@
+import os
+import copy
+import json
+import shutil
+from docx import Document
+from lib.docx_auto import CompiledDocxTemplate, DocxTemplateFiller, _CachingEnvironment, get_compiled_template
+
+TEMPLATE = "templates/docx/word-table-template.docx"
+
+with open("data/persons/lisi.json", "r", encoding="utf-8") as f:
+    SAMPLE_PERSON = json.load(f)
+
+
+def _copy_template(tmp_path):
+    path = tmp_path / "template.docx"
+    shutil.copyfile(TEMPLATE, path)
+    return str(path)
+
+
+def test_compiled_template_is_reused_until_the_file_changes(tmp_path):
+    path = _copy_template(tmp_path)
+    compiled = get_compiled_template(path)
+    assert isinstance(compiled, CompiledDocxTemplate)
+    assert get_compiled_template(path) is compiled
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    assert get_compiled_template(path) is not compiled
+
+
+def test_caching_environment_reuses_and_bounds_compiled_sources():
+    env = _CachingEnvironment(max_entries=2)
+    first = env.from_string("{{ a }}")
+    assert env.from_string("{{ a }}") is first
+    env.from_string("{{ b }}")
+    env.from_string("{{ c }}")
+    assert len(env._compiled) == 2
+    assert env.from_string("{{ a }}") is not first
+
+
+def test_repeated_renders_do_not_grow_the_compiled_source_cache(tmp_path):
+    path = _copy_template(tmp_path)
+    for idx in range(3):
+        filler = DocxTemplateFiller(path, str(tmp_path / f"out{idx}.docx"))
+        person = copy.deepcopy(SAMPLE_PERSON)
+        person["基本信息"]["个人信息"].pop("照片", None)
+        person["基本信息"]["个人信息"]["姓名"] = f"测试{idx}"
+        filler.fill(person)
+        filler.save()
+    assert len(get_compiled_template(path).jinja_env._compiled) <= 16
+    assert "测试2" in "\n".join(cell.text for table in Document(str(tmp_path / "out2.docx")).tables
+                              for row in table.rows for cell in row.cells)
@@ -0,0 +1,104 @@
+import os
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+from utils.http_cache import _parse_range, cached_file_response, content_disposition
+
+CONTENT = bytes(range(256)) * 4
+
+
+@pytest.fixture
+def file_client(tmp_path):
+    path = tmp_path / "doc.pdf"
+    path.write_bytes(CONTENT)
+    app = FastAPI()
+
+    @app.get("/file")
+    async def get_file(request: Request):
+        return await cached_file_response(request, str(path), "application/pdf")
+
+    with TestClient(app) as client:
+        yield client, path
+
+
+def test_full_response_carries_validators(file_client):
+    client, _ = file_client
+    response = client.get("/file")
+    assert response.status_code == 200 and response.content == CONTENT
+    assert response.headers["etag"].startswith('"')
+    assert response.headers["accept-ranges"] == "bytes"
+    assert "last-modified" in response.headers
+
+
+def test_conditional_requests_return_304(file_client):
+    client, _ = file_client
+    first = client.get("/file")
+    etag = first.headers["etag"]
+    assert client.get("/file", headers={"If-None-Match": etag}).status_code == 304
+    assert client.get("/file", headers={"If-None-Match": f'"other", W/{etag}'}).status_code == 304
+    assert client.get("/file", headers={"If-Modified-Since": first.headers["last-modified"]}).status_code == 304
+    assert client.get("/file", headers={"If-None-Match": '"other"'}).status_code == 200
+
+
+def test_etag_changes_when_file_is_replaced(file_client):
+    client, path = file_client
+    etag = client.get("/file").headers["etag"]
+    path.write_bytes(CONTENT[::-1])
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    response = client.get("/file", headers={"If-None-Match": etag})
+    assert response.status_code == 200 and response.headers["etag"] != etag
+
+
+@pytest.mark.parametrize("range_header, start, end", [
+    ("bytes=0-9", 0, 9),
+    ("bytes=1000-", 1000, 1023),
+    ("bytes=-24", 1000, 1023),
+    ("bytes=1000-5000", 1000, 1023),
+])
+def test_range_requests_return_partial_content(file_client, range_header, start, end):
+    client, _ = file_client
+    response = client.get("/file", headers={"Range": range_header})
+    assert response.status_code == 206
+    assert response.headers["content-range"] == f"bytes {start}-{end}/{len(CONTENT)}"
+    assert response.content == CONTENT[start:end + 1]
+
+
+def test_unsatisfiable_range_returns_416(file_client):
+    client, _ = file_client
+    response = client.get("/file", headers={"Range": "bytes=5000-"})
+    assert response.status_code == 416
+    assert response.headers["content-range"] == f"bytes */{len(CONTENT)}"
+
+
+def test_if_range_mismatch_falls_back_to_full_response(file_client):
+    client, _ = file_client
+    etag = client.get("/file").headers["etag"]
+    assert client.get("/file", headers={"Range": "bytes=0-9", "If-Range": etag}).status_code == 206
+    response = client.get("/file", headers={"Range": "bytes=0-9", "If-Range": '"stale"'})
+    assert response.status_code == 200 and response.content == CONTENT
+
+
+def test_multi_range_is_not_served_as_single_range(file_client):
+    # 多段范围交给 FileResponse 处理: 返回完整文件, 或（新版 Starlette）multipart/byteranges
+    client, _ = file_client
+    response = client.get("/file", headers={"Range": "bytes=0-1,5-6"})
+    if response.status_code == 206:
+        assert response.headers["content-type"].startswith("multipart/byteranges")
+    else:
+        assert response.status_code == 200 and response.content == CONTENT
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("items=0-1", None),
+    ("bytes=abc", None),
+    ("bytes=-0", (100, 100)),
+    ("bytes=9-3", (100, 100)),
+])
+def test_parse_range_edge_cases(header, expected):
+    assert _parse_range(header, 100) == expected
+
+
+def test_content_disposition_encodes_non_ascii_names():
+    assert content_disposition("a.pdf") == 'inline; filename="a.pdf"'
+    assert content_disposition("表格.pdf", "attachment") == "attachment; filename*=utf-8''%E8%A1%A8%E6%A0%BC.pdf"
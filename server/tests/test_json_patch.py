@@ -0,0 +1,55 @@
+import pytest
+from utils.json_patch import apply_merge_patch, apply_json_patch, json_equal
+
+DOC = {"基本信息": {"个人信息": {"姓名": "李四", "年龄": 30, "已婚": True, "标签": ["a", "b"]}}}
+
+
+def test_merge_patch_replaces_removes_and_keeps_fields():
+    patched = apply_merge_patch(DOC, {"基本信息": {"个人信息": {"年龄": 31, "已婚": None}}})
+    assert patched == {"基本信息": {"个人信息": {"姓名": "李四", "年龄": 31, "标签": ["a", "b"]}}}
+    assert DOC["基本信息"]["个人信息"]["已婚"] is True
+
+
+def test_json_patch_add_remove_replace_move_copy():
+    patched = apply_json_patch(DOC, [
+        {"op": "add", "path": "/基本信息/个人信息/标签/-", "value": "c"},
+        {"op": "remove", "path": "/基本信息/个人信息/标签/0"},
+        {"op": "replace", "path": "/基本信息/个人信息/年龄", "value": 31},
+        {"op": "copy", "from": "/基本信息/个人信息/姓名", "path": "/基本信息/曾用名"},
+        {"op": "move", "from": "/基本信息/个人信息/已婚", "path": "/基本信息/婚否"},
+    ])
+    assert patched == {"基本信息": {"个人信息": {"姓名": "李四", "年龄": 31, "标签": ["b", "c"]},
+                                "曾用名": "李四", "婚否": True}}
+
+
+def test_json_patch_failure_leaves_document_unchanged():
+    with pytest.raises(ValueError):
+        apply_json_patch(DOC, [
+            {"op": "replace", "path": "/基本信息/个人信息/年龄", "value": 31},
+            {"op": "remove", "path": "/基本信息/不存在"},
+        ])
+    assert DOC["基本信息"]["个人信息"]["年龄"] == 30
+
+
+@pytest.mark.parametrize("path, value", [
+    ("/基本信息/个人信息/年龄", 30),
+    ("/基本信息/个人信息/年龄", 30.0),
+    ("/基本信息/个人信息/已婚", True),
+    ("/基本信息/个人信息/标签", ["a", "b"]),
+])
+def test_json_patch_test_op_passes_on_json_equal_values(path, value):
+    assert apply_json_patch(DOC, [{"op": "test", "path": path, "value": value}]) == DOC
+
+
+@pytest.mark.parametrize("actual, expected", [
+    (1, True),
+    (0, False),
+    (True, 1),
+    ([1], [True]),
+    ({"a": 0}, {"a": False}),
+    ("1", 1),
+])
+def test_json_patch_test_op_distinguishes_json_types(actual, expected):
+    with pytest.raises(ValueError):
+        apply_json_patch({"v": actual}, [{"op": "test", "path": "/v", "value": expected}])
+    assert not json_equal(actual, expected)
@@ -0,0 +1,94 @@
+import os
+import time
+import asyncio
+from app.output_cache import OutputCache, OutputDirectoryCleaner
+
+
+def _renderer(calls, content=b"rendered", delay=0.0, error=None):
+    async def render(path):
+        calls.append(path)
+        await asyncio.sleep(delay)
+        if error is not None:
+            raise error
+        with open(path, "wb") as f:
+            f.write(content)
+    return render
+
+
+def test_concurrent_fetches_of_same_key_render_once(tmp_path):
+    cache = OutputCache(str(tmp_path / "cache"))
+    calls = []
+
+    async def scenario():
+        render = _renderer(calls, delay=0.05)
+        return await asyncio.gather(*(cache.fetch("k", "xlsx", str(tmp_path / f"out{i}.xlsx"), render)
+                                      for i in range(5)))
+
+    outputs = asyncio.run(scenario())
+    assert len(calls) == 1
+    assert all(open(path, "rb").read() == b"rendered" for path in outputs)
+    assert (cache.misses, cache.hits) == (1, 4)
+
+
+def test_later_fetch_is_served_from_cache(tmp_path):
+    cache = OutputCache(str(tmp_path / "cache"))
+    calls = []
+    asyncio.run(cache.fetch("k", "docx", str(tmp_path / "a.docx"), _renderer(calls)))
+    asyncio.run(cache.fetch("k", "docx", str(tmp_path / "b.docx"), _renderer(calls)))
+    assert len(calls) == 1
+    assert (tmp_path / "b.docx").read_bytes() == b"rendered"
+
+
+def test_failed_render_is_shared_by_waiters_and_retried(tmp_path):
+    cache_dir = tmp_path / "cache"
+    cache = OutputCache(str(cache_dir))
+    calls = []
+
+    async def scenario():
+        render = _renderer(calls, delay=0.05, error=RuntimeError("boom"))
+        return await asyncio.gather(*(cache.fetch("k", "xlsx", str(tmp_path / f"out{i}.xlsx"), render)
+                                      for i in range(3)), return_exceptions=True)
+
+    results = asyncio.run(scenario())
+    assert len(calls) == 1
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert os.listdir(cache_dir) == []
+    asyncio.run(cache.fetch("k", "xlsx", str(tmp_path / "retry.xlsx"), _renderer(calls)))
+    assert len(calls) == 2
+
+
+def test_cache_evicts_least_recently_used_files_over_max_bytes(tmp_path):
+    cache_dir = tmp_path / "cache"
+    cache = OutputCache(str(cache_dir), max_bytes=20)
+    calls = []
+
+    async def scenario():
+        for key in ("a", "b", "a", "c"):
+            await cache.fetch(key, "xlsx", str(tmp_path / f"{key}.xlsx"), _renderer(calls, content=b"x" * 10))
+
+    asyncio.run(scenario())
+    assert sorted(os.listdir(cache_dir)) == ["a.xlsx", "c.xlsx"]
+    assert cache.stats()["total_bytes"] == 20
+
+
+def test_cache_reloads_entries_and_drops_partial_renders_on_start(tmp_path):
+    cache_dir = tmp_path / "cache"
+    cache_dir.mkdir()
+    (cache_dir / "k.xlsx").write_bytes(b"done")
+    (cache_dir / "k2.xlsx.abc.tmp").write_bytes(b"partial")
+    cache = OutputCache(str(cache_dir))
+    assert os.listdir(cache_dir) == ["k.xlsx"]
+    calls = []
+    asyncio.run(cache.fetch("k", "xlsx", str(tmp_path / "out.xlsx"), _renderer(calls)))
+    assert calls == [] and (tmp_path / "out.xlsx").read_bytes() == b"done"
+
+
+def test_cleaner_removes_expired_then_oldest_files(tmp_path):
+    now = time.time()
+    for name, age in (("old", 100), ("mid", 50), ("new", 0)):
+        path = tmp_path / name
+        path.write_bytes(b"x" * 10)
+        os.utime(path, (now - age, now - age))
+    cleaner = OutputDirectoryCleaner(str(tmp_path), max_age_seconds=80, max_bytes=10)
+    assert cleaner.clean() == 2
+    assert os.listdir(tmp_path) == ["new"]
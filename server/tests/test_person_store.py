@@ -0,0 +1,172 @@
+import os
+import json
+import asyncio
+import pytest
+from app.person_store import JsonFilePersonStore, SqlitePersonStore, CachedPersonStore, create_person_store
+
+
+def _person(name, phone="13800000000"):
+    return {"基本信息": {"个人信息": {"姓名": name, "身份证号": f"id-{name}", "联系电话": phone}}}
+
+
+class _PausedReadMixin:
+    """get 读到数据后暂停, 直到测试放行, 用于在未命中读取过程中插入写入"""
+    def pause_reads(self):
+        self.read_done = asyncio.Event()
+        self.release = asyncio.Event()
+
+    async def get(self, person_id):
+        data = await super().get(person_id)
+        if hasattr(self, "release"):
+            self.read_done.set()
+            await self.release.wait()
+        return data
+
+
+class _PausedJsonStore(_PausedReadMixin, JsonFilePersonStore):
+    pass
+
+
+class _PausedSqliteStore(_PausedReadMixin, SqlitePersonStore):
+    pass
+
+
+@pytest.fixture(params=["json", "sqlite"])
+def paused_backend(request, tmp_path):
+    if request.param == "json":
+        backend = _PausedJsonStore(str(tmp_path))
+    else:
+        backend = _PausedSqliteStore(str(tmp_path / "persons.db"), pool_size=2)
+    yield backend
+    backend.close()
+
+
+def test_cache_miss_read_interleaved_with_save_does_not_cache_stale_data(paused_backend):
+    async def scenario():
+        await paused_backend.save("lisi", _person("v1"))
+        store = CachedPersonStore(paused_backend)
+        paused_backend.pause_reads()
+        reader = asyncio.create_task(store.get("lisi"))
+        await paused_backend.read_done.wait()
+        await store.save("lisi", _person("v2"))
+        paused_backend.release.set()
+        # 读取开始于写入之前, 返回旧数据是允许的, 但不能留在缓存里
+        assert (await reader)["基本信息"]["个人信息"]["姓名"] == "v1"
+        del paused_backend.release
+        assert (await store.get("lisi"))["基本信息"]["个人信息"]["姓名"] == "v2"
+        assert (await paused_backend.get("lisi"))["基本信息"]["个人信息"]["姓名"] == "v2"
+
+    asyncio.run(scenario())
+
+
+@pytest.fixture(params=["json", "sqlite"])
+def backend(request, tmp_path):
+    if request.param == "json":
+        store = JsonFilePersonStore(str(tmp_path))
+    else:
+        store = SqlitePersonStore(str(tmp_path / "persons.db"), pool_size=2)
+    yield store
+    store.close()
+
+
+def test_backend_round_trip_and_missing_person(backend):
+    async def scenario():
+        assert await backend.get("nobody") is None
+        assert not await backend.exists("nobody")
+        await backend.save("lisi", _person("李四"))
+        await backend.save("lisi", _person("李四", phone="13900000000"))
+        assert await backend.exists("lisi")
+        assert (await backend.get("lisi"))["基本信息"]["个人信息"]["联系电话"] == "13900000000"
+
+    asyncio.run(scenario())
+
+
+def test_backend_search_by_name_and_id_card(backend):
+    async def scenario():
+        await backend.save("a", _person("甲"))
+        await backend.save("b", _person("乙"))
+        await backend.save("c", _person("甲"))
+        assert [p["person_id"] for p in await backend.search(name="甲")] == ["a", "c"]
+        assert await backend.search(id_card="id-乙") == [{"person_id": "b", "姓名": "乙", "身份证号": "id-乙"}]
+        assert len(await backend.search(limit=2)) == 2
+
+    asyncio.run(scenario())
+
+
+def test_json_backend_writes_atomically(tmp_path):
+    store = JsonFilePersonStore(str(tmp_path))
+    asyncio.run(store.save("lisi", _person("李四")))
+    assert sorted(os.listdir(tmp_path)) == ["lisi.json"]
+    assert json.loads((tmp_path / "lisi.json").read_text(encoding="utf-8")) == _person("李四")
+
+
+def test_sqlite_backend_imports_existing_json_files(tmp_path):
+    asyncio.run(JsonFilePersonStore(str(tmp_path)).save("lisi", _person("李四")))
+    store = SqlitePersonStore(str(tmp_path / "persons.db"), pool_size=1, import_dir=str(tmp_path))
+    try:
+        assert asyncio.run(store.get("lisi")) == _person("李四")
+    finally:
+        store.close()
+
+
+def test_create_person_store_wraps_backend_in_cache_when_configured(tmp_path):
+    assert isinstance(create_person_store("json", data_dir=str(tmp_path)), JsonFilePersonStore)
+    store = create_person_store("json", data_dir=str(tmp_path), cache_max_bytes=1024)
+    assert isinstance(store, CachedPersonStore) and isinstance(store.backend, JsonFilePersonStore)
+
+
+def test_cache_serves_hits_and_reloads_after_external_modification(tmp_path):
+    async def scenario():
+        backend = JsonFilePersonStore(str(tmp_path))
+        store = CachedPersonStore(backend)
+        await store.save("lisi", _person("v1"))
+        assert (await store.get("lisi"))["基本信息"]["个人信息"]["姓名"] == "v1"
+        assert store.hits == 1 and store.misses == 0
+        # 绕过接口直接修改文件, mtime 变化后缓存失效
+        path = backend.path("lisi")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(_person("v2"), f, ensure_ascii=False)
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+        assert (await store.get("lisi"))["基本信息"]["个人信息"]["姓名"] == "v2"
+        assert store.invalidations == 1 and store.misses == 1
+
+    asyncio.run(scenario())
+
+
+def test_cache_evicts_least_recently_used_entries_by_size(tmp_path):
+    async def scenario():
+        entry_size = len(json.dumps(_person("甲"), ensure_ascii=False))
+        store = CachedPersonStore(JsonFilePersonStore(str(tmp_path)), max_bytes=entry_size * 2)
+        await store.save("a", _person("甲"))
+        await store.save("b", _person("乙"))
+        await store.get("a")
+        await store.save("c", _person("丙"))
+        assert store.stats()["entries"] == 2 and store.evictions == 1
+        assert store.stats()["bytes"] <= store.max_bytes
+        hits = store.hits
+        await store.get("a")
+        assert store.hits == hits + 1
+        await store.get("b")
+        assert store.misses == 1
+
+    asyncio.run(scenario())
+
+
+def test_cache_drops_entry_when_save_fails(tmp_path):
+    class FailingStore(JsonFilePersonStore):
+        async def save(self, person_id, data):
+            raise OSError("disk full")
+
+    async def scenario():
+        backend = JsonFilePersonStore(str(tmp_path))
+        await backend.save("lisi", _person("v1"))
+        store = CachedPersonStore(backend)
+        await store.get("lisi")
+        store.backend = FailingStore(str(tmp_path))
+        with pytest.raises(OSError):
+            await store.save("lisi", _person("v2"))
+        assert store.stats()["entries"] == 0
+        assert (await store.get("lisi"))["基本信息"]["个人信息"]["姓名"] == "v1"
+
+    asyncio.run(scenario())
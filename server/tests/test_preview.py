@@ -0,0 +1,64 @@
+import copy
+import json
+import time
+import shutil
+import pytest
+from app.table_handler import output_cache
+
+TEMPLATE = "word-table.docx"
+
+with open("data/persons/lisi.json", "r", encoding="utf-8") as f:
+    SAMPLE_PERSON = json.load(f)
+
+
+def _person(phone):
+    data = copy.deepcopy(SAMPLE_PERSON)
+    data["基本信息"]["个人信息"].pop("照片", None)
+    data["基本信息"]["个人信息"]["联系电话"] = phone
+    return data
+
+
+@pytest.fixture
+def fake_converter(monkeypatch):
+    """用复制源文件代替 LibreOffice 转换, 记录每次转换的源文件"""
+    converted = []
+
+    async def convert_document(src_path, output_path, fmt="pdf", soffice_path=None, timeout=60):
+        converted.append(src_path)
+        shutil.copyfile(src_path, output_path)
+        return output_path
+
+    monkeypatch.setattr("app.preview_service.convert_document", convert_document)
+    return converted
+
+
+def _wait_ready(client, url, headers):
+    for _ in range(100):
+        response = client.get(url, headers=headers)
+        if response.status_code != 409:
+            return response
+        time.sleep(0.05)
+    raise AssertionError("预览生成超时")
+
+
+def test_preview_is_only_served_to_requester(client, auth_header, temp_person, fake_converter):
+    person_id = temp_person("pytest-preview", _person("13800000003"))
+    owner = auth_header(person_id)
+    data = client.post("/api/table/preview_filled", json={"table_name": TEMPLATE, "person_id": person_id},
+                       headers=owner).json()["data"]
+    assert _wait_ready(client, data["url"], owner).status_code == 200
+    assert client.get(data["url"], headers=auth_header("pytest-other")).status_code == 403
+    assert client.get(data["url"], headers=auth_header("pytest-admin", "admin")).status_code == 200
+
+
+def test_preview_reuses_cached_autofill_render(client, auth_header, temp_person, fake_converter):
+    person_id = temp_person("pytest-preview", _person(f"139{time.time_ns() % 10**8:08d}"))
+    headers = auth_header(person_id)
+    misses = output_cache.misses
+    assert client.post("/api/table/autofill", json={"table_name": TEMPLATE, "persons": [person_id]},
+                       headers=headers).json()["code"] == 200
+    data = client.post("/api/table/preview_filled", json={"table_name": TEMPLATE, "person_id": person_id, "format": "png"},
+                       headers=headers).json()["data"]
+    assert _wait_ready(client, data["url"], headers).status_code == 200
+    assert output_cache.misses == misses + 1
+    assert len(fake_converter) == 1
@@ -0,0 +1,62 @@
+import os
+import shutil
+import pytest
+from openpyxl import load_workbook
+from lib.xlsx_auto import (MISSING, CompiledExcelTemplate, ExcelTemplateFiller, StreamingExcelFiller,
+                           compile_key_path, get_compiled_template, render_cell_value, resolve_key_path)
+
+TEMPLATE = "templates/xlsx/excel-table-template.xlsx"
+DATA = {"姓名": "李四", "考核": {"2023": "合格"}, "家庭情况": [{"姓名": "李大明"}], "备注": None}
+
+
+@pytest.mark.parametrize("expr, path", [
+    ("姓名", (("姓名", None),)),
+    ("{{ 姓名 }}", (("姓名", None),)),
+    ("考核['2023']", (("考核", None), ("2023", 2023))),
+    ('家庭情况[0]["姓名"]', (("家庭情况", None), ("0", 0), ("姓名", None))),
+])
+def test_compile_key_path(expr, path):
+    assert compile_key_path(expr) == path
+
+
+@pytest.mark.parametrize("expr, value", [
+    ("姓名", "李四"),
+    ("考核['2023']", "合格"),
+    ("家庭情况[0]['姓名']", "李大明"),
+    ("家庭情况[1]['姓名']", MISSING),
+    ("考核['2022']", MISSING),
+    ("备注", None),
+])
+def test_resolve_key_path(expr, value):
+    assert resolve_key_path(compile_key_path(expr), DATA) == value
+
+
+def test_render_cell_value_blanks_missing_keys():
+    cell = "{{姓名}}/{{考核['2022']}}"
+    plan = [("{{姓名}}", compile_key_path("姓名")), ("{{考核['2022']}}", compile_key_path("考核['2022']"))]
+    assert render_cell_value(cell, plan, DATA) == "李四/"
+
+
+def test_compiled_template_is_reused_until_the_file_changes(tmp_path):
+    path = str(tmp_path / "template.xlsx")
+    shutil.copyfile(TEMPLATE, path)
+    compiled = get_compiled_template(path)
+    assert isinstance(compiled, CompiledExcelTemplate)
+    assert get_compiled_template(path) is compiled
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    assert get_compiled_template(path) is not compiled
+
+
+@pytest.mark.parametrize("filler_class", [ExcelTemplateFiller, StreamingExcelFiller])
+def test_fillers_write_one_row_per_person(tmp_path, filler_class):
+    compiled = get_compiled_template(TEMPLATE)
+    name_column = next(idx for idx, (_, _, plan) in enumerate(compiled.columns)
+                       if any(path == (("姓名", None),) for _, path in plan))
+    output = str(tmp_path / "out.xlsx")
+    filler = filler_class(TEMPLATE, output)
+    filler.fill([{"姓名": "甲"}, {"姓名": "乙"}])
+    filler.save()
+    ws = load_workbook(output).active
+    row = compiled.sample_row_idx
+    assert [ws.cell(row=row + i, column=name_column + 1).value for i in range(2)] == ["甲", "乙"]
@@ -0,0 +1,158 @@
+import os
+import asyncio
+import hashlib
+import threading
+from collections import OrderedDict
+from email.utils import formatdate, parsedate_to_datetime
+from urllib.parse import quote
+import aiofiles
+from fastapi import Request
+from fastapi.responses import FileResponse, Response, StreamingResponse
+
+RANGE_CHUNK_SIZE = 64 * 1024
+
+
+class FileValidatorCache:
+    """
+    文件强 ETag 缓存: ETag 为文件内容的 sha256, 每个文件版本（路径、大小、修改时间）只计算一次,
+    文件被替换后版本变化, 自动重新计算。
+    """
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # abspath -> (size, mtime_ns, etag)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _hash_file(path) -> str:
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+        return f'"{digest.hexdigest()[:32]}"'
+
+    async def get(self, path):
+        """返回 (stat_result, etag), 文件不存在时返回 (None, None)"""
+        try:
+            stat_result = os.stat(path)
+        except (FileNotFoundError, NotADirectoryError):
+            return None, None
+        key = os.path.abspath(path)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[:2] == (stat_result.st_size, stat_result.st_mtime_ns):
+                self._entries.move_to_end(key)
+                return stat_result, entry[2]
+        etag = await asyncio.to_thread(self._hash_file, path)
+        with self._lock:
+            self._entries[key] = (stat_result.st_size, stat_result.st_mtime_ns, etag)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return stat_result, etag
+
+
+file_validators = FileValidatorCache()
+
+
+def content_disposition(filename: str, disposition: str = "inline") -> str:
+    """生成 Content-Disposition 头, 非 ASCII 文件名使用 RFC 5987 的 filename* 形式"""
+    quoted = quote(filename)
+    if quoted == filename:
+        return f'{disposition}; filename="{filename}"'
+    return f"{disposition}; filename*=utf-8''{quoted}"
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    if header.strip() == "*":
+        return True
+    # If-None-Match 使用弱比较
+    candidates = [tag.strip().removeprefix("W/") for tag in header.split(",")]
+    return etag in candidates
+
+
+def _not_modified(request: Request, stat_result, etag: str) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return _etag_matches(if_none_match, etag)
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return int(stat_result.st_mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def _parse_range(header: str, size: int):
+    """
+    解析单段 Range 头, 返回 (start, end) 闭区间; 格式非法或多段范围返回 None（按完整文件响应）,
+    范围无法满足时返回 (size, size)。
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    start, sep, end = spec.strip().partition("-")
+    if not sep:
+        return None
+    try:
+        if start == "":
+            length = int(end)
+            if length <= 0:
+                return size, size
+            return max(size - length, 0), size - 1
+        start = int(start)
+        end = int(end) if end else size - 1
+    except ValueError:
+        return None
+    if start >= size or end < start:
+        return size, size
+    return start, min(end, size - 1)
+
+
+async def _iter_file_range(path, start: int, end: int):
+    async with aiofiles.open(path, "rb") as f:
+        await f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = await f.read(min(RANGE_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+async def cached_file_response(request: Request, path, media_type: str, headers: dict = None,
+                               cache_control: str = "private, no-cache"):
+    """
+    带缓存校验的文件响应: 附带强 ETag、Last-Modified、Cache-Control,
+    条件请求命中时返回 304, 支持单段 Range（206）, 便于浏览器内嵌 PDF 阅读器按需加载。
+    文件不存在时返回 None, 由调用方决定错误响应。
+    """
+    stat_result, etag = await file_validators.get(path)
+    if stat_result is None:
+        return None
+    validators = {
+        "ETag": etag,
+        "Last-Modified": formatdate(stat_result.st_mtime, usegmt=True),
+        "Cache-Control": cache_control,
+        "Accept-Ranges": "bytes",
+    }
+    if _not_modified(request, stat_result, etag):
+        return Response(status_code=304, headers=validators)
+    headers = {**(headers or {}), **validators}
+
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and (if_range is None or if_range.strip() == etag):
+        size = stat_result.st_size
+        byte_range = _parse_range(range_header, size)
+        if byte_range is not None:
+            start, end = byte_range
+            if start >= size:
+                return Response(status_code=416, headers={**validators, "Content-Range": f"bytes */{size}"})
+            headers.update({"Content-Range": f"bytes {start}-{end}/{size}",
+                            "Content-Length": str(end - start + 1)})
+            return StreamingResponse(_iter_file_range(path, start, end), status_code=206,
+                                     media_type=media_type, headers=headers)
+
+    return FileResponse(path=path, media_type=media_type, headers=headers, stat_result=stat_result)
@@ -0,0 +1,145 @@
+import copy
+
+
+def apply_merge_patch(target, patch):
+    """
+    RFC 7396 JSON Merge Patch: patch 中值为 null 的键删除, 字典递归合并, 其它值直接替换。
+    返回新对象, 不修改 target。
+    """
+    if not isinstance(patch, dict):
+        return copy.deepcopy(patch)
+    result = copy.deepcopy(target) if isinstance(target, dict) else {}
+    for key, value in patch.items():
+        if value is None:
+            result.pop(key, None)
+        else:
+            result[key] = apply_merge_patch(result.get(key), value)
+    return result
+
+
+def _parse_pointer(pointer: str) -> list:
+    if pointer == "":
+        return []
+    if not pointer.startswith("/"):
+        raise ValueError(f"非法的 JSON Pointer: {pointer}")
+    return [part.replace("~1", "/").replace("~0", "~") for part in pointer[1:].split("/")]
+
+
+def _list_index(container: list, token: str, allow_end=False) -> int:
+    if allow_end and token == "-":
+        return len(container)
+    if not token.isdigit() or (len(token) > 1 and token.startswith("0")):
+        raise ValueError(f"非法的数组下标: {token}")
+    index = int(token)
+    if index > len(container) or (index == len(container) and not allow_end):
+        raise ValueError(f"数组下标越界: {token}")
+    return index
+
+
+def _resolve_parent(doc, pointer: str):
+    """返回 (父容器, 最后一级 token), 路径不存在时抛出 ValueError"""
+    tokens = _parse_pointer(pointer)
+    if not tokens:
+        raise ValueError("不支持对根节点执行该操作")
+    node = doc
+    for token in tokens[:-1]:
+        node = _get_child(node, token)
+    return node, tokens[-1]
+
+
+def _get_child(node, token):
+    if isinstance(node, dict):
+        if token not in node:
+            raise ValueError(f"路径不存在: {token}")
+        return node[token]
+    if isinstance(node, list):
+        return node[_list_index(node, token)]
+    raise ValueError(f"路径不存在: {token}")
+
+
+def json_equal(a, b) -> bool:
+    """
+    按 JSON 类型比较两个值（RFC 6902 §4.6）: 布尔值与数字不相等, 数字按数值比较,
+    数组逐项、对象逐键递归比较。Python 的 == 会认为 1 == True, 不能直接使用。
+    """
+    if isinstance(a, bool) or isinstance(b, bool):
+        return isinstance(a, bool) and isinstance(b, bool) and a == b
+    if isinstance(a, (int, float)) and isinstance(b, (int, float)):
+        return a == b
+    if isinstance(a, list) and isinstance(b, list):
+        return len(a) == len(b) and all(json_equal(x, y) for x, y in zip(a, b))
+    if isinstance(a, dict) and isinstance(b, dict):
+        return a.keys() == b.keys() and all(json_equal(a[key], b[key]) for key in a)
+    return type(a) is type(b) and a == b
+
+
+def _get(doc, pointer: str):
+    node = doc
+    for token in _parse_pointer(pointer):
+        node = _get_child(node, token)
+    return node
+
+
+def _add(doc, pointer: str, value):
+    if pointer == "":
+        return value
+    parent, token = _resolve_parent(doc, pointer)
+    if isinstance(parent, dict):
+        parent[token] = value
+    elif isinstance(parent, list):
+        parent.insert(_list_index(parent, token, allow_end=True), value)
+    else:
+        raise ValueError(f"路径不存在: {pointer}")
+    return doc
+
+
+def _remove(doc, pointer: str):
+    parent, token = _resolve_parent(doc, pointer)
+    if isinstance(parent, dict):
+        if token not in parent:
+            raise ValueError(f"路径不存在: {pointer}")
+        return parent.pop(token)
+    if isinstance(parent, list):
+        return parent.pop(_list_index(parent, token))
+    raise ValueError(f"路径不存在: {pointer}")
+
+
+def apply_json_patch(doc, operations: list):
+    """
+    RFC 6902 JSON Patch: 支持 add/remove/replace/move/copy/test。
+    在副本上依次执行, 任一操作失败则抛出 ValueError 且不影响原对象。
+    """
+    if not isinstance(operations, list):
+        raise ValueError("JSON Patch 必须是操作数组")
+    result = copy.deepcopy(doc)
+    for operation in operations:
+        if not isinstance(operation, dict) or "op" not in operation or "path" not in operation:
+            raise ValueError(f"非法的 JSON Patch 操作: {operation}")
+        op, path = operation["op"], operation["path"]
+        if op in ("add", "replace", "test") and "value" not in operation:
+            raise ValueError(f"{op} 操作缺少 value: {operation}")
+        if op in ("move", "copy") and "from" not in operation:
+            raise ValueError(f"{op} 操作缺少 from: {operation}")
+        if op == "add":
+            result = _add(result, path, copy.deepcopy(operation["value"]))
+        elif op == "remove":
+            _remove(result, path)
+        elif op == "replace":
+            if path == "":
+                result = copy.deepcopy(operation["value"])
+            else:
+                _remove(result, path)
+                result = _add(result, path, copy.deepcopy(operation["value"]))
+        elif op == "move":
+            if path != operation["from"] and path.startswith(operation["from"] + "/"):
+                raise ValueError(f"不能移动到自身的子路径: {operation}")
+            value = _remove(result, operation["from"])
+            result = _add(result, path, value)
+        elif op == "copy":
+            result = _add(result, path, copy.deepcopy(_get(result, operation["from"])))
+        elif op == "test":
+            if not json_equal(_get(result, path), operation["value"]):
+                raise ValueError(f"test 操作校验失败: {path}")
+        else:
+            raise ValueError(f"不支持的操作类型: {op}")
+    return result
@@ -0,0 +1,134 @@
+import os
+import time
+import threading
+import functools
+from contextlib import contextmanager
+
+# 默认分桶(秒), 覆盖毫秒级的模板加载到分钟级的大批量导出
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class Histogram:
+    """Prometheus 直方图: 按标签组合分别累计各分桶计数、总和与次数"""
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # 标签值元组 -> [各分桶计数..., 总和, 次数]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 2)
+            for idx, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[idx] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def _labels(self, key, extra=None) -> str:
+        pairs = [f'{name}="{_escape(value)}"' for name, value in zip(self.labelnames, key)]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = sorted((key, list(values)) for key, values in self._series.items())
+        for key, values in series:
+            for bound, count in zip(self.buckets, values):
+                labels = self._labels(key, 'le="%s"' % bound)
+                lines.append(f"{self.name}_bucket{labels} {count}")
+            labels = self._labels(key, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{labels} {values[-1]}")
+            lines.append(f"{self.name}_sum{self._labels(key)} {values[-2]}")
+            lines.append(f"{self.name}_count{self._labels(key)} {values[-1]}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS) -> Histogram:
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = Histogram(name, documentation, labelnames, buckets)
+            return metric
+
+    def render(self) -> str:
+        """Prometheus 文本格式（text/plain; version=0.0.4）"""
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+REQUEST_SECONDS = registry.histogram(
+    "office_http_request_duration_seconds", "HTTP 请求处理耗时（秒）, 流式响应只统计到响应头发出", ("method", "route", "status"))
+STAGE_SECONDS = registry.histogram(
+    "office_stage_duration_seconds", "处理阶段耗时（秒）: 模板加载、填充、保存、人员加载、打包等", ("stage", "template"))
+
+# 渲染子进程中记录的阶段耗时先收集起来, 随渲染结果返回主进程后再计入直方图
+_collector = threading.local()
+
+
+def record_stage(stage: str, template: str, seconds: float):
+    spans = getattr(_collector, "spans", None)
+    if spans is not None:
+        spans.append((stage, template, seconds))
+    else:
+        STAGE_SECONDS.observe(seconds, stage=stage, template=template)
+
+
+@contextmanager
+def span(stage: str, template: str = ""):
+    """记录一段代码的耗时到 office_stage_duration_seconds"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(stage, template, time.perf_counter() - start)
+
+
+def timed_stage(stage: str):
+    """填充器方法装饰器: 以 self.template_path 的文件名为 template 标签记录方法耗时"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(self, *args, **kwargs)
+            finally:
+                template = os.path.basename(getattr(self, "template_path", "") or "")
+                record_stage(stage, template, time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+@contextmanager
+def collect_spans():
+    """在当前线程内收集 span 而不直接计入直方图, 用于进程池中的渲染任务"""
+    previous = getattr(_collector, "spans", None)
+    _collector.spans = spans = []
+    try:
+        yield spans
+    finally:
+        _collector.spans = previous
+
+
+def replay_spans(spans):
+    for stage, template, seconds in spans:
+        STAGE_SECONDS.observe(seconds, stage=stage, template=template)
@@ -0,0 +1,168 @@
+import io
+import time
+import uuid
+import random
+import pstats
+import marshal
+import cProfile
+import threading
+from collections import deque, OrderedDict
+from contextvars import ContextVar
+from loguru import logger
+
+# 当前请求的剖析收集器, 渲染执行器据此决定是否在子进程中同时剖析
+_current_profile = ContextVar("current_profile", default=None)
+
+
+class _RawStats:
+    """pstats.Stats 只接受文件名或带 create_stats() 的对象, 用它包装子进程返回的原始统计字典"""
+    def __init__(self, stats):
+        self.stats = stats
+
+    def create_stats(self):
+        pass
+
+
+def profile_call(func, *args):
+    """执行 func(*args) 并剖析, 返回 (结果, 原始统计字典), 用于渲染子进程"""
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        result = func(*args)
+    finally:
+        profiler.disable()
+    profiler.create_stats()
+    return result, profiler.stats
+
+
+class ProfileCollector:
+    """单个请求的剖析数据: 主进程事件循环线程的 cProfile 加上各渲染子进程返回的统计"""
+    def __init__(self):
+        self.profiler = cProfile.Profile()
+        self.worker_stats = []
+        # 请求结束后关闭, 请求内启动的后台任务（如批量任务）不再写入
+        self.active = True
+
+    @staticmethod
+    def current():
+        collector = _current_profile.get()
+        return collector if collector is not None and collector.active else None
+
+    def add_worker_stats(self, stats):
+        if self.active and stats:
+            self.worker_stats.append(stats)
+
+    def merged_stats(self) -> pstats.Stats:
+        stats = pstats.Stats(self.profiler, stream=io.StringIO())
+        for worker_stats in self.worker_stats:
+            stats.add(_RawStats(worker_stats))
+        return stats
+
+
+class ProfileRecord:
+    def __init__(self, method, path, status, duration, forced, stats: pstats.Stats, workers):
+        self.id = uuid.uuid4().hex[:12]
+        self.method = method
+        self.path = path
+        self.status = status
+        self.duration = duration
+        self.forced = forced
+        self.workers = workers
+        self.created_at = time.time()
+        self.total_calls = stats.total_calls
+        # 与 pstats.Stats.dump_stats 写出的 .prof 格式相同, 可直接用 pstats/snakeviz 打开
+        self.data = marshal.dumps(stats.stats)
+
+    def summary(self, sort="cumulative", limit=50) -> str:
+        stream = io.StringIO()
+        stats = pstats.Stats(_RawStats(marshal.loads(self.data)), stream=stream)
+        stats.strip_dirs().sort_stats(sort).print_stats(limit)
+        return stream.getvalue()
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "status": self.status,
+            "duration": round(self.duration, 4),
+            "forced": self.forced,
+            "render_workers": self.workers,
+            "total_calls": self.total_calls,
+            "size": len(self.data),
+            "created_at": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(self.created_at)),
+        }
+
+
+class RequestProfiler:
+    """
+    慢请求剖析: 配置开启时按 sample_rate 抽样, 或请求头带 X-Profile: 1（需 allow_header, 且 authorize(request)
+    校验通过, 即已登录并具备剖析权限）时强制剖析,
+    耗时超过 threshold_seconds 的请求保存 cProfile 结果, 最多保留 max_profiles 份（环形缓冲, 淘汰最早的）。
+    主进程的剖析在事件循环线程上进行, 会混入同时段其它请求的协程; 渲染子进程内的 openpyxl/docxtpl
+    调用单独剖析后合并进来。同一时刻事件循环线程上只能有一个 cProfile, 已有请求在剖析时其它请求跳过。
+    """
+    def __init__(self, enabled=False, sample_rate=1.0, allow_header=False, header_name="X-Profile",
+                 threshold_seconds=1.0, max_profiles=20, authorize=None):
+        self.enabled = enabled
+        self.sample_rate = sample_rate
+        # 未提供 authorize 时不接受请求头触发
+        self.allow_header = allow_header and authorize is not None
+        self.authorize = authorize
+        self.header_name = header_name
+        self.threshold_seconds = threshold_seconds
+        self._records = OrderedDict()  # id -> ProfileRecord
+        self._order = deque(maxlen=max_profiles)
+        self._busy = threading.Lock()
+
+    @property
+    def active(self) -> bool:
+        return self.enabled or self.allow_header
+
+    def _wanted(self, request):
+        """返回 (是否剖析, 是否由请求头强制)"""
+        if (self.allow_header and request.headers.get(self.header_name, "").lower() in ("1", "true", "yes")
+                and self.authorize(request)):
+            return True, True
+        return self.enabled and random.random() < self.sample_rate, False
+
+    def _save(self, record: ProfileRecord):
+        if len(self._order) == self._order.maxlen:
+            self._records.pop(self._order[0], None)
+        self._order.append(record.id)
+        self._records[record.id] = record
+
+    async def dispatch(self, request, call_next):
+        """HTTP 中间件入口, 不改变请求的处理和响应"""
+        wanted, forced = self._wanted(request)
+        if not wanted or not self._busy.acquire(blocking=False):
+            return await call_next(request)
+        collector = ProfileCollector()
+        token = _current_profile.set(collector)
+        status = 500
+        start = time.perf_counter()
+        collector.profiler.enable()
+        try:
+            response = await call_next(request)
+            status = response.status_code
+            return response
+        finally:
+            collector.profiler.disable()
+            duration = time.perf_counter() - start
+            collector.active = False
+            _current_profile.reset(token)
+            self._busy.release()
+            if forced or duration >= self.threshold_seconds:
+                try:
+                    record = ProfileRecord(request.method, request.url.path, status, duration, forced,
+                                           collector.merged_stats(), len(collector.worker_stats))
+                    self._save(record)
+                    logger.info(f"已保存请求剖析 {record.id}: {request.method} {request.url.path} 耗时 {duration:.3f}s")
+                except Exception as e:
+                    logger.warning(f"保存请求剖析失败: {e}")
+
+    def list(self) -> list:
+        return [self._records[profile_id].to_dict() for profile_id in reversed(self._order)]
+
+    def get(self, profile_id: str):
+        return self._records.get(profile_id)
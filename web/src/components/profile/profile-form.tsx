@@ -171,7 +171,7 @@ export default function ProfileForm({ initialData }: ProfileFormProps) {
                 onMouseLeave={() => setAvatarHover(false)}
               >
                 <Avatar className="w-24 h-24 cursor-pointer">
-                  <AvatarImage key={formData.avatarKey || ''} src={个人信息.照片 ? (个人信息.照片.startsWith('http') ? 个人信息.照片 : `${apiClient.BASE_URL}/${个人信息.照片.replace(/^[\/]+/, '')}`) : "/img/loading.svg"} />
+                  <AvatarImage key={formData.avatarKey || ''} src={个人信息.照片 ? (个人信息.照片.startsWith('http') ? 个人信息.照片 : apiClient.getAvatarUrl(personId, formData.avatarKey)) : "/img/loading.svg"} />
                   <AvatarFallback>{"上传照片"}</AvatarFallback>
                 </Avatar>
                 {/* 上传按钮覆盖层 */}
@@ -68,7 +68,7 @@ export default function TableManager({ className }: TableManagerProps) {
     setAutoFilling(true);
     const res = await apiClient.autoFillTable(selectedFile, personId ? [personId] : []);
     if (res.code === 200) {
-      const url = apiClient.BASE_URL + '/' + res.data.replace(/^\/+/, '');
+      const url = apiClient.getDownloadUrl(res.data);
       const link = document.createElement('a');
       link.href = url;
       link.download = '';
@@ -2,6 +2,25 @@
 // 注意！！路径中/的拼接，多余的/会导致请求失败
 const BASE_URL = 'http://127.0.0.1:8008';
 const API_BASE_URL = BASE_URL + '/api';
+const TOKEN_KEY = 'office-work-token';
+
+// 会话令牌，登录成功后保存，后续请求通过 Authorization 头携带
+const getToken = (): string =>
+    typeof window !== 'undefined' ? window.localStorage.getItem(TOKEN_KEY) || '' : '';
+
+const setToken = (token: string) => {
+    if (typeof window === 'undefined') return;
+    if (token) {
+        window.localStorage.setItem(TOKEN_KEY, token);
+    } else {
+        window.localStorage.removeItem(TOKEN_KEY);
+    }
+};
+
+const authHeaders = (headers: Record<string, string> = {}): Record<string, string> => {
+    const token = getToken();
+    return token ? { ...headers, Authorization: `Bearer ${token}` } : headers;
+};
 
 export const apiClient = {
     BASE_URL,
@@ -19,12 +38,26 @@ export const apiClient = {
                 password
             }),
         });
+        const result = await response.json();
+        setToken(result.code === 200 ? result.data.token : '');
+        return result;
+    },
+
+    // 登出方法
+    logout: async (): Promise<any> => {
+        const response = await fetch(`${API_BASE_URL}/user/logout`, {
+            method: 'POST',
+            headers: authHeaders(),
+        });
+        setToken('');
         return await response.json();
     },
 
     // 获取用户信息
     getUserInfo: async (username: string): Promise<any> => {
-        const response = await fetch(`${API_BASE_URL}/info/${username}`);
+        const response = await fetch(`${API_BASE_URL}/info/${username}`, {
+            headers: authHeaders(),
+        });
         return await response.json();
     },
 
@@ -32,9 +65,9 @@ export const apiClient = {
     updateUserInfo: async (username: string, userInfo: any): Promise<any> => {
         const response = await fetch(`${API_BASE_URL}/info/${username}`, {
             method: 'PUT',
-            headers: {
+            headers: authHeaders({
                 'Content-Type': 'application/json',
-            },
+            }),
             body: JSON.stringify({
                 person_info: userInfo
             }),
@@ -42,6 +75,30 @@ export const apiClient = {
         return await response.json();
     },
 
+    // 批量获取用户信息，返回 { results: {id: info}, errors: {id: msg} }
+    batchGetUserInfo: async (personIds: string[]): Promise<any> => {
+        const response = await fetch(`${API_BASE_URL}/info/batch_get`, {
+            method: 'POST',
+            headers: authHeaders({
+                'Content-Type': 'application/json',
+            }),
+            body: JSON.stringify({ person_ids: personIds }),
+        });
+        return await response.json();
+    },
+
+    // 批量局部更新用户信息，persons 为 {id: merge patch}，返回 { results: {id: info}, errors: {id: msg} }
+    batchUpdateUserInfo: async (persons: Record<string, any>): Promise<any> => {
+        const response = await fetch(`${API_BASE_URL}/info/batch_update`, {
+            method: 'POST',
+            headers: authHeaders({
+                'Content-Type': 'application/json',
+            }),
+            body: JSON.stringify({ persons }),
+        });
+        return await response.json();
+    },
+
     // 上传头像
     uploadAvatar: async (personId: string, file: File): Promise<any> => {
         const formData = new FormData();
@@ -49,6 +106,7 @@ export const apiClient = {
         formData.append('file', file);
         const response = await fetch(`${API_BASE_URL}/info/upload_avatar`, {
             method: 'POST',
+            headers: authHeaders(),
             body: formData,
         });
         return await response.json();
@@ -56,26 +114,68 @@ export const apiClient = {
 
     // 获取文件列表
     getTablesList: async (): Promise<any> => {
-        const response = await fetch(`${API_BASE_URL}/table/list_preview`);
+        const response = await fetch(`${API_BASE_URL}/table/list_preview`, {
+            headers: authHeaders(),
+        });
         return await response.json();
     },
 
-    // 获取文件下载URL
+    // 获取文件下载URL（iframe 无法设置请求头，令牌通过查询参数携带）
     getFilePreviewUrl: (filename: string): string => {
-        return `${API_BASE_URL}/table/preview/${filename}`;
+        return `${API_BASE_URL}/table/preview/${filename}?token=${encodeURIComponent(getToken())}`;
     },
 
     // 自动填表
     autoFillTable: async (filename: string, personIds: string[] = []): Promise<any> => {
         const response = await fetch(`${API_BASE_URL}/table/autofill`, {
             method: 'POST',
-            headers: {
+            headers: authHeaders({
                 'Content-Type': 'application/json',
-            },
+            }),
             body: JSON.stringify({ table_name: filename, persons: personIds }),
         });
         return await response.json();
     },
 
+    // 填表前预检，返回 { placeholders, missing, empty, valid }
+    validateTable: async (filename: string, personId: string): Promise<any> => {
+        const response = await fetch(`${API_BASE_URL}/table/validate`, {
+            method: 'POST',
+            headers: authHeaders({
+                'Content-Type': 'application/json',
+            }),
+            body: JSON.stringify({ table_name: filename, person_id: personId }),
+        });
+        return await response.json();
+    },
+
+    // 请求已填写文档的预览，返回 { status, preview_id, url }，status 为 pending 时稍后再请求 url
+    requestFilledPreview: async (filename: string, personId: string, format: 'pdf' | 'png' = 'pdf'): Promise<any> => {
+        const response = await fetch(`${API_BASE_URL}/table/preview_filled`, {
+            method: 'POST',
+            headers: authHeaders({
+                'Content-Type': 'application/json',
+            }),
+            body: JSON.stringify({ table_name: filename, person_id: personId, format }),
+        });
+        return await response.json();
+    },
+
+    // 已填写文档预览的地址（iframe 内嵌，令牌通过查询参数携带）
+    getFilledPreviewUrl: (url: string): string => {
+        return `${BASE_URL}${url}?token=${encodeURIComponent(getToken())}`;
+    },
+
+    // 自动填表生成文件的下载地址（浏览器下载链接无法设置请求头，令牌通过查询参数携带）
+    getDownloadUrl: (path: string): string => {
+        return `${BASE_URL}/${path.replace(/^\/+/, '')}?token=${encodeURIComponent(getToken())}`;
+    },
+
+    // 人员头像地址（<img> 无法设置请求头，令牌通过查询参数携带；默认取上传时生成的缩略图；version 变化时强制刷新）
+    getAvatarUrl: (personId: string, version?: string | number, size: 'thumb' | 'original' = 'thumb'): string => {
+        const query = `size=${size}&token=${encodeURIComponent(getToken())}${version ? `&v=${version}` : ''}`;
+        return `${API_BASE_URL}/info/avatar/${encodeURIComponent(personId)}?${query}`;
+    },
+
     // 可以添加更多API请求方法
 };